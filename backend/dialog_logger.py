@@ -1,58 +1,41 @@
-import json
-import os
+import asyncio
+import itertools
 from datetime import datetime
-from typing import List, Optional
+from typing import Iterator, List, Optional, Tuple
 
-from backend.models import DialogLog, DialogLogCreate
+from backend.models import DialogLog, DialogLogCreate, LogQuery
+from backend.services.log_store import LogStore, create_log_store
+from backend.services.log_writer import LogWriter
+from backend.services.log_aggregates import LogAggregates
+from backend.services.log_archive import LogArchive
+from backend.services.log_records import LogRecord
+from backend.services.latency_metrics import latency_metrics
+from backend.services.log_search import LogSearchIndex
 
 
 class DialogLogger:
-    def __init__(self):
-        self.logs: List[DialogLog] = []
-        self.log_id_counter = 1
-        self.logs_file = "dialogs_state.json"
-        self._ensure_logs_file()
-        self.load_logs_state()
-
-    def _ensure_logs_file(self):
-        """Создает пустой файл логов если его нет"""
-        if not os.path.exists(self.logs_file):
-            with open(self.logs_file, 'w', encoding='utf-8') as f:
-                json.dump({"next_id": 1, "logs": []}, f, indent=2)
-
-    def load_logs_state(self):
-        """Загрузка логов из файла"""
-        try:
-            with open(self.logs_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            self.logs = [DialogLog(**log_data) for log_data in data.get('logs', [])]
-            self.log_id_counter = data.get('next_id', 1)
-            print(f"📊 Загружено {len(self.logs)} логов диалогов")
-
-        except Exception as e:
-            print(f"❌ Ошибка загрузки логов: {e}")
-            self.logs = []
-            self.log_id_counter = 1
-
-    def save_logs_state(self):
-        """Сохранение логов в файл"""
-        try:
-            logs_data = [log.dict() for log in self.logs]
-            state_data = {
-                'next_id': self.log_id_counter,
-                'logs': logs_data,
-                'saved_at': datetime.now().isoformat()
-            }
-
-            with open(self.logs_file, 'w', encoding='utf-8') as f:
-                json.dump(state_data, f, ensure_ascii=False, indent=2)
-
-        except Exception as e:
-            print(f"❌ Ошибка сохранения логов: {e}")
-
-    async def log_dialog(self, log_data: DialogLogCreate) -> DialogLog:
-        """Логирование диалога"""
+    """Журнал диалогов поверх подключаемого хранилища (см. DIALOG_LOG_STORE).
+
+    Пока запущен фоновый LogWriter, записи попадают в хранилище пачками с
+    задержкой до LOG_WRITER_FLUSH_MS; без него пишутся сразу.
+    """
+
+    def __init__(self, store: Optional[LogStore] = None):
+        self.store = store or create_log_store()
+        self.writer = LogWriter(self.store)
+        # Сюда политика хранения переносит устаревшие записи
+        self.archive = LogArchive()
+        self.log_id_counter = self.store.next_id()
+        # Статистика по агентам (вместе с архивом): строится в отдельном потоке
+        # при первом обращении к агенту, дальше обновляется при записи
+        self.aggregates = LogAggregates(loader=self._agent_history)
+        # Полнотекстовый индекс по записям хранилища; строится при первом поиске
+        self.search_index = LogSearchIndex(loader=lambda agent_id: self.store.scan(agent_id=agent_id))
+
+    def _agent_history(self, agent_id: int) -> Iterator[List[LogRecord]]:
+        return itertools.chain(self.store.scan(agent_id=agent_id), self.archive.scan(agent_id))
+
+    def _build_log(self, log_data: DialogLogCreate) -> DialogLog:
         log = DialogLog(
             id=self.log_id_counter,
             agent_id=log_data.agent_id,
@@ -65,33 +48,83 @@ class DialogLogger:
             timestamp=datetime.now().isoformat(),
             processing_time_ms=log_data.processing_time_ms
         )
-
-        self.logs.append(log)
         self.log_id_counter += 1
-        self.save_logs_state()
+        return log
+
+    async def log_dialog(self, log_data: DialogLogCreate) -> DialogLog:
+        """Логирование диалога"""
+        log = self._build_log(log_data)
+        await self._write([log])
 
         return log
 
-    def get_logs_by_agent(self, agent_id: int) -> List[DialogLog]:
-        return [log for log in self.logs if log.agent_id == agent_id]
+    async def log_dialogs(self, logs_data: List[DialogLogCreate]) -> List[DialogLog]:
+        """Логирование пачки диалогов одной записью в хранилище"""
+        logs = [self._build_log(log_data) for log_data in logs_data]
+        if logs:
+            await self._write(logs)
 
-    def get_all_logs(self) -> List[DialogLog]:
-        return self.logs
-
-    def get_agent_statistics(self, agent_id: int) -> dict:
-        agent_logs = self.get_logs_by_agent(agent_id)
-        return {
-            "total_dialogs": len(agent_logs),
-            "last_activity": max(log.timestamp for log in agent_logs) if agent_logs else None
-        }
-
-    def clear_logs(self, agent_id: Optional[int] = None) -> None:
-        if agent_id:
-            self.logs = [log for log in self.logs if log.agent_id != agent_id]
+        return logs
+
+    async def _write(self, logs: List[DialogLog]) -> None:
+        self.aggregates.add(logs)
+        latency_metrics.add(logs)
+        self.search_index.add(logs)
+        if self.writer.running:
+            await self.writer.submit(logs)
         else:
-            self.logs = []
-            self.log_id_counter = 1
-        self.save_logs_state()
+            try:
+                self.store.append(logs)
+            except Exception as e:
+                print(f"❌ Ошибка записи логов в {self.store.name}: {e}")
+
+    def get_logs_by_agent(self, agent_id: int, intent: Optional[str] = None,
+                          limit: Optional[int] = None) -> List[DialogLog]:
+        return self.store.query(agent_id, intent=intent, limit=limit)
+
+    def get_logs_page(self, query: LogQuery, archived: bool = False) -> List[DialogLog]:
+        return self.archive.page(query) if archived else self.store.page(query)
+
+    def get_log(self, agent_id: int, log_id: int) -> Optional[DialogLog]:
+        return self.store.get(agent_id, log_id)
+
+    async def search_logs(self, agent_id: int, query: str, offset: int = 0,
+                          limit: int = 20) -> Tuple[int, List[Tuple[DialogLog, float]]]:
+        """Поиск по тексту логов агента: (всего найдено, [(лог, релевантность)])"""
+        total, hits = await self.search_index.search(agent_id, query, offset, limit)
+        logs = await asyncio.to_thread(self.store.get_many, agent_id, [log_id for log_id, _ in hits])
+        return total, [(logs[log_id], score) for log_id, score in hits if log_id in logs]
+
+    def get_all_logs(self) -> List[DialogLog]:
+        return self.store.query()
+
+    async def get_agent_intents(self, agent_id: int) -> List[str]:
+        return await self.aggregates.intents(agent_id)
+
+    async def get_agent_statistics(self, agent_id: int) -> dict:
+        return (await self.aggregates.get(agent_id)).snapshot()
+
+    async def clear_logs(self, agent_id: Optional[int] = None) -> None:
+        # Записи из очереди LogWriter и файла переполнения, сделанные до
+        # очистки, не должны появиться в хранилище после нее
+        await self.writer.flush()
+        self.store.clear(agent_id)
+        self.archive.clear(agent_id)
+        self.aggregates.clear(agent_id)
+        self.search_index.clear(agent_id)
+        # Номера логов хранилище не переиспользует
+        self.log_id_counter = max(self.log_id_counter, self.store.next_id())
+
+    def start(self) -> None:
+        self.writer.start()
+
+    async def stop(self) -> None:
+        """Запись накопленных логов и закрытие хранилища"""
+        await self.writer.stop()
+        self.store.close()
+
+    def close(self) -> None:
+        self.store.close()
 
 
-dialog_logger = DialogLogger()
\ No newline at end of file
+dialog_logger = DialogLogger()
@@ -0,0 +1,333 @@
+import asyncio
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import yaml
+
+from backend.models import Agent
+from backend.nlu_models import NLUData
+from backend.nlu_service import NLUService
+from backend.utils.text import normalize_text
+
+
+_NGRAM_SLICES: Dict[Tuple[int, int, int], List[slice]] = {}
+
+
+def _ngram_slices(length: int, min_n: int, max_n: int) -> List[slice]:
+    key = (length, min_n, max_n)
+    slices = _NGRAM_SLICES.get(key)
+    if slices is None:
+        slices = [slice(i, i + n) for n in range(min_n, max_n + 1) for i in range(length - n + 1)]
+        _NGRAM_SLICES[key] = slices
+    return slices
+
+
+def ngram_list(text: str, min_n: int = 3, max_n: int = 3) -> List[str]:
+    """Символьные n-граммы текста (с повторами), слова обрамлены пробелами"""
+    padded = f" {normalize_text(text)} "
+    return list(map(padded.__getitem__, _ngram_slices(len(padded), min_n, max_n)))
+
+
+def char_ngrams(text: str, min_n: int = 3, max_n: int = 3) -> Counter:
+    return Counter(ngram_list(text, min_n, max_n))
+
+
+class IntentClassifier:
+    """Классификатор интентов: TF-IDF по символьным n-граммам + косинусная близость.
+
+    Примеры каждого интента хранятся уже закодированными (номера n-грамм и
+    счетчики), поэтому при изменении NLU данных заново разбираются только
+    изменившиеся интенты, а сборка матрицы сводится к операциям NumPy.
+    Матрица хранится по столбцам (n-грамма -> примеры): запрос стоит
+    пропорционально числу его n-грамм, а не размеру обучающих данных.
+    """
+
+    def __init__(self):
+        self._intent_examples: Dict[str, Tuple[str, ...]] = {}
+        # интент -> (номера n-грамм, счетчики, число n-грамм в каждом примере)
+        self._intent_rows: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self.vocabulary: Dict[str, int] = {}
+        self._df = np.zeros(0, dtype=np.float32)
+        self.intents: List[str] = []
+        self.n_examples = 0
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._col_indptr = np.zeros(1, dtype=np.int64)
+        self._col_rows = np.zeros(0, dtype=np.int32)
+        self._col_values = np.zeros(0, dtype=np.float32)
+        self._intent_row_starts = np.zeros(0, dtype=np.int64)
+
+    def update(self, nlu_data: NLUData) -> int:
+        """Синхронизация с NLU данными; возвращает число перестроенных интентов"""
+        new_examples = {
+            intent.name: tuple(example.text for example in intent.examples)
+            for intent in nlu_data.intents
+        }
+
+        changed = 0
+        for name in list(self._intent_examples):
+            if name not in new_examples:
+                self._remove_intent(name)
+                changed += 1
+        for name, examples in new_examples.items():
+            if self._intent_examples.get(name) != examples:
+                self._remove_intent(name)
+                self._add_intent(name, examples)
+                changed += 1
+
+        if changed:
+            self._rebuild()
+        return changed
+
+    def _add_intent(self, name: str, examples: Tuple[str, ...]) -> None:
+        vocabulary = self.vocabulary
+        grams_per_example = [ngram_list(text) for text in examples]
+        all_grams = [gram for grams in grams_per_example for gram in grams]
+        for gram in set(all_grams).difference(vocabulary):
+            vocabulary[gram] = len(vocabulary)
+
+        # Пары (пример, n-грамма) -> счетчик одной сортировкой целых чисел
+        n_cols = len(vocabulary)
+        example_index = np.repeat(
+            np.arange(len(examples), dtype=np.int64),
+            [len(grams) for grams in grams_per_example]
+        )
+        gram_ids = np.fromiter(map(vocabulary.__getitem__, all_grams), dtype=np.int64, count=len(all_grams))
+        pairs, counts = np.unique(example_index * n_cols + gram_ids, return_counts=True)
+        cols = pairs % n_cols
+        lengths = np.bincount(pairs // n_cols, minlength=len(examples))
+
+        if len(vocabulary) > len(self._df):
+            self._df = np.concatenate([self._df, np.zeros(len(vocabulary) - len(self._df), dtype=np.float32)])
+        # n-граммы внутри примера уникальны, поэтому bincount дает document frequency
+        self._df += np.bincount(cols, minlength=len(self._df)).astype(np.float32)
+        self._intent_examples[name] = examples
+        self._intent_rows[name] = (cols, counts.astype(np.float32), lengths.astype(np.int64))
+
+    def _remove_intent(self, name: str) -> None:
+        rows = self._intent_rows.pop(name, None)
+        if rows is not None:
+            self._df -= np.bincount(rows[0], minlength=len(self._df)).astype(np.float32)
+        self._intent_examples.pop(name, None)
+
+    def _rebuild(self) -> None:
+        self.intents = sorted(self._intent_rows)
+        parts = [self._intent_rows[name] for name in self.intents]
+        examples_per_intent = np.array([len(part[2]) for part in parts], dtype=np.int64)
+        self.n_examples = int(examples_per_intent.sum())
+        self._intent_row_starts = np.concatenate([[0], np.cumsum(examples_per_intent)[:-1]]).astype(np.int64)
+
+        n_cols = len(self.vocabulary)
+        self._idf = (np.log((1 + self.n_examples) / (1 + self._df)) + 1).astype(np.float32)
+        if not parts:
+            cols = np.zeros(0, dtype=np.int64)
+            values = np.zeros(0, dtype=np.float32)
+            rows = np.zeros(0, dtype=np.int32)
+        else:
+            cols = np.concatenate([part[0] for part in parts])
+            values = np.concatenate([part[1] for part in parts]) * self._idf[cols]
+            lengths = np.concatenate([part[2] for part in parts])
+            rows = np.repeat(np.arange(self.n_examples, dtype=np.int32), lengths)
+            norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=self.n_examples))
+            values /= np.maximum(norms[rows], 1e-12).astype(np.float32)
+
+        order = np.argsort(cols, kind="stable")
+        self._col_rows = rows[order]
+        self._col_values = values[order]
+        self._col_indptr = np.zeros(n_cols + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=n_cols), out=self._col_indptr[1:])
+
+    def rank(self, text: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """Интенты по убыванию близости к тексту (максимум по примерам интента)"""
+        if not self.n_examples:
+            return []
+
+        query = [(self.vocabulary[gram], count) for gram, count in char_ngrams(text).items() if gram in self.vocabulary]
+        if not query:
+            return []
+
+        cols = np.fromiter((col for col, _ in query), dtype=np.int64, count=len(query))
+        weights = np.fromiter((count for _, count in query), dtype=np.float32, count=len(query)) * self._idf[cols]
+        norm = np.linalg.norm(weights)
+        if not norm:
+            return []
+        weights /= norm
+
+        starts, ends = self._col_indptr[cols], self._col_indptr[cols + 1]
+        lengths = ends - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        scores = np.bincount(
+            self._col_rows[positions],
+            weights=self._col_values[positions] * np.repeat(weights, lengths),
+            minlength=self.n_examples
+        )
+
+        # Примеры одного интента идут подряд — максимум по отрезкам
+        intent_scores = np.maximum.reduceat(scores, self._intent_row_starts)
+        best = np.argsort(-intent_scores)[:top_k]
+        return [(self.intents[i], float(intent_scores[i])) for i in best if intent_scores[i] > 0]
+
+
+class FallbackResponder:
+    """Ответы без Rasa, пока агент обучается или недоступен.
+
+    Классификатор строится из data/nlu.yml агента и перестраивается, когда
+    файл меняется; ответы берутся из responses в domain.yml. Чтение файлов и
+    построение идут в отдельном потоке. Если файл не разбирается (YAML или
+    интент без примеров), ошибка запоминается до следующего изменения файла.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("FALLBACK_CLASSIFIER_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.min_confidence = float(os.getenv("FALLBACK_MIN_CONFIDENCE", "0.3"))
+        self.default_response = os.getenv(
+            "FALLBACK_DEFAULT_RESPONSE",
+            "Агент сейчас недоступен. Попробуйте повторить вопрос чуть позже."
+        )
+        self.nlu_service = NLUService()
+        self._classifiers: Dict[int, IntentClassifier] = {}
+        self._nlu_versions: Dict[int, Tuple[float, int]] = {}
+        # Версия nlu.yml, которую не удалось разобрать, и текст ошибки
+        self._failed: Dict[int, Tuple[Tuple[float, int], str]] = {}
+        self._loading: Dict[int, asyncio.Task] = {}
+        self._domain_responses: Dict[int, Tuple[Tuple[float, int], Dict[str, List[str]]]] = {}
+
+    @staticmethod
+    def _file_version(path: Optional[str]) -> Optional[Tuple[float, int]]:
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime, stat.st_size
+        except (OSError, TypeError):
+            return None
+
+    def _load(self, agent: Agent, version: Tuple[float, int]) -> Optional[IntentClassifier]:
+        """Построение классификатора (вызывается в отдельном потоке)"""
+        try:
+            nlu_data = self.nlu_service.load_nlu_data(agent.nlu_data_path)
+        except Exception as e:
+            self._failed[agent.id] = (version, str(e))
+            print(f"⚠️ Резервный классификатор агента {agent.id}: не удалось прочитать "
+                  f"{agent.nlu_data_path}: {e}")
+            return None
+
+        classifier = self._classifiers.get(agent.id) or IntentClassifier()
+        changed = classifier.update(nlu_data)
+        self._classifiers[agent.id] = classifier
+        self._nlu_versions[agent.id] = version
+        self._failed.pop(agent.id, None)
+        print(f"🧮 Резервный классификатор агента {agent.id}: перестроено интентов {changed}, "
+              f"примеров {classifier.n_examples}")
+        return classifier
+
+    async def get_classifier(self, agent: Agent) -> Optional[IntentClassifier]:
+        """Классификатор агента или None (нет nlu.yml или он не разбирается)"""
+        version = self._file_version(agent.nlu_data_path)
+        if version is None:
+            return None
+        if self._nlu_versions.get(agent.id) == version:
+            return self._classifiers[agent.id]
+        failed = self._failed.get(agent.id)
+        if failed is not None and failed[0] == version:
+            return None
+
+        # Одно построение на агента, сколько бы сообщений его ни ждало
+        task = self._loading.get(agent.id)
+        if task is None or task.done():
+            task = asyncio.ensure_future(asyncio.to_thread(self._load, agent, version))
+            self._loading[agent.id] = task
+        return await asyncio.shield(task)
+
+    def _responses(self, agent: Agent) -> Dict[str, List[str]]:
+        """Тексты ответов по интентам: rules.yml (intent -> utter_*) и utter_<intent>"""
+        version = self._file_version(agent.domain_path)
+        cached = self._domain_responses.get(agent.id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        domain = self.nlu_service.load_domain_data(agent.domain_path) if version else {}
+        utterances = {
+            name: [item.get("text", "") for item in (variants or []) if isinstance(item, dict) and item.get("text")]
+            for name, variants in ((domain or {}).get("responses") or {}).items()
+        }
+
+        actions: Dict[str, str] = {}
+        rules_path = os.path.join(os.path.dirname(agent.nlu_data_path or ""), "rules.yml")
+        if os.path.exists(rules_path):
+            try:
+                with open(rules_path, 'r', encoding='utf-8') as file:
+                    rules = (yaml.safe_load(file) or {}).get("rules") or []
+                for rule in rules:
+                    steps = rule.get("steps") or []
+                    for step, next_step in zip(steps, steps[1:]):
+                        if "intent" in step and str(next_step.get("action", "")).startswith("utter_"):
+                            actions.setdefault(step["intent"], next_step["action"])
+            except Exception as e:
+                print(f"⚠️ Не удалось прочитать {rules_path}: {e}")
+
+        responses = {}
+        for intent in (domain or {}).get("intents") or []:
+            name = intent if isinstance(intent, str) else next(iter(intent), None)
+            texts = utterances.get(actions.get(name, f"utter_{name}"))
+            if name and texts:
+                responses[name] = texts
+        self._domain_responses[agent.id] = (version, responses)
+        return responses
+
+    async def _agent_responses(self, agent: Agent) -> Dict[str, List[str]]:
+        cached = self._domain_responses.get(agent.id)
+        if cached and cached[0] == self._file_version(agent.domain_path):
+            return cached[1]
+        try:
+            return await asyncio.to_thread(self._responses, agent)
+        except Exception as e:
+            print(f"⚠️ Не удалось прочитать ответы агента {agent.id} из {agent.domain_path}: {e}")
+            return {}
+
+    async def metadata(self, agent: Agent, message: str) -> Optional[Dict[str, Any]]:
+        """Метаданные трассировки от резервного классификатора"""
+        if not self.enabled:
+            return None
+        classifier = await self.get_classifier(agent)
+        if classifier is None:
+            return None
+
+        ranking = classifier.rank(message)
+        top_name, top_confidence = ranking[0] if ranking else (None, 0.0)
+        return {
+            "intent": {"name": top_name, "confidence": round(top_confidence, 4)} if top_name else None,
+            "intent_ranking": [{"name": name, "confidence": round(score, 4)} for name, score in ranking],
+            "entities": [],
+            "timestamp": datetime.now().isoformat(),
+            "confidence": round(top_confidence, 4),
+            "text": message,
+            "source": "fallback"
+        }
+
+    async def respond(self, agent: Agent, message: str) -> Optional[Dict[str, Any]]:
+        """Ответ в формате RasaIntegration.send_message или None, если резерв выключен"""
+        metadata = await self.metadata(agent, message)
+        if metadata is None:
+            return None
+
+        intent = metadata["intent"]
+        texts = None
+        if intent and intent["confidence"] >= self.min_confidence:
+            texts = (await self._agent_responses(agent)).get(intent["name"])
+        return {
+            "success": True,
+            "responses": texts[:1] if texts else [self.default_response],
+            "metadata": metadata,
+            "fallback": True
+        }
+
+    def forget(self, agent_id: int) -> None:
+        self._classifiers.pop(agent_id, None)
+        self._nlu_versions.pop(agent_id, None)
+        self._failed.pop(agent_id, None)
+        self._loading.pop(agent_id, None)
+        self._domain_responses.pop(agent_id, None)
+
+
+fallback_responder = FallbackResponder()
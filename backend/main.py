@@ -6,6 +6,14 @@ from backend.routers.nlu import router as nlu_router
 from backend.routers.logs import router as logs_router
 from backend.routers.intents import router as intents_router
 from backend.routers.entities import router as entities_router
+from backend.rasa_integration import rasa_integration
+from backend.services.health_monitor import health_monitor
+from backend.dialog_logger import dialog_logger
+from backend.services.log_retention import log_retention
+from backend.services.agent_service import agent_service
+from backend.services.port_pool import port_pool
+from backend.services.agent_supervisor import agent_supervisor
+from backend.services.idle_scheduler import idle_scheduler
 
 app = FastAPI(
     title="Lab Complex API",
@@ -29,6 +37,80 @@ app.include_router(logs_router)
 app.include_router(intents_router)
 app.include_router(entities_router)
 
+
+@app.on_event("startup")
+async def startup():
+    # Отложенная запись agents_state.json
+    agent_service.start()
+    # Сверка пула портов агентов с ОС
+    port_pool.start()
+    # Процессы агентов под управлением супервизора
+    if agent_supervisor.autostart:
+        # Спящие агенты проснутся по первому сообщению
+        agent_supervisor.start_all([
+            agent for agent in agent_service.get_all_agents() if not idle_scheduler.is_sleeping(agent)
+        ])
+    # Усыпление простаивающих агентов
+    idle_scheduler.start()
+    # Фоновая проверка доступности агентов
+    health_monitor.start()
+    # Фоновая пакетная запись логов диалогов
+    dialog_logger.start()
+    # Перенос устаревших логов в архив
+    log_retention.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await health_monitor.stop()
+    await log_retention.stop()
+    await port_pool.stop()
+    await idle_scheduler.stop()
+    await agent_supervisor.stop_all()
+    # Закрываем пулы соединений к агентам
+    await rasa_integration.close()
+    # Дописываем очередь логов и закрываем хранилище
+    await dialog_logger.stop()
+    # Последние изменения агентов — на диск
+    await agent_service.stop()
+
+
+@app.get("/api/logs/writer")
+async def get_log_writer_metrics():
+    """Метрики фоновой записи логов: очередь, размер пачек, время записи"""
+    return {"store": dialog_logger.store.name, **dialog_logger.writer.snapshot()}
+
+
+@app.get("/api/state/agents")
+async def get_agents_state_persistence():
+    """Отложенная запись agents_state.json: число запросов и записей"""
+    return {"file": agent_service.state_file, **agent_service.state_writer.snapshot()}
+
+
+@app.get("/api/ports")
+async def get_port_pool():
+    """Пул портов агентов: диапазон, свободные, выданные и занятые другими процессами"""
+    return port_pool.snapshot()
+
+
+@app.get("/api/processes")
+async def get_agent_processes():
+    """Процессы агентов под управлением супервизора"""
+    return {"runtime": agent_supervisor.runtime, "processes": agent_supervisor.snapshot()}
+
+
+@app.get("/api/idle")
+async def get_idle_scheduler():
+    """Усыпление простаивающих агентов: счетчики, прогрев, время простоя"""
+    return idle_scheduler.snapshot()
+
+
+@app.get("/api/logs/retention")
+async def get_log_retention():
+    """Глобальная политика хранения логов и статистика переноса в архив"""
+    return log_retention.snapshot()
+
+
 @app.get("/")
 async def root():
     return {
@@ -36,6 +118,7 @@ async def root():
         "endpoints": {
             "docs": "/api/docs",
             "agents": "/api/agents",
+            "chat_ws": "/api/agents/{id}/ws",
             "nlu": "/api/agents/{id}/nlu",
             "intents": "/api/agents/{id}/intents",
             "entities": "/api/agents/{id}/entities",
@@ -1,6 +1,6 @@
 from enum import Enum
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, ClassVar, FrozenSet
 from datetime import datetime
 
 
@@ -16,6 +16,7 @@ class AgentStatus(str, Enum):
     ERROR = "error"
     REQUIRES_TRAINING = "requires_training"
     STOPPED = "stopped"
+    SLEEPING = "sleeping"  # процесс остановлен после простоя, проснется по сообщению
 
 
 class AgentBase(BaseModel):
@@ -40,11 +41,38 @@ class Agent(AgentBase):
     created_at: str  # 👈 ДОБАВЛЯЕМ ОБЯЗАТЕЛЬНОЕ ПОЛЕ
     updated_at: str  # 👈 ДОБАВЛЯЕМ ОБЯЗАТЕЛЬНОЕ ПОЛЕ
     requires_training: bool = False
+    response_cache_enabled: bool = False  # кэш ответов (только для FAQ агентов)
+    max_concurrency: Optional[int] = None  # одновременных запросов к агенту (None — ADMISSION_MAX_CONCURRENCY)
+    max_queue: Optional[int] = None  # ожидающих запросов сверх лимита (None — ADMISSION_MAX_QUEUE)
+    log_retention_days: Optional[int] = None  # хранить логи N дней (None — LOG_RETENTION_DAYS, 0 — всегда)
+    log_retention_max_records: Optional[int] = None  # последних логов в хранилище (None — LOG_RETENTION_MAX_RECORDS)
+    pinned: bool = False  # всегда прогрет: не усыплять после простоя
 
     class Config:
         from_attributes = True
 
 
+class AgentUpdate(BaseModel):
+    """Частичное обновление агента: меняются только переданные поля"""
+    # Поля, которые можно сбросить явным null (вернуть настройку по умолчанию)
+    NULLABLE_FIELDS: ClassVar[FrozenSet[str]] = frozenset({
+        "max_concurrency", "max_queue", "log_retention_days", "log_retention_max_records"
+    })
+
+    description: Optional[str] = None
+    response_cache_enabled: Optional[bool] = None
+    max_concurrency: Optional[int] = Field(None, ge=1)
+    max_queue: Optional[int] = Field(None, ge=0)
+    log_retention_days: Optional[int] = Field(None, ge=0)
+    log_retention_max_records: Optional[int] = Field(None, ge=0)
+    pinned: Optional[bool] = None
+
+
+class AgentDetail(Agent):
+    # Состояние агента во время работы бэкенда (доступность, circuit breaker и т.п.)
+    runtime: Dict[str, Any] = {}
+
+
 class TrainingRequest(BaseModel):
     agent_id: int
 
@@ -83,10 +111,12 @@ class EntityInfo(BaseModel):
 
 class TraceMetadata(BaseModel):
     intent: Optional[IntentInfo] = None
+    intent_ranking: List[IntentInfo] = []
     entities: List[EntityInfo] = []
     timestamp: str
     confidence: Optional[float] = None
     text: str
+    source: Optional[str] = None  # rasa | keywords | fallback
 
 
 class MessageResponse(BaseModel):
@@ -95,6 +125,22 @@ class MessageResponse(BaseModel):
     trace_metadata: Optional[TraceMetadata] = None  # 👈 ДОБАВЛЯЕМ МЕТАДАННЫЕ ТРАССИРОВКИ
     success: bool = True
     error: Optional[str] = None
+    fallback: bool = False  # ответ резервного классификатора, а не Rasa
+    processing_time_ms: Optional[float] = None
+
+
+class BatchMessageRequest(BaseModel):
+    messages: List[MessageRequest]
+    concurrency: Optional[int] = None  # не больше BATCH_MAX_CONCURRENCY
+
+
+class BatchMessageResponse(BaseModel):
+    agent_id: int
+    results: List[MessageResponse]  # в порядке запроса
+    total: int
+    succeeded: int
+    failed: int
+    processing_time_ms: float
 
 
 # Модель для логов диалогов
@@ -114,6 +160,41 @@ class DialogLog(BaseModel):
         from_attributes = True
 
 
+class DialogLogPage(BaseModel):
+    items: List[DialogLog]
+    # Непрозрачный курсор следующей страницы (None — страниц больше нет)
+    next_cursor: Optional[str] = None
+    limit: int
+
+
+class DialogLogSearchHit(BaseModel):
+    log: DialogLog
+    score: float
+
+
+class DialogLogSearchPage(BaseModel):
+    items: List[DialogLogSearchHit]
+    total: int
+    offset: int
+    limit: int
+    next_offset: Optional[int] = None
+
+
+class LogQuery(BaseModel):
+    """Фильтры и позиция страницы при чтении логов из хранилища"""
+    agent_id: int
+    intent: Optional[str] = None
+    sender: Optional[str] = None
+    since: Optional[str] = None  # ISO timestamp, включительно
+    until: Optional[str] = None  # ISO timestamp, не включительно
+    min_confidence: Optional[float] = None
+    max_confidence: Optional[float] = None
+    errors_only: bool = False
+    descending: bool = True
+    after: Optional[Tuple[str, int]] = None  # (timestamp, id) последней записи предыдущей страницы
+    limit: int = 50
+
+
 class DialogLogCreate(BaseModel):
     agent_id: int
     sender: str
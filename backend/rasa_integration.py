@@ -1,6 +1,7 @@
-import requests
-import json
-from typing import Dict, Any, List, Optional
+import asyncio
+import random
+import httpx
+from typing import AsyncContextManager, Callable, Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import time
 import os
@@ -8,28 +9,119 @@ import subprocess
 import shutil
 
 from backend.models import AgentStatus
+from backend.services.circuit_breaker import circuit_breakers, CircuitOpenError
 
 
 class RasaIntegration:
     def __init__(self):
-        import os
         self.base_url = os.getenv("RASA_BASE_URL", "http://localhost")
+        # Таймауты и лимиты пулов соединений к агентам (по одному пулу на порт)
+        self.connect_timeout = float(os.getenv("RASA_CONNECT_TIMEOUT", "2"))
+        self.read_timeout = float(os.getenv("RASA_READ_TIMEOUT", "10"))
+        self.health_timeout = float(os.getenv("RASA_HEALTH_TIMEOUT", "3"))
+        self.pool_max_connections = int(os.getenv("RASA_POOL_MAX_CONNECTIONS", "32"))
+        self.pool_max_keepalive = int(os.getenv("RASA_POOL_MAX_KEEPALIVE", "16"))
+        self.pool_keepalive_expiry = float(os.getenv("RASA_POOL_KEEPALIVE_EXPIRY", "30"))
+        # Разбор NLU через /model/parse: off | parallel | sampled (RASA_PARSE_SAMPLE_PERCENT %)
+        self.parse_mode = os.getenv("RASA_PARSE_MODE", "parallel").lower()
+        self.parse_sample_percent = float(os.getenv("RASA_PARSE_SAMPLE_PERCENT", "10"))
+        self._clients: Dict[int, httpx.AsyncClient] = {}
+        # Одинаковые запросы в полете: (порт, отправитель, текст) -> задача
+        self._inflight: Dict[Tuple[int, str, str], asyncio.Future] = {}
+        self.coalesced_requests: Dict[int, int] = {}
+
+    def _get_client(self, agent_port: int) -> httpx.AsyncClient:
+        """Пул keep-alive соединений к агенту на порту (создается лениво)"""
+        client = self._clients.get(agent_port)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=f"{self.base_url}:{agent_port}",
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_max_connections,
+                    max_keepalive_connections=self.pool_max_keepalive,
+                    keepalive_expiry=self.pool_keepalive_expiry
+                )
+            )
+            self._clients[agent_port] = client
+        return client
+
+    async def release_client(self, agent_port: int) -> None:
+        """Закрытие пула соединений агента (например, после удаления агента)"""
+        circuit_breakers.forget(agent_port)
+        self.coalesced_requests.pop(agent_port, None)
+        client = self._clients.pop(agent_port, None)
+        if client is not None:
+            await client.aclose()
+
+    async def close(self) -> None:
+        """Закрытие всех пулов соединений (при остановке бэкенда)"""
+        for agent_port in list(self._clients):
+            await self.release_client(agent_port)
+
+    async def send_message(self, agent_port: int, message: str, sender: str = "user",
+                           slot: Optional[Callable[[], AsyncContextManager]] = None) -> Dict[str, Any]:
+        """
+        Отправка сообщения Rasa агенту через circuit breaker порта.
 
-    async def send_message(self, agent_port: int, message: str, sender: str = "user") -> Dict[str, Any]:
+        Одинаковые запросы, уже находящиеся в полете, не дублируются —
+        вызывающие получают результат одного общего запроса. Слот допуска
+        (`slot`, например admission_controller.slot) занимает только
+        первый из них, поэтому дубли не расходуют лимит агента.
+        Если breaker разомкнут, выбрасывается CircuitOpenError.
+        """
+        key = (agent_port, sender, message)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced_requests[agent_port] = self.coalesced_requests.get(agent_port, 0) + 1
+            return await asyncio.shield(inflight)
+
+        breaker = circuit_breakers.get(agent_port)
+        if breaker.is_open():
+            # Отказываем сразу, не занимая очередь допуска
+            breaker.rejected_calls += 1
+            raise CircuitOpenError(agent_port, breaker.retry_after())
+
+        task = asyncio.ensure_future(self._lead(breaker, agent_port, message, sender, slot))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _lead(self, breaker, agent_port: int, message: str, sender: str,
+                    slot: Optional[Callable[[], AsyncContextManager]]) -> Dict[str, Any]:
+        if slot is None:
+            return await self._post_and_record(breaker, agent_port, message, sender)
+        async with slot():
+            return await self._post_and_record(breaker, agent_port, message, sender)
+
+    async def _post_and_record(self, breaker, agent_port: int, message: str, sender: str) -> Dict[str, Any]:
+        # Пробный слот half_open занимаем, только когда запрос действительно уходит
+        if not breaker.allow_request():
+            raise CircuitOpenError(agent_port, breaker.retry_after())
+        result = await self._post_message(agent_port, message, sender)
+        if result["success"]:
+            breaker.record_success()
+        else:
+            breaker.record_failure(result.get("error"))
+        return result
+
+    async def _post_message(self, agent_port: int, message: str, sender: str) -> Dict[str, Any]:
         """
         Отправка сообщения Rasa агенту и получение ответа
         """
         try:
-            # Основной запрос к Rasa
-            url = f"{self.base_url}:{agent_port}/webhooks/rest/webhook"
-
             payload = {
                 "sender": sender,
                 "message": message
             }
 
             print(f"🔵 Отправляем сообщение '{message}' на порт {agent_port}")
-            response = requests.post(url, json=payload, timeout=10)
+            webhook = self._get_client(agent_port).post("/webhooks/rest/webhook", json=payload)
+            if self._should_parse():
+                # Разбор NLU идет параллельно с ответом бота по тому же пулу соединений
+                response, parse_data = await asyncio.gather(webhook, self.parse_message(agent_port, message))
+            else:
+                response, parse_data = await webhook, None
 
             if response.status_code == 200:
                 rasa_response = response.json()
@@ -37,8 +129,11 @@ class RasaIntegration:
 
                 print(f"🟢 Rasa ответил: {responses}")
 
-                # Получаем метаданные через УМНУЮ заглушку
-                metadata = self._get_smart_metadata(message, responses)
+                if parse_data:
+                    metadata = self._parse_metadata(message, parse_data)
+                else:
+                    # Разбор выключен или недоступен — метаданные через УМНУЮ заглушку
+                    metadata = self._get_smart_metadata(message, responses)
 
                 return {
                     "success": True,
@@ -66,6 +161,61 @@ class RasaIntegration:
                 "metadata": None
             }
 
+    def _should_parse(self) -> bool:
+        if self.parse_mode == "parallel":
+            return True
+        if self.parse_mode == "sampled":
+            return random.random() * 100 < self.parse_sample_percent
+        return False
+
+    async def parse_message(self, agent_port: int, message: str) -> Optional[Dict[str, Any]]:
+        """
+        Разбор сообщения через /model/parse (интент, ранжирование, сущности).
+        Ошибки разбора не считаются ошибками агента — возвращаем None.
+        """
+        try:
+            response = await self._get_client(agent_port).post("/model/parse", json={"text": message})
+            if response.status_code == 200:
+                return response.json()
+            print(f"🟠 /model/parse на порту {agent_port}: HTTP {response.status_code}")
+        except Exception as e:
+            print(f"🟠 /model/parse на порту {agent_port}: {e}")
+        return None
+
+    def _parse_metadata(self, message: str, parse_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Метаданные трассировки из ответа /model/parse
+        """
+        intent = parse_data.get("intent") or {}
+        confidence = intent.get("confidence")
+
+        entities = []
+        for entity in parse_data.get("entities", []):
+            entities.append({
+                "entity": entity.get("entity", ""),
+                "value": str(entity.get("value", "")),
+                "confidence": entity.get("confidence_entity", entity.get("confidence")),
+                "start": entity.get("start"),
+                "end": entity.get("end")
+            })
+
+        return {
+            "intent": {
+                "name": intent.get("name"),
+                "confidence": confidence
+            },
+            "intent_ranking": [
+                {"name": item.get("name"), "confidence": item.get("confidence", 0.0)}
+                for item in parse_data.get("intent_ranking", [])
+                if item.get("name")
+            ],
+            "entities": entities,
+            "timestamp": datetime.now().isoformat(),
+            "confidence": confidence,
+            "text": parse_data.get("text", message),
+            "source": "rasa"
+        }
+
     def _get_smart_metadata(self, message: str, responses: List[str]) -> Dict[str, Any]:
         """
         Умная заглушка для метаданных - определяет интент по ключевым словам
@@ -106,127 +256,20 @@ class RasaIntegration:
             "entities": entities,
             "timestamp": datetime.now().isoformat(),
             "confidence": confidence,
-            "text": message
+            "text": message,
+            "source": "keywords"
         }
 
-    def check_agent_health(self, agent_port: int) -> bool:
+    async def check_agent_health(self, agent_port: int) -> bool:
         """
         Проверка доступности Rasa сервера
         """
         try:
-            response = requests.get(f"{self.base_url}:{agent_port}/", timeout=3)
+            response = await self._get_client(agent_port).get("/", timeout=self.health_timeout)
             return response.status_code == 200
-        except:
+        except Exception:
             return False
 
-    def stop_agent(self, agent_port: int) -> dict:
-        """Попытаться обнаружить процесс, слушающий порт, и завершить его.
-
-        Возвращает dict: {success: bool, message: str}
-        """
-        import re
-        try:
-            # 0) try graceful HTTP shutdown if agent exposes it
-            try:
-                import requests
-                shutdown_url = f"{self.base_url}:{agent_port}/shutdown"
-                res = requests.post(shutdown_url, timeout=3)
-                if res.status_code in (200, 204):
-                    return {"success": True, "message": f"Requested graceful shutdown at {shutdown_url}"}
-            except Exception:
-                pass
-
-            # 1) try ss
-            # 5) try Docker socket to stop container exposing the port
-            try:
-                import docker as _docker
-                try:
-                    client = _docker.from_env()
-                    for cont in client.containers.list():
-                        ports = cont.attrs.get('NetworkSettings', {}).get('Ports') or {}
-                        for key, mappings in (ports.items() if isinstance(ports, dict) else []):
-                            if not mappings:
-                                continue
-                            for mapping in mappings:
-                                host_port = mapping.get('HostPort')
-                                if host_port and int(host_port) == agent_port:
-                                    try:
-                                        cont.stop(timeout=5)
-                                        return {"success": True, "message": f"Stopped container {cont.name} exposing port {agent_port} (via docker socket)"}
-                                    except Exception as e:
-                                        return {"success": False, "message": f"Failed to stop container {cont.name}: {e}"}
-                except Exception:
-                    pass
-            except Exception:
-                pass
-            try:
-                res = subprocess.run(["ss", "-ltnp"], capture_output=True, text=True)
-                out = res.stdout or res.stderr
-                m = re.search(rf"[:.]?{agent_port}\b.*pid=(\d+),", out)
-                if m:
-                    pid = int(m.group(1))
-                    try:
-                        os.kill(pid, 15)
-                    except Exception:
-                        try:
-                            os.kill(pid, 9)
-                        except Exception as e:
-                            return {"success": False, "message": f"Failed to kill pid {pid}: {e}"}
-                    return {"success": True, "message": f"Killed pid: {pid} (via ss)"}
-            except FileNotFoundError:
-                pass
-
-            # 2) try netstat
-            try:
-                res = subprocess.run(["netstat", "-ltnp"], capture_output=True, text=True)
-                out = res.stdout or res.stderr
-                # netstat output often contains "pid/program" in the last column
-                m = re.search(rf":{agent_port}\b.*?(\d+)/(\S+)", out)
-                if m:
-                    pid = int(m.group(1))
-                    try:
-                        os.kill(pid, 15)
-                    except Exception:
-                        try:
-                            os.kill(pid, 9)
-                        except Exception as e:
-                            return {"success": False, "message": f"Failed to kill pid {pid}: {e}"}
-                    return {"success": True, "message": f"Killed pid: {pid} (via netstat)"}
-            except FileNotFoundError:
-                pass
-
-            # 3) try fuser
-            try:
-                res = subprocess.run(["fuser", f"{agent_port}/tcp", "-k"], capture_output=True, text=True)
-                if res.returncode == 0:
-                    return {"success": True, "message": f"Killed processes using port {agent_port} (via fuser)"}
-            except FileNotFoundError:
-                pass
-
-            # 4) try psutil if available
-            try:
-                import psutil
-                for conn in psutil.net_connections():
-                    laddr = getattr(conn, 'laddr', None)
-                    if laddr and getattr(laddr, 'port', None) == agent_port:
-                        pid = conn.pid
-                        if pid:
-                            try:
-                                os.kill(pid, 15)
-                            except Exception:
-                                try:
-                                    os.kill(pid, 9)
-                                except Exception as e:
-                                    return {"success": False, "message": f"Failed to kill pid {pid}: {e}"}
-                            return {"success": True, "message": f"Killed pid: {pid} (via psutil)"}
-            except Exception:
-                pass
-
-            return {"success": False, "message": f"No available method found to stop process on port {agent_port} or no process found"}
-
-        except Exception as e:
-            return {"success": False, "message": str(e)}
-
     def train_agent(self, agent_id: int, agent_port: int, nlu_path: str = None, domain_path: str = None, model_path: str = None, config_path: str = None):
         """
         Тренировка агента.
@@ -235,6 +278,10 @@ class RasaIntegration:
         Если `rasa` отсутствует — падаем обратно в симуляцию (sleep).
 
         По результату обновляем состояние агента через `agent_service`.
+
+        Метод блокирующий (subprocess.run до 30 минут, time.sleep в
+        симуляции): вызывать только вне event loop — в отдельном потоке
+        (см. train_agent_task) или через asyncio.to_thread.
         """
         from backend.services.agent_service import agent_service
 
@@ -1,20 +1,43 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from typing import List
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, WebSocket, WebSocketDisconnect
+from typing import Awaitable, Callable, List, Dict, Any, Optional, Set, Tuple
+import asyncio
+import json
+import os
 import time
+import uuid
+from datetime import datetime
 
-from backend.models import Agent, AgentCreate, TrainingRequest, MessageRequest, MessageResponse, TraceMetadata, \
-    IntentInfo, EntityInfo, DialogLogCreate
+from backend.models import Agent, AgentCreate, AgentDetail, AgentUpdate, TrainingRequest, MessageRequest, MessageResponse, TraceMetadata, \
+    IntentInfo, EntityInfo, DialogLogCreate, BatchMessageRequest, BatchMessageResponse, AgentStatus
 from backend.services.agent_service import agent_service
 from backend.rasa_integration import rasa_integration
 from backend.dialog_logger import dialog_logger
-from backend.rasa_integration import rasa_integration
+from backend.services.health_monitor import health_monitor
+from backend.services.circuit_breaker import circuit_breakers, CircuitOpenError
+from backend.services.response_cache import response_cache
+from backend.services.admission import admission_controller, AdmissionRejected
+from backend.services.latency_metrics import latency_metrics
+from backend.services.port_pool import PortPoolExhausted
+from backend.services.agent_supervisor import agent_supervisor
+from backend.services.idle_scheduler import idle_scheduler
+from backend.fallback_classifier import fallback_responder
 
 router = APIRouter(prefix="/api/agents", tags=["agents"])
 
+# Ограничения пакетной отправки сообщений
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "1000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+# Фоновые задачи логирования (держим ссылки, чтобы их не собрал GC)
+_background_log_tasks: Set[asyncio.Task] = set()
+
 
 @router.post("/", response_model=Agent)
 async def create_agent(agent: AgentCreate):
-    return agent_service.create_agent(agent)
+    try:
+        return agent_service.create_agent(agent)
+    except PortPoolExhausted as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 
 @router.get("/", response_model=List[Agent])
@@ -22,11 +45,57 @@ async def list_agents():
     return agent_service.get_all_agents()
 
 
-@router.get("/{agent_id}", response_model=Agent)
+@router.get("/health")
+async def get_agents_health():
+    """Таблица доступности агентов, которую ведет фоновый монитор"""
+    return {
+        "interval_s": health_monitor.interval,
+        "agents": health_monitor.snapshot()
+    }
+
+
+@router.get("/{agent_id}", response_model=AgentDetail)
 async def get_agent(agent_id: int):
     agent = agent_service.get_agent(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
+    return AgentDetail(**agent.dict(), runtime=_agent_runtime(agent))
+
+
+def _agent_runtime(agent: Agent) -> Dict[str, Any]:
+    """Состояние агента во время работы: доступность и защита от перегрузки"""
+    health = health_monitor.liveness.get(agent.id)
+    return {
+        "alive": health["alive"] if health else None,
+        "circuit_breaker": circuit_breakers.snapshot(agent.port),
+        "coalesced_requests": rasa_integration.coalesced_requests.get(agent.port, 0),
+        "admission": admission_controller.snapshot(agent),
+        "response_cache": response_cache.agent_stats(agent.id) if agent.response_cache_enabled else None
+    }
+
+
+@router.get("/{agent_id}/metrics/latency")
+async def get_agent_latency(agent_id: int):
+    """Перцентили задержки обмена с агентом за последние 1m, 15m и 24h"""
+    agent = agent_service.get_agent(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    return {
+        "agent_id": agent_id,
+        "precision": latency_metrics.precision,
+        "windows": latency_metrics.snapshot(agent_id)
+    }
+
+
+@router.patch("/{agent_id}", response_model=Agent)
+async def update_agent(agent_id: int, agent_update: AgentUpdate):
+    """Изменение настроек агента"""
+    agent = agent_service.update_agent(agent_id, agent_update)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    if agent.pinned and idle_scheduler.is_sleeping(agent):
+        # Закрепленный агент должен быть прогрет, не дожидаясь сообщения
+        idle_scheduler.wake(agent)
     return agent
 
 
@@ -40,133 +109,438 @@ async def train_agent(agent_id: int, background_tasks: BackgroundTasks):
     return {"message": f"Training started for agent {agent.name}"}
 
 
+def _build_trace_metadata(metadata: Optional[Dict[str, Any]]) -> Optional[TraceMetadata]:
+    """Формирование метаданных трассировки из ответа интеграции"""
+    if not metadata:
+        return None
+
+    # Создаем информацию об интенте
+    intent_info = None
+    if metadata.get("intent") and metadata["intent"].get("name"):
+        intent_info = IntentInfo(
+            name=metadata["intent"]["name"],
+            confidence=metadata["intent"].get("confidence") or 0.0
+        )
+
+    # Создаем информацию о сущностях
+    entities_info = []
+    for entity in metadata.get("entities", []):
+        entities_info.append(EntityInfo(
+            entity=entity.get("entity", ""),
+            value=entity.get("value", ""),
+            confidence=entity.get("confidence"),
+            start=entity.get("start"),
+            end=entity.get("end")
+        ))
+
+    intent_ranking = [
+        IntentInfo(name=item["name"], confidence=item.get("confidence") or 0.0)
+        for item in metadata.get("intent_ranking", [])
+    ]
+
+    return TraceMetadata(
+        intent=intent_info,
+        intent_ranking=intent_ranking,
+        entities=entities_info,
+        timestamp=metadata.get("timestamp", ""),
+        confidence=metadata.get("confidence"),
+        text=metadata.get("text", ""),
+        source=metadata.get("source")
+    )
+
+
+class MessageExchangeError(Exception):
+    """Непредвиденная ошибка обмена с агентом вместе с записью для журнала"""
+
+    def __init__(self, error: Exception, log_data: DialogLogCreate):
+        super().__init__(str(error))
+        self.log_data = log_data
+
+
+async def _is_agent_available(agent: Agent) -> bool:
+    # Спящего агента будим; сообщение ждет окончания прогрева
+    if not await idle_scheduler.ensure_awake(agent):
+        return False
+    # Проверяем доступность агента по таблице монитора; пробуем заново,
+    # только если агент еще не проверялся или запись о недоступности устарела
+    alive = health_monitor.is_alive(agent.id)
+    if alive is None or (not alive and health_monitor.is_stale(agent.id)):
+        alive = await health_monitor.probe_agent(agent)
+    return alive
+
+
+def _unavailable_error(agent: Agent) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"Agent {agent.name} is not running on port {agent.port}. Please start the Rasa server."
+    )
+
+
+async def _ensure_agent_available(agent: Agent) -> bool:
+    """Доступен ли агент; 503, если нет и ответить резервным классификатором нельзя"""
+    available = await _is_agent_available(agent)
+    if not available and not fallback_responder.enabled:
+        raise _unavailable_error(agent)
+    return available
+
+
+def _circuit_open_http_error(agent: Agent, error: CircuitOpenError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"Agent {agent.name} is shedding load: {error}",
+        headers={"Retry-After": str(max(int(error.retry_after + 0.999), 1))}
+    )
+
+
+def _admission_http_error(agent: Agent, error: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"Agent {agent.name} is busy: {error}",
+        headers={"Retry-After": str(max(int(error.retry_after + 0.999), 1))}
+    )
+
+
+async def _exchange(agent: Agent, message: MessageRequest,
+                    availability: Optional[Callable[[], Awaitable[bool]]] = None,
+                    queue_limited: bool = True) -> Tuple[MessageResponse, DialogLogCreate]:
+    """Один обмен с агентом: ответ для клиента и запись для журнала диалогов.
+
+    Ответ из кэша не обращается к процессу агента; доступность агента
+    (`availability`, по умолчанию _ensure_agent_available) проверяется
+    только при промахе кэша.
+
+    Если агент недоступен, его circuit breaker разомкнут или запрос не удался,
+    отвечает резервный классификатор (при наличии NLU данных агента).
+    Запрос к Rasa проходит через контроль допуска: если все слоты агента
+    заняты и очередь полна, выбрасывается AdmissionRejected.
+    """
+    start_time = time.time()
+
+    # FAQ агенты с включенным кэшем отвечают из кэша без обращения к Rasa
+    use_cache = response_cache.is_enabled_for(agent)
+    cache_generation = response_cache.generation(agent.id) if use_cache else None
+    result = response_cache.get(agent, message.message) if use_cache else None
+
+    try:
+        available = True
+        if result is None:
+            available = await (availability() if availability else _ensure_agent_available(agent))
+        if result is None and not available:
+            result = await fallback_responder.respond(agent, message.message)
+            if result is None:
+                raise _unavailable_error(agent)
+        elif result is None:
+            try:
+                # Отправляем сообщение Rasa агенту, не превышая его лимит параллелизма;
+                # слот занимает только первый из одинаковых запросов в полете
+                result = await rasa_integration.send_message(
+                    agent.port, message.message, message.sender,
+                    slot=lambda: admission_controller.slot(agent, queue_limited)
+                )
+            except CircuitOpenError:
+                result = await fallback_responder.respond(agent, message.message)
+                if result is None:
+                    raise
+            if result["success"] and use_cache and not result.get("fallback"):
+                response_cache.put(agent, message.message, result, generation=cache_generation)
+            elif not result["success"]:
+                fallback = await fallback_responder.respond(agent, message.message)
+                if fallback is not None:
+                    result = dict(fallback, error=result["error"])
+
+        if result["success"] and (result.get("metadata") or {}).get("source") == "keywords":
+            # /model/parse не вызывался — интент точнее определит резервный классификатор
+            metadata = await fallback_responder.metadata(agent, message.message)
+            if metadata is not None:
+                result = dict(result, metadata=metadata)
+    except (CircuitOpenError, AdmissionRejected, HTTPException):
+        raise
+    except Exception as e:
+        processing_time_ms = (time.time() - start_time) * 1000
+        raise MessageExchangeError(e, DialogLogCreate(
+            agent_id=agent.id,
+            sender=message.sender,
+            user_message=message.message,
+            bot_response=[f"Unexpected error: {str(e)}"],
+            processing_time_ms=processing_time_ms
+        ))
+    processing_time_ms = (time.time() - start_time) * 1000
+
+    if result["success"]:
+        trace_metadata = _build_trace_metadata(result.get("metadata"))
+
+        log_data = DialogLogCreate(
+            agent_id=agent.id,
+            sender=message.sender,
+            user_message=message.message,
+            bot_response=result["responses"],
+            intent=trace_metadata.intent.name if trace_metadata and trace_metadata.intent else None,
+            intent_confidence=trace_metadata.intent.confidence if trace_metadata and trace_metadata.intent else None,
+            entities=[entity.dict() for entity in trace_metadata.entities] if trace_metadata else [],
+            processing_time_ms=processing_time_ms
+        )
+        response = MessageResponse(
+            response=result["responses"],
+            agent_id=agent.id,
+            trace_metadata=trace_metadata,
+            success=True,
+            error=result.get("error"),
+            fallback=result.get("fallback", False),
+            processing_time_ms=processing_time_ms
+        )
+    else:
+        log_data = DialogLogCreate(
+            agent_id=agent.id,
+            sender=message.sender,
+            user_message=message.message,
+            bot_response=[f"Error: {result['error']}"],
+            processing_time_ms=processing_time_ms
+        )
+        response = MessageResponse(
+            response=[f"Error communicating with agent: {result['error']}"],
+            agent_id=agent.id,
+            success=False,
+            error=result["error"],
+            processing_time_ms=processing_time_ms
+        )
+
+    return response, log_data
+
+
 @router.post("/{agent_id}/message", response_model=MessageResponse)
 async def send_message(agent_id: int, message: MessageRequest):
     """Отправка сообщения агенту"""
+    agent = agent_service.get_agent(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    try:
+        response, log_data = await _exchange(agent, message)
+    except CircuitOpenError as e:
+        # Агент сбрасывает нагрузку — отвечаем сразу, без журнала
+        raise _circuit_open_http_error(agent, e)
+    except AdmissionRejected as e:
+        raise _admission_http_error(agent, e)
+    except MessageExchangeError as e:
+        # Логируем исключение
+        await dialog_logger.log_dialog(e.log_data)
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+    # Логируем диалог
+    await dialog_logger.log_dialog(log_data)
+    return response
+
+
+@router.post("/{agent_id}/messages:batch", response_model=BatchMessageResponse)
+async def send_messages_batch(agent_id: int, batch: BatchMessageRequest):
+    """Пакетная отправка сообщений агенту с ограниченным параллелизмом"""
     start_time = time.time()
 
     agent = agent_service.get_agent(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    # Проверяем доступность агента
-    if not rasa_integration.check_agent_health(agent.port):
+    if len(batch.messages) > BATCH_MAX_SIZE:
         raise HTTPException(
-            status_code=503,
-            detail=f"Agent {agent.name} is not running on port {agent.port}. Please start the Rasa server."
+            status_code=413,
+            detail=f"Batch is too large: {len(batch.messages)} messages, maximum is {BATCH_MAX_SIZE}"
         )
 
+    # Доступность агента проверяется один раз на пакет и только при промахе кэша
+    availability: Optional[asyncio.Future] = None
+
+    def check_available() -> asyncio.Future:
+        nonlocal availability
+        if availability is None:
+            availability = asyncio.ensure_future(_ensure_agent_available(agent))
+        return availability
+
+    concurrency = min(batch.concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(message: MessageRequest) -> Tuple[MessageResponse, Optional[DialogLogCreate]]:
+        async with semaphore:
+            try:
+                # Пакет сам ограничивает параллелизм, поэтому его сообщения
+                # ждут свободного слота агента без лимита очереди
+                return await _exchange(agent, message, check_available, queue_limited=False)
+            except HTTPException as e:
+                return MessageResponse(
+                    response=[],
+                    agent_id=agent.id,
+                    success=False,
+                    error=str(e.detail),
+                    processing_time_ms=0.0
+                ), None
+            except CircuitOpenError as e:
+                return MessageResponse(
+                    response=[],
+                    agent_id=agent.id,
+                    success=False,
+                    error=str(e),
+                    processing_time_ms=0.0
+                ), None
+            except MessageExchangeError as e:
+                return MessageResponse(
+                    response=[f"Unexpected error: {str(e)}"],
+                    agent_id=agent.id,
+                    success=False,
+                    error=str(e),
+                    processing_time_ms=e.log_data.processing_time_ms
+                ), e.log_data
+
+    exchanges = await asyncio.gather(*(run(message) for message in batch.messages))
+
+    # Весь пакет логируем одной записью
+    await dialog_logger.log_dialogs([log_data for _, log_data in exchanges if log_data])
+
+    results = [response for response, _ in exchanges]
+    succeeded = sum(1 for response in results if response.success)
+    return BatchMessageResponse(
+        agent_id=agent_id,
+        results=results,
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        processing_time_ms=(time.time() - start_time) * 1000
+    )
+
+
+def _log_in_background(log_data: DialogLogCreate) -> None:
+    """Логирование диалога вне пути ответа клиенту"""
+    task = asyncio.create_task(dialog_logger.log_dialog(log_data))
+    _background_log_tasks.add(task)
+    task.add_done_callback(_background_log_tasks.discard)
+
+
+@router.websocket("/{agent_id}/ws")
+async def chat_websocket(websocket: WebSocket, agent_id: int, sender: Optional[str] = None):
+    """Чат с агентом через WebSocket: одна сессия на разговор.
+
+    Клиент шлет {"message": "...", "sender": "..."} (или просто текст).
+    Сервер отвечает кадрами {"type": "bot_message"} по каждой реплике бота,
+    затем {"type": "done"} с полями MessageResponse; ошибки — {"type": "error"}.
+    """
+    await websocket.accept()
+
+    if not agent_service.get_agent(agent_id):
+        await websocket.send_json({"type": "error", "status_code": 404, "error": "Agent not found"})
+        await websocket.close(code=4404)
+        return
+
+    session_sender = sender or f"ws-{uuid.uuid4().hex[:12]}"
+
     try:
-        # Отправляем сообщение Rasa агенту
-        result = await rasa_integration.send_message(agent.port, message.message, message.sender)
-        processing_time_ms = (time.time() - start_time) * 1000
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                payload = json.loads(raw)
+            except ValueError:
+                payload = raw
+            if not isinstance(payload, dict):
+                payload = {"message": str(payload)}
 
-        if result["success"]:
-            # Формируем метаданные трассировки
-            trace_metadata = None
-            if result.get("metadata"):
-                metadata = result["metadata"]
-
-                # Создаем информацию об интенте
-                intent_info = None
-                if metadata.get("intent") and metadata["intent"].get("name"):
-                    intent_info = IntentInfo(
-                        name=metadata["intent"]["name"],
-                        confidence=metadata["intent"].get("confidence", 0.0)
-                    )
-
-                # Создаем информацию о сущностях
-                entities_info = []
-                for entity in metadata.get("entities", []):
-                    entities_info.append(EntityInfo(
-                        entity=entity.get("entity", ""),
-                        value=entity.get("value", ""),
-                        confidence=entity.get("confidence"),
-                        start=entity.get("start"),
-                        end=entity.get("end")
-                    ))
-
-                trace_metadata = TraceMetadata(
-                    intent=intent_info,
-                    entities=entities_info,
-                    timestamp=metadata.get("timestamp", ""),
-                    confidence=metadata.get("confidence"),
-                    text=metadata.get("text", "")
-                )
+            if not payload.get("message"):
+                await websocket.send_json({"type": "error", "status_code": 422, "error": "Field 'message' is required"})
+                continue
+            message = MessageRequest(message=payload["message"], sender=payload.get("sender") or session_sender)
 
-            # Логируем диалог
-            log_data = DialogLogCreate(
-                agent_id=agent_id,
-                sender=message.sender,
-                user_message=message.message,
-                bot_response=result["responses"],
-                intent=trace_metadata.intent.name if trace_metadata and trace_metadata.intent else None,
-                intent_confidence=trace_metadata.intent.confidence if trace_metadata and trace_metadata.intent else None,
-                entities=[entity.dict() for entity in trace_metadata.entities] if trace_metadata else [],
-                processing_time_ms=processing_time_ms
-            )
-            await dialog_logger.log_dialog(log_data)
-
-            return MessageResponse(
-                response=result["responses"],
-                agent_id=agent_id,
-                trace_metadata=trace_metadata,
-                success=True
-            )
-        else:
-            # Логируем ошибку
-            log_data = DialogLogCreate(
-                agent_id=agent_id,
-                sender=message.sender,
-                user_message=message.message,
-                bot_response=[f"Error: {result['error']}"],
-                processing_time_ms=processing_time_ms
-            )
-            await dialog_logger.log_dialog(log_data)
-
-            return MessageResponse(
-                response=[f"Error communicating with agent: {result['error']}"],
-                agent_id=agent_id,
-                success=False,
-                error=result["error"]
-            )
+            # Агента могли удалить, пока сессия открыта
+            agent = agent_service.get_agent(agent_id)
+            if not agent:
+                await websocket.send_json({"type": "error", "status_code": 404, "error": "Agent not found"})
+                await websocket.close(code=4404)
+                return
 
-    except Exception as e:
-        processing_time_ms = (time.time() - start_time) * 1000
+            try:
+                response, log_data = await _exchange(agent, message)
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "status_code": e.status_code, "error": e.detail})
+                continue
+            except CircuitOpenError as e:
+                await websocket.send_json({
+                    "type": "error", "status_code": 503, "error": str(e), "retry_after": round(e.retry_after, 1)
+                })
+                continue
+            except AdmissionRejected as e:
+                await websocket.send_json({
+                    "type": "error", "status_code": 429, "error": str(e), "retry_after": round(e.retry_after, 1)
+                })
+                continue
+            except MessageExchangeError as e:
+                _log_in_background(e.log_data)
+                await websocket.send_json({"type": "error", "status_code": 500, "error": f"Unexpected error: {str(e)}"})
+                continue
 
-        # Логируем исключение
-        log_data = DialogLogCreate(
-            agent_id=agent_id,
-            sender=message.sender,
-            user_message=message.message,
-            bot_response=[f"Unexpected error: {str(e)}"],
-            processing_time_ms=processing_time_ms
-        )
-        await dialog_logger.log_dialog(log_data)
+            # Реплики бота отправляем сразу, журнал пишем в фоне
+            for index, text in enumerate(response.response if response.success else []):
+                await websocket.send_json({"type": "bot_message", "index": index, "text": text})
+            _log_in_background(log_data)
+            await websocket.send_json({"type": "done", **json.loads(response.json())})
 
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    except WebSocketDisconnect:
+        pass
 
 
 @router.delete("/{agent_id}")
 async def delete_agent(agent_id: int):
+    agent = agent_service.get_agent(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    # Процесс останавливаем до того, как порт вернется в пул
+    await agent_supervisor.forget(agent_id)
     if not agent_service.delete_agent(agent_id):
         raise HTTPException(status_code=404, detail="Agent not found")
+    await rasa_integration.release_client(agent.port)
+    health_monitor.forget(agent_id)
+    fallback_responder.forget(agent_id)
+    admission_controller.forget(agent_id)
+    latency_metrics.forget(agent_id)
+    idle_scheduler.forget(agent_id)
     return {"message": f"Agent {agent_id} deleted"}
 
 
+@router.post("/{agent_id}/start")
+async def start_agent(agent_id: int):
+    """Запустить процесс агента под управлением супервизора"""
+    agent = agent_service.get_agent(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    if idle_scheduler.is_sleeping(agent):
+        await idle_scheduler.ensure_awake(agent)
+    managed = agent_supervisor.start(agent)
+    return {"message": f"Agent {agent_id} started", "process": managed.snapshot()}
+
+
 @router.post("/{agent_id}/stop")
 async def stop_agent(agent_id: int):
-    """Остановить процесс агента, слушающий его порт (если возможно)."""
+    """Остановить процесс агента, запущенный супервизором (чужой процесс
+    на порту агента — только при AGENT_STOP_UNMANAGED=true)"""
     agent = agent_service.get_agent(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
+    detail = None
+    if not await agent_supervisor.stop(agent_id):
+        if not agent_supervisor.stop_unmanaged:
+            raise HTTPException(status_code=409, detail="Agent process is not managed by the backend")
+        detail = await agent_supervisor.stop_port(agent.port)
+        if detail is None:
+            raise HTTPException(status_code=500, detail=f"No process found on port {agent.port}")
 
-    result = rasa_integration.stop_agent(agent.port)
-    if result.get("success"):
-        agent.status = "stopped"
-        agent.requires_training = False
-        agent.updated_at = __import__('datetime').datetime.now().isoformat()
-        agent_service.save_state()
-        return {"message": f"Agent {agent_id} stopped", "detail": result.get("message")}
-    else:
-        raise HTTPException(status_code=500, detail=result.get("message"))
\ No newline at end of file
+    agent.status = AgentStatus.STOPPED
+    agent.requires_training = False
+    agent.updated_at = datetime.now().isoformat()
+    agent_service.save_state()
+    return {"message": f"Agent {agent_id} stopped", "detail": detail, "process": agent_supervisor.status(agent_id)}
+
+
+@router.get("/{agent_id}/process")
+async def get_agent_process(agent_id: int, tail: int = Query(100, ge=0, le=10000)):
+    """Состояние процесса агента и последние строки его вывода"""
+    agent = agent_service.get_agent(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    return {
+        "process": agent_supervisor.status(agent_id),
+        "logs": agent_supervisor.logs(agent_id, tail) if tail else []
+    }
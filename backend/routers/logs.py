@@ -1,31 +1,219 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Literal
+from datetime import datetime
+import base64
+import csv
+import io
+import json
+import os
+import zlib
 
-from backend.models import DialogLog
+from backend.models import DialogLog, DialogLogPage, DialogLogSearchHit, DialogLogSearchPage, LogQuery
 from backend.dialog_logger import dialog_logger
 from backend.services.agent_service import agent_service
+from backend.services.log_retention import log_retention
 
 router = APIRouter(prefix="/api/agents/{agent_id}/logs", tags=["Logs"])
 
+# Размер страницы логов
+LOGS_PAGE_DEFAULT = int(os.getenv("LOGS_PAGE_DEFAULT", "50"))
+LOGS_PAGE_MAX = int(os.getenv("LOGS_PAGE_MAX", "1000"))
+# Сколько записей читать из хранилища за раз при экспорте
+EXPORT_CHUNK_SIZE = int(os.getenv("LOGS_EXPORT_CHUNK_SIZE", "1000"))
 
-@router.get("/", response_model=List[DialogLog])
-async def get_agent_logs(agent_id: int, limit: Optional[int] = None, intent: Optional[str] = None):
-    """Получение логов диалогов для агента"""
+
+def _encode_cursor(log: DialogLog) -> str:
+    raw = json.dumps([log.timestamp, log.id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        timestamp, log_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(timestamp), int(log_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _normalize_timestamp(value: Optional[str], name: str) -> Optional[str]:
+    """Приводим границу диапазона к формату меток времени логов (isoformat).
+
+    Метки логов хранятся без часового пояса (datetime.now() сервера), поэтому
+    граница со смещением (например, `...Z` или `+03:00`) переводится во время
+    сервера и теряет tzinfo — иначе строки сравнивались бы посимвольно с
+    хвостом смещения и в разных поясах. На сервере в UTC это наивное UTC.
+    """
+    if not value:
+        return None
+    try:
+        # fromisoformat до Python 3.11 не понимает суффикс Z
+        moment = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith(("Z", "z")) else value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid '{name}': expected ISO 8601 timestamp")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.isoformat()
+
+
+def _log_filters(
+        agent_id: int,
+        intent: Optional[str] = None,
+        sender: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        min_confidence: Optional[float] = None,
+        max_confidence: Optional[float] = None,
+        errors_only: bool = False,
+        order: Literal["desc", "asc"] = "desc"
+) -> LogQuery:
+    """Общие фильтры списка и экспорта логов"""
     agent = agent_service.get_agent(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    logs = dialog_logger.get_logs_by_agent(agent_id)
+    return LogQuery(
+        agent_id=agent_id,
+        intent=intent,
+        sender=sender,
+        since=_normalize_timestamp(since, "since"),
+        until=_normalize_timestamp(until, "until"),
+        min_confidence=min_confidence,
+        max_confidence=max_confidence,
+        errors_only=errors_only,
+        descending=order == "desc"
+    )
+
+
+@router.get("/", response_model=DialogLogPage)
+async def get_agent_logs(
+        query: LogQuery = Depends(_log_filters),
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        archived: bool = False
+):
+    """Страница логов диалогов агента (по умолчанию сначала новые).
+
+    Следующая страница запрашивается с `cursor` из `next_cursor` предыдущего
+    ответа и теми же фильтрами. `archived=true` — поиск по архиву записей,
+    вытесненных политикой хранения.
+    """
+    limit = min(limit or LOGS_PAGE_DEFAULT, LOGS_PAGE_MAX)
+    query.after = _decode_cursor(cursor) if cursor else None
+    # Лишняя запись показывает, есть ли следующая страница
+    query.limit = limit + 1
+    # Фильтрация, сортировка и ограничение выполняются в хранилище
+    logs = dialog_logger.get_logs_page(query, archived=archived)
+
+    items = logs[:limit]
+    next_cursor = _encode_cursor(items[-1]) if len(logs) > limit else None
+    return DialogLogPage(items=items, next_cursor=next_cursor, limit=limit)
+
+
+CSV_COLUMNS = ["id", "agent_id", "timestamp", "sender", "user_message", "bot_response", "intent",
+               "intent_confidence", "entities", "processing_time_ms"]
+
+
+def _iter_logs(query: LogQuery, archived: bool) -> Iterator[List[DialogLog]]:
+    """Все подходящие логи страницами по EXPORT_CHUNK_SIZE записей"""
+    query.limit = EXPORT_CHUNK_SIZE
+    while True:
+        logs = dialog_logger.get_logs_page(query, archived=archived)
+        if not logs:
+            return
+        yield logs
+        if len(logs) < EXPORT_CHUNK_SIZE:
+            return
+        query.after = (logs[-1].timestamp, logs[-1].id)
+
+
+def _ndjson_chunks(query: LogQuery, archived: bool) -> Iterator[str]:
+    for logs in _iter_logs(query, archived):
+        yield "".join(json.dumps(log.dict(), ensure_ascii=False) + "\n" for log in logs)
+
+
+def _csv_chunks(query: LogQuery, archived: bool) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for logs in _iter_logs(query, archived):
+        for log in logs:
+            writer.writerow([
+                log.id, log.agent_id, log.timestamp, log.sender, log.user_message,
+                json.dumps(log.bot_response, ensure_ascii=False), log.intent or "",
+                "" if log.intent_confidence is None else log.intent_confidence,
+                json.dumps(log.entities, ensure_ascii=False),
+                "" if log.processing_time_ms is None else log.processing_time_ms
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Заголовок пустого экспорта
+    if buffer.tell():
+        yield buffer.getvalue()
 
-    # Фильтрация по интенту если указана
-    if intent:
-        logs = [log for log in logs if log.intent == intent]
 
-    # Ограничение количества если указано
-    if limit:
-        logs = logs[:limit]
+def _gzip_chunks(chunks: Iterator[str]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 31 — формат gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
 
-    return logs
+
+@router.get("/export")
+def export_agent_logs(
+        query: LogQuery = Depends(_log_filters),
+        format: Literal["ndjson", "csv"] = "ndjson",
+        gzip: bool = False,
+        archived: bool = False
+):
+    """Потоковая выгрузка логов агента в NDJSON или CSV (опционально gzip).
+
+    Фильтры те же, что у списка логов; записи читаются из хранилища
+    страницами, поэтому память не зависит от объема выгрузки.
+    """
+    chunks = _ndjson_chunks(query, archived) if format == "ndjson" else _csv_chunks(query, archived)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv; charset=utf-8"
+    filename = f"agent_{query.agent_id}_logs.{format}"
+    if gzip:
+        chunks = _gzip_chunks(chunks)
+        media_type = "application/gzip"
+        filename += ".gz"
+
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/search", response_model=DialogLogSearchPage)
+async def search_agent_logs(
+        agent_id: int,
+        q: str = Query(..., min_length=1),
+        limit: Optional[int] = None,
+        offset: int = Query(0, ge=0)
+):
+    """Поиск диалогов агента по словам сообщений и ответов.
+
+    Находит записи со всеми словами запроса (с учетом словоформ),
+    сортирует по релевантности (BM25), затем сначала новые.
+    """
+    agent = agent_service.get_agent(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    limit = min(limit or LOGS_PAGE_DEFAULT, LOGS_PAGE_MAX)
+    total, hits = await dialog_logger.search_logs(agent_id, q, offset, limit)
+    return DialogLogSearchPage(
+        items=[DialogLogSearchHit(log=log, score=score) for log, score in hits],
+        total=total,
+        offset=offset,
+        limit=limit,
+        next_offset=offset + limit if offset + limit < total else None
+    )
 
 
 @router.get("/statistics")
@@ -35,7 +223,7 @@ async def get_agent_statistics(agent_id: int):
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    statistics = dialog_logger.get_agent_statistics(agent_id)
+    statistics = await dialog_logger.get_agent_statistics(agent_id)
 
     return {
         "agent_id": agent_id,
@@ -51,16 +239,30 @@ async def get_agent_intents(agent_id: int):
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    logs = dialog_logger.get_logs_by_agent(agent_id)
-    intents = set(log.intent for log in logs if log.intent)
+    intents = await dialog_logger.get_agent_intents(agent_id)
 
     return {
         "agent_id": agent_id,
-        "intents": list(intents),
+        "intents": intents,
         "total_unique_intents": len(intents)
     }
 
 
+@router.get("/archive")
+async def get_agent_logs_archive(agent_id: int):
+    """Сегменты архива логов агента и действующая политика хранения"""
+    agent = agent_service.get_agent(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    return {
+        "agent_id": agent_id,
+        "retention": log_retention.limits(agent),
+        "hot_records": dialog_logger.store.count(agent_id),
+        "archive": dialog_logger.archive.stats(agent_id)
+    }
+
+
 @router.get("/{log_id}")
 async def get_single_log(agent_id: int, log_id: int):
     """Получение конкретного лога по ID"""
@@ -68,8 +270,7 @@ async def get_single_log(agent_id: int, log_id: int):
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    logs = dialog_logger.get_logs_by_agent(agent_id)
-    log = next((log for log in logs if log.id == log_id), None)
+    log = dialog_logger.get_log(agent_id, log_id)
 
     if not log:
         raise HTTPException(status_code=404, detail="Log not found")
@@ -84,6 +285,6 @@ async def clear_agent_logs(agent_id: int):
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    dialog_logger.clear_logs(agent_id)
+    await dialog_logger.clear_logs(agent_id)
 
     return {"message": f"All logs for agent {agent_id} cleared"}
\ No newline at end of file
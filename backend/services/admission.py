@@ -0,0 +1,153 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Any
+
+from backend.models import Agent
+
+
+class AdmissionRejected(Exception):
+    """Очередь агента переполнена — запрос отклонен (HTTP 429)"""
+
+    def __init__(self, agent_id: int, retry_after: float):
+        super().__init__(f"Agent {agent_id} is at capacity, retry in {retry_after:.0f}s")
+        self.agent_id = agent_id
+        self.retry_after = retry_after
+
+
+class AgentGate:
+    """Ограничение одновременных запросов к агенту с ограниченной очередью ожидания.
+
+    Освобождая слот, запрос передает его первому ожидающему (FIFO), поэтому
+    новые запросы не могут обогнать очередь.
+    """
+
+    def __init__(self, limit: int, queue_limit: int):
+        self.limit = limit
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.queued = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.last_wait_ms = 0.0
+        self.avg_service_ms = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        # Примерно столько уйдет на разбор текущей очереди
+        service_s = (self.avg_service_ms or 1000.0) / 1000
+        return max(service_s * (self.queue_depth + 1) / max(self.limit, 1), 1.0)
+
+    async def acquire(self, agent_id: int, queue_limited: bool = True) -> None:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            self._record_wait(0.0)
+            return
+
+        if queue_limited and self.queue_depth >= self.queue_limit:
+            self.rejected += 1
+            raise AdmissionRejected(agent_id, self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        started = time.monotonic()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Слот уже передан нам — возвращаем его следующему
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        self.admitted += 1
+        self._record_wait((time.monotonic() - started) * 1000)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _record_wait(self, wait_ms: float) -> None:
+        self.last_wait_ms = wait_ms
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def record_service_time(self, service_ms: float) -> None:
+        # Скользящее среднее времени обработки для оценки Retry-After
+        self.avg_service_ms = service_ms if not self.avg_service_ms else 0.9 * self.avg_service_ms + 0.1 * service_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.limit,
+            "max_queue": self.queue_limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait_ms / self.admitted, 2) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+            "last_wait_ms": round(self.last_wait_ms, 2),
+            "avg_service_ms": round(self.avg_service_ms, 2)
+        }
+
+
+class AdmissionController:
+    """Шлюзы допуска по агентам; лимиты берутся из настроек агента или окружения"""
+
+    def __init__(self):
+        self.default_concurrency = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "8"))
+        self.default_queue = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+        self._gates: Dict[int, AgentGate] = {}
+
+    def gate(self, agent: Agent) -> AgentGate:
+        limit = agent.max_concurrency or self.default_concurrency
+        queue_limit = agent.max_queue if agent.max_queue is not None else self.default_queue
+        gate = self._gates.get(agent.id)
+        if gate is None:
+            gate = AgentGate(limit, queue_limit)
+            self._gates[agent.id] = gate
+        else:
+            # Лимиты могли поменять через PATCH /api/agents/{id}
+            gate.limit, gate.queue_limit = limit, queue_limit
+        return gate
+
+    @asynccontextmanager
+    async def slot(self, agent: Agent, queue_limited: bool = True):
+        gate = self.gate(agent)
+        await gate.acquire(agent.id, queue_limited)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            gate.record_service_time((time.monotonic() - started) * 1000)
+            gate.release()
+
+    def snapshot(self, agent: Agent) -> Dict[str, Any]:
+        return self.gate(agent).snapshot()
+
+    def in_flight(self, agent_id: int) -> int:
+        """Запросов к агенту в работе и в очереди"""
+        gate = self._gates.get(agent_id)
+        return gate.in_flight + gate.queue_depth if gate else 0
+
+    def forget(self, agent_id: int) -> None:
+        self._gates.pop(agent_id, None)
+
+
+admission_controller = AdmissionController()
@@ -3,17 +3,36 @@ import yaml
 import shutil
 import json
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from backend.models import Agent, AgentCreate, AgentType, AgentStatus
+from backend.models import Agent, AgentCreate, AgentUpdate, AgentType, AgentStatus
+from backend.services.response_cache import response_cache
+from backend.services.persistence import DebouncedWriter, write_atomic
+from backend.services.port_pool import port_pool
 
 
 class AgentService:
+    """Реестр агентов с персистентностью в agents_state.json.
+
+    Агенты индексируются по id, порту и папке агента, поэтому поиск не
+    зависит от числа агентов. Индексы меняются только через _register и
+    _unregister.
+
+    save_state() не пишет файл сразу: изменения за AGENTS_STATE_DEBOUNCE_MS
+    сохраняются одной атомарной записью вне event loop (см. DebouncedWriter).
+    """
+
     def __init__(self):
-        self.agents_db = []
+        self._by_id: Dict[int, Agent] = {}
+        self._by_port: Dict[int, Agent] = {}
+        self._by_folder: Dict[str, Agent] = {}
         self.agent_id_counter = 1
         self.base_agents_path = "lab_complex/agents"
         self.state_file = "agents_state.json"
+        self.state_writer = DebouncedWriter(
+            "состояния агентов", self._state_snapshot, self._write_state,
+            delay_ms=float(os.getenv("AGENTS_STATE_DEBOUNCE_MS", "200"))
+        )
         self.load_state()
 
     def load_state(self):
@@ -25,65 +44,104 @@ class AgentService:
 
                 print(f"🔄 Загружаем {len(data.get('agents', []))} агентов")
 
-                self.agents_db = []
+                self._clear_index()
+                duplicates = []
                 for agent_data in data.get('agents', []):
                     try:
                         agent = Agent(**agent_data)
-                        self.agents_db.append(agent)
-                        print(f"   ✅ {agent.name} (ID: {agent.id})")
                     except Exception as e:
                         print(f"   ❌ Ошибка загрузки агента: {e}")
+                        continue
+                    # Проверяем коллизии портов между агентами (несколько агентов на одном порту)
+                    if not port_pool.allocate(agent.port, agent.id):
+                        duplicates.append(agent)
+                        continue
+                    self._register(agent)
+                    print(f"   ✅ {agent.name} (ID: {agent.id})")
+
+                if duplicates:
+                    # Новые порты выдаем, когда закреплены порты всех агентов из
+                    # файла и пул сверен с ОС (фоновая сверка еще не запускалась)
+                    port_pool.reconcile()
+                for agent in duplicates:
+                    new_port = port_pool.reserve()
+                    port_pool.commit(new_port, agent.id)
+                    print(f"⚠️ Порт {agent.port} дублируется -> переназначаем {agent.name} на порт {new_port}")
+                    agent.port = new_port
+                    agent.updated_at = datetime.now().isoformat()
+                    self._register(agent)
+                    print(f"   ✅ {agent.name} (ID: {agent.id})")
 
                 self.agent_id_counter = data.get('next_id', 1)
 
-                # Проверяем коллизии портов между агентами (несколько агентов на одном порту)
-                used_ports = set()
-                changed = False
-                for agent in self.agents_db:
-                    if agent.port in used_ports:
-                        # Если порт дублируется в состоянии — переназначаем новому агенту свободный порт
-                        new_port = self.find_free_port()
-                        print(f"⚠️ Порт {agent.port} дублируется -> переназначаем {agent.name} на порт {new_port}")
-                        agent.port = new_port
-                        agent.updated_at = datetime.now().isoformat()
-                        changed = True
-                    used_ports.add(agent.port)
-
-                if changed:
+                if duplicates:
                     self.save_state()
         except Exception as e:
             print(f"❌ Ошибка загрузки состояния: {e}")
-            self.agents_db = []
+            self._clear_index()
             self.agent_id_counter = 1
 
-    def save_state(self):
-        """Сохранение состояния агентов в файл"""
-        try:
-            state_data = {
-                'next_id': self.agent_id_counter,
-                'agents': [agent.__dict__ for agent in self.agents_db],
-                'saved_at': datetime.now().isoformat(),
-                'total_agents': len(self.agents_db)
-            }
+    @staticmethod
+    def _folder(agent: Agent) -> Optional[str]:
+        """Папка агента в lab_complex/agents (по пути к config.yml)"""
+        if not agent.config_path:
+            return None
+        return os.path.basename(os.path.dirname(agent.config_path))
 
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(state_data, f, ensure_ascii=False, indent=2)
+    def _register(self, agent: Agent) -> None:
+        self._by_id[agent.id] = agent
+        self._by_port[agent.port] = agent
+        folder = self._folder(agent)
+        if folder:
+            self._by_folder[folder] = agent
 
-            print(f"💾 Сохранено {len(self.agents_db)} агентов")
-            return True
+    def _unregister(self, agent: Agent) -> None:
+        self._by_id.pop(agent.id, None)
+        if self._by_port.get(agent.port) is agent:
+            del self._by_port[agent.port]
+        folder = self._folder(agent)
+        if folder and self._by_folder.get(folder) is agent:
+            del self._by_folder[folder]
 
-        except Exception as e:
-            print(f"❌ Ошибка сохранения: {e}")
-            return False
+    def _clear_index(self) -> None:
+        self._by_id = {}
+        self._by_port = {}
+        self._by_folder = {}
+        port_pool.clear()
+
+    def save_state(self) -> None:
+        """Сохранение состояния агентов в файл (отложенное, см. state_writer).
+        Ошибки записи видны в state_writer.errors / last_error"""
+        self.state_writer.request()
+
+    def _state_snapshot(self) -> dict:
+        # Копии полей: агентов могут менять, пока снимок пишется в другом потоке
+        return {
+            'next_id': self.agent_id_counter,
+            'agents': [dict(agent.__dict__) for agent in self._by_id.values()],
+            'saved_at': datetime.now().isoformat(),
+            'total_agents': len(self._by_id)
+        }
+
+    def _write_state(self, state_data: dict) -> None:
+        write_atomic(self.state_file, lambda f: json.dump(state_data, f, ensure_ascii=False, indent=2))
+        print(f"💾 Сохранено {state_data['total_agents']} агентов")
+
+    def start(self) -> None:
+        self.state_writer.start()
+
+    async def stop(self) -> None:
+        """Запись отложенных изменений при остановке"""
+        await self.state_writer.stop()
 
     def create_agent(self, agent_data: AgentCreate) -> Agent:
-        """Создание нового агента"""
+        """Создание нового агента (PortPoolExhausted — свободных портов нет)"""
         print(f"🆕 Создаем агента: {agent_data.name}")
 
+        # Берем порт в аренду до выдачи id: если портов нет, агент не создается
+        agent_port = port_pool.reserve()
         agent_id = self.agent_id_counter
         self.agent_id_counter += 1
-        # Подбираем свободный порт (избегаем коллизий с уже существующими агентами и занятными портами)
-        agent_port = self.find_free_port()
         template_agent = "faq_agent" if agent_data.agent_type == AgentType.FAQ else "form_agent"
         new_agent_folder = f"{agent_data.name.lower().replace(' ', '_')}_{agent_id}"
         new_agent_path = os.path.join(self.base_agents_path, new_agent_folder)
@@ -113,13 +171,12 @@ class AgentService:
                 requires_training=False
             )
 
-            self.agents_db.append(agent)
+            self._register(agent)
+            port_pool.commit(agent_port, agent.id)
 
             # Сохраняем состояние
-            if self.save_state():
-                print(f"✅ Агент {agent.name} создан (ID: {agent.id}, порт: {agent.port})")
-            else:
-                print(f"⚠️ Агент создан, но состояние не сохранено!")
+            self.save_state()
+            print(f"✅ Агент {agent.name} создан (ID: {agent.id}, порт: {agent.port})")
 
             return agent
 
@@ -137,41 +194,43 @@ class AgentService:
                 updated_at=datetime.now().isoformat(),
                 requires_training=False
             )
-            self.agents_db.append(agent)
+            self._register(agent)
+            port_pool.commit(agent_port, agent.id)
             self.save_state()
             return agent
 
-    def _is_port_in_use(self, port: int) -> bool:
-        import socket
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            try:
-                s.bind(("0.0.0.0", port))
-            except OSError:
-                return True
-        return False
-
-    def find_free_port(self, start: int = 5005, end: int = 6000) -> int:
-        """Find a free port not used by agents_db and not in use on the system."""
-        used = {agent.port for agent in self.agents_db if agent.port}
-        for p in range(start, end):
-            if p in used:
-                continue
-            if not self._is_port_in_use(p):
-                return p
-        # fallback: just return next sequential port
-        p = start
-        while p in used:
-            p += 1
-        return p
+    def find_free_port(self) -> int:
+        """Свободный порт, который получит следующий агент (без аренды;
+        порт берет в аренду create_agent через port_pool.reserve())"""
+        return port_pool.peek()
 
     def get_agent(self, agent_id: int) -> Optional[Agent]:
-        for agent in self.agents_db:
-            if agent.id == agent_id:
-                return agent
-        return None
+        return self._by_id.get(agent_id)
+
+    def get_agent_by_port(self, port: int) -> Optional[Agent]:
+        return self._by_port.get(port)
+
+    def get_agent_by_folder(self, folder: str) -> Optional[Agent]:
+        return self._by_folder.get(folder)
 
     def get_all_agents(self) -> List[Agent]:
-        return self.agents_db
+        return list(self._by_id.values())
+
+    def update_agent(self, agent_id: int, agent_update: AgentUpdate) -> Optional[Agent]:
+        agent = self.get_agent(agent_id)
+        if not agent:
+            return None
+
+        # Переданы только явно указанные поля; null в поле лимита сбрасывает
+        # его к значению по умолчанию, в остальных полях null игнорируется
+        for field, value in agent_update.dict(exclude_unset=True).items():
+            if value is not None or field in AgentUpdate.NULLABLE_FIELDS:
+                setattr(agent, field, value)
+        if not agent.response_cache_enabled:
+            response_cache.invalidate(agent_id)
+        agent.updated_at = datetime.now().isoformat()
+        self.save_state()
+        return agent
 
     def train_agent(self, agent_id: int) -> bool:
         agent = self.get_agent(agent_id)
@@ -179,7 +238,10 @@ class AgentService:
             agent.status = AgentStatus.READY
             agent.requires_training = False
             agent.updated_at = datetime.now().isoformat()
-            return self.save_state()
+            # Новая модель — старые закэшированные ответы больше не действительны
+            response_cache.invalidate(agent_id)
+            self.save_state()
+            return True
         return False
 
     def delete_agent(self, agent_id: int) -> bool:
@@ -187,8 +249,11 @@ class AgentService:
         if not agent:
             return False
 
-        self.agents_db = [a for a in self.agents_db if a.id != agent_id]
-        return self.save_state()
+        self._unregister(agent)
+        port_pool.release(agent.port)
+        response_cache.forget(agent_id)
+        self.save_state()
+        return True
 
 
 agent_service = AgentService()
\ No newline at end of file
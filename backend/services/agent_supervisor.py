@@ -0,0 +1,269 @@
+import asyncio
+import os
+import re
+import shutil
+import signal
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from backend.models import Agent
+
+MOCK_AGENT_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "deploy", "mock_agent", "simple_mock.py"
+)
+
+
+class ManagedProcess:
+    """Процесс одного агента под управлением супервизора"""
+
+    def __init__(self, agent_id: int, port: int, command: List[str], cwd: Optional[str], log_lines: int):
+        self.agent_id = agent_id
+        self.port = port
+        self.command = command
+        self.cwd = cwd
+        self.state = "starting"  # starting | running | backoff | stopping | stopped
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+        self.consecutive_crashes = 0
+        self.last_exit_code: Optional[int] = None
+        self.started_at: Optional[str] = None
+        self.next_restart_in_s: Optional[float] = None
+        self.logs: Deque[str] = deque(maxlen=log_lines)
+        self.task: Optional[asyncio.Task] = None
+        self.stopping = asyncio.Event()
+
+    @property
+    def pid(self) -> Optional[int]:
+        if self.process is not None and self.process.returncode is None:
+            return self.process.pid
+        return None
+
+    def log(self, line: str) -> None:
+        self.logs.append(f"{datetime.now().isoformat(timespec='seconds')} {line}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "agent_id": self.agent_id,
+            "port": self.port,
+            "state": self.state,
+            "pid": self.pid,
+            "command": self.command,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+            "started_at": self.started_at,
+            "next_restart_in_s": self.next_restart_in_s
+        }
+
+
+class AgentSupervisor:
+    """Запуск процессов агентов как дочерних процессов бэкенда.
+
+    Для каждого агента запускается `rasa run --enable-api` на его порту
+    (AGENT_RUNTIME=rasa) или локальная заглушка deploy/mock_agent/simple_mock.py
+    (AGENT_RUNTIME=mock); auto — rasa, если есть бинарь и папка агента.
+    Упавший процесс перезапускается с экспоненциальным backoff, вывод
+    процесса хранится в кольцевом буфере последних строк. Процесс запускается
+    в собственной группе, поэтому остановка (SIGTERM, затем SIGKILL по
+    таймауту) завершает ровно его и его потомков.
+
+    Процессы, запущенные не бэкендом (docker compose, systemd), супервизор
+    не трогает. Прежнее поведение — завершить процесс, слушающий порт
+    агента (ss, затем fuser), — включается AGENT_STOP_UNMANAGED=true.
+    """
+
+    def __init__(self):
+        self.runtime = os.getenv("AGENT_RUNTIME", "auto").lower()
+        self.rasa_executable = os.getenv("RASA_EXECUTABLE", "rasa")
+        self.mock_script = os.getenv("MOCK_AGENT_SCRIPT", MOCK_AGENT_SCRIPT)
+        self.autostart = os.getenv("AGENT_AUTOSTART", "false").lower() == "true"
+        self.backoff_initial = float(os.getenv("AGENT_RESTART_BACKOFF_INITIAL", "1"))
+        self.backoff_max = float(os.getenv("AGENT_RESTART_BACKOFF_MAX", "60"))
+        # Процесс, проработавший дольше, считается здоровым: backoff сбрасывается
+        self.healthy_after = float(os.getenv("AGENT_RESTART_RESET_AFTER", "60"))
+        self.stop_timeout = float(os.getenv("AGENT_STOP_TIMEOUT", "5"))
+        self.log_lines = int(os.getenv("AGENT_LOG_BUFFER_LINES", "500"))
+        self.stop_unmanaged = os.getenv("AGENT_STOP_UNMANAGED", "false").lower() == "true"
+        self._processes: Dict[int, ManagedProcess] = {}
+
+    def _command(self, agent: Agent) -> tuple:
+        """Команда запуска агента и рабочая папка"""
+        agent_dir = os.path.dirname(agent.config_path) if agent.config_path else None
+        runtime = self.runtime
+        if runtime == "auto":
+            has_rasa = shutil.which(self.rasa_executable) is not None
+            runtime = "rasa" if has_rasa and agent_dir and os.path.isdir(agent_dir) else "mock"
+        if runtime == "rasa":
+            return [self.rasa_executable, "run", "--enable-api", "--port", str(agent.port)], agent_dir
+        return [sys.executable, self.mock_script, str(agent.port)], None
+
+    def _backoff(self, crashes: int) -> float:
+        return min(self.backoff_initial * (2 ** max(crashes - 1, 0)), self.backoff_max)
+
+    async def _pump_output(self, managed: ManagedProcess, stream: asyncio.StreamReader) -> None:
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            managed.log(line.decode("utf-8", errors="replace").rstrip())
+
+    async def _spawn(self, managed: ManagedProcess) -> Optional[asyncio.subprocess.Process]:
+        env = dict(os.environ)
+        # Без перезагрузчика Flask: иначе порт слушал бы не наш дочерний процесс
+        env.setdefault("MOCK_DEBUG", "false")
+        env["PYTHONUNBUFFERED"] = "1"
+        try:
+            return await asyncio.create_subprocess_exec(
+                *managed.command, cwd=managed.cwd, env=env,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True
+            )
+        except OSError as e:
+            managed.log(f"[supervisor] запуск не удался: {e}")
+            return None
+
+    async def _supervise(self, managed: ManagedProcess) -> None:
+        while not managed.stopping.is_set():
+            managed.state = "starting"
+            process = await self._spawn(managed)
+            started = time.monotonic()
+            if process is not None:
+                managed.process = process
+                if managed.stopping.is_set():
+                    # stop() пришел, пока процесс запускался
+                    self._signal(process, signal.SIGKILL)
+                managed.state = "running"
+                managed.started_at = datetime.now().isoformat()
+                managed.next_restart_in_s = None
+                managed.log(f"[supervisor] запущен pid {process.pid}: {' '.join(managed.command)}")
+                print(f"🚀 Агент {managed.agent_id}: процесс {process.pid} на порту {managed.port}")
+                await self._pump_output(managed, process.stdout)
+                managed.last_exit_code = await process.wait()
+                managed.log(f"[supervisor] pid {process.pid} завершился с кодом {managed.last_exit_code}")
+            if managed.stopping.is_set():
+                break
+
+            if time.monotonic() - started >= self.healthy_after:
+                managed.consecutive_crashes = 0
+            managed.consecutive_crashes += 1
+            delay = self._backoff(managed.consecutive_crashes)
+            managed.state = "backoff"
+            managed.next_restart_in_s = delay
+            print(f"⚠️ Агент {managed.agent_id}: процесс упал (код {managed.last_exit_code}), перезапуск через {delay:.1f} с")
+            try:
+                await asyncio.wait_for(managed.stopping.wait(), delay)
+            except asyncio.TimeoutError:
+                managed.restarts += 1
+        managed.state = "stopped"
+        managed.next_restart_in_s = None
+
+    def start(self, agent: Agent) -> ManagedProcess:
+        """Запуск процесса агента (уже запущенный не перезапускается)"""
+        managed = self._processes.get(agent.id)
+        if managed is not None and managed.task is not None and not managed.task.done():
+            return managed
+        command, cwd = self._command(agent)
+        managed = ManagedProcess(agent.id, agent.port, command, cwd, self.log_lines)
+        if agent.id in self._processes:
+            # Журнал предыдущего запуска сохраняем
+            managed.logs.extend(self._processes[agent.id].logs)
+        self._processes[agent.id] = managed
+        managed.task = asyncio.create_task(self._supervise(managed))
+        return managed
+
+    def _signal(self, process: asyncio.subprocess.Process, sig: int) -> None:
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    async def stop(self, agent_id: int) -> bool:
+        """Остановка процесса агента: SIGTERM группе процессов, через
+        AGENT_STOP_TIMEOUT — SIGKILL. False — агент не запускался супервизором"""
+        managed = self._processes.get(agent_id)
+        if managed is None or managed.task is None:
+            return False
+        managed.stopping.set()
+        if managed.task.done():
+            return True
+        managed.state = "stopping"
+        process = managed.process
+        if process is not None and process.returncode is None:
+            self._signal(process, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(process.wait(), self.stop_timeout)
+            except asyncio.TimeoutError:
+                managed.log(f"[supervisor] pid {process.pid} не завершился за {self.stop_timeout} с, SIGKILL")
+                self._signal(process, signal.SIGKILL)
+        await managed.task
+        print(f"⏹️ Агент {agent_id}: процесс остановлен")
+        return True
+
+    async def _run_tool(self, *command: str) -> Optional[tuple]:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command, stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+            )
+        except OSError:
+            return None
+        output, _ = await process.communicate()
+        return process.returncode, output.decode("utf-8", errors="replace")
+
+    async def stop_port(self, port: int) -> Optional[str]:
+        """Завершение чужого процесса, слушающего порт (AGENT_STOP_UNMANAGED).
+        Описание того, что сделано, или None — процесс не найден"""
+        result = await self._run_tool("ss", "-ltnp")
+        if result is not None:
+            match = re.search(rf"[:.]{port}\b.*?pid=(\d+),", result[1])
+            if match:
+                pid = int(match.group(1))
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+                return f"Killed pid {pid} (via ss)"
+        result = await self._run_tool("fuser", "-k", f"{port}/tcp")
+        if result is not None and result[0] == 0:
+            return f"Killed processes using port {port} (via fuser)"
+        return None
+
+    async def restart(self, agent: Agent) -> ManagedProcess:
+        await self.stop(agent.id)
+        return self.start(agent)
+
+    def is_running(self, agent_id: int) -> bool:
+        managed = self._processes.get(agent_id)
+        return managed is not None and managed.task is not None and not managed.task.done()
+
+    def status(self, agent_id: int) -> Optional[Dict[str, Any]]:
+        managed = self._processes.get(agent_id)
+        return managed.snapshot() if managed else None
+
+    def logs(self, agent_id: int, tail: Optional[int] = None) -> List[str]:
+        managed = self._processes.get(agent_id)
+        if managed is None:
+            return []
+        lines = list(managed.logs)
+        return lines[-tail:] if tail else lines
+
+    async def forget(self, agent_id: int) -> None:
+        await self.stop(agent_id)
+        self._processes.pop(agent_id, None)
+
+    def start_all(self, agents: List[Agent]) -> None:
+        for agent in agents:
+            self.start(agent)
+
+    async def stop_all(self) -> None:
+        await asyncio.gather(*(self.stop(agent_id) for agent_id in list(self._processes)))
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [managed.snapshot() for _, managed in sorted(self._processes.items())]
+
+
+agent_supervisor = AgentSupervisor()
@@ -0,0 +1,143 @@
+import os
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+
+class CircuitOpenError(Exception):
+    """Запрос отклонен: circuit breaker агента разомкнут"""
+
+    def __init__(self, agent_port: int, retry_after: float):
+        super().__init__(f"Circuit breaker for port {agent_port} is open, retry in {retry_after:.0f}s")
+        self.agent_port = agent_port
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Circuit breaker одного агента: closed -> open -> half_open -> closed.
+
+    После `failure_threshold` ошибок подряд цепь размыкается и запросы сразу
+    отклоняются. Через `recovery_timeout` секунд пропускается до
+    `half_open_max_calls` пробных запросов; `success_threshold` успехов подряд
+    замыкают цепь, любая ошибка — снова размыкает.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float,
+                 half_open_max_calls: int, success_threshold: int):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.success_threshold = success_threshold
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.half_open_successes = 0
+        self.half_open_in_flight = 0
+        self.opened_at = 0.0
+
+        self.total_calls = 0
+        self.total_failures = 0
+        self.rejected_calls = 0
+        self.times_opened = 0
+        self.last_error: Optional[str] = None
+        self.last_state_change: Optional[str] = None
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self.last_state_change = datetime.now().isoformat()
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+        self.half_open_successes = 0
+        self.half_open_in_flight = 0
+
+    def retry_after(self) -> float:
+        return max(self.recovery_timeout - (time.monotonic() - self.opened_at), 0.0)
+
+    def is_open(self) -> bool:
+        """Цепь разомкнута и время восстановления еще не вышло"""
+        return self.state == self.OPEN and self.retry_after() > 0
+
+    def allow_request(self) -> bool:
+        """Можно ли отправить запрос агенту (в half_open занимает пробный слот)"""
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                self.rejected_calls += 1
+                return False
+            self._set_state(self.HALF_OPEN)
+
+        if self.state == self.HALF_OPEN:
+            if self.half_open_in_flight >= self.half_open_max_calls:
+                self.rejected_calls += 1
+                return False
+            self.half_open_in_flight += 1
+
+        self.total_calls += 1
+        return True
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        if self.state == self.HALF_OPEN:
+            self.half_open_in_flight = max(self.half_open_in_flight - 1, 0)
+            self.half_open_successes += 1
+            if self.half_open_successes >= self.success_threshold:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self, error: Optional[str] = None) -> None:
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._set_state(self.OPEN)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_after_s": round(self.retry_after(), 2) if self.state == self.OPEN else 0.0,
+            "total_calls": self.total_calls,
+            "total_failures": self.total_failures,
+            "rejected_calls": self.rejected_calls,
+            "times_opened": self.times_opened,
+            "last_error": self.last_error,
+            "last_state_change": self.last_state_change
+        }
+
+
+class CircuitBreakerRegistry:
+    """Circuit breaker'ы по портам агентов"""
+
+    def __init__(self):
+        self.failure_threshold = int(os.getenv("CB_FAILURE_THRESHOLD", "5"))
+        self.recovery_timeout = float(os.getenv("CB_RECOVERY_TIMEOUT", "30"))
+        self.half_open_max_calls = int(os.getenv("CB_HALF_OPEN_MAX_CALLS", "1"))
+        self.success_threshold = int(os.getenv("CB_SUCCESS_THRESHOLD", "1"))
+        self._breakers: Dict[int, CircuitBreaker] = {}
+
+    def get(self, agent_port: int) -> CircuitBreaker:
+        breaker = self._breakers.get(agent_port)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_threshold=self.failure_threshold,
+                recovery_timeout=self.recovery_timeout,
+                half_open_max_calls=self.half_open_max_calls,
+                success_threshold=self.success_threshold
+            )
+            self._breakers[agent_port] = breaker
+        return breaker
+
+    def forget(self, agent_port: int) -> None:
+        self._breakers.pop(agent_port, None)
+
+    def snapshot(self, agent_port: int) -> Dict[str, Any]:
+        breaker = self._breakers.get(agent_port)
+        if breaker is None:
+            return {"state": CircuitBreaker.CLOSED, "total_calls": 0}
+        return breaker.snapshot()
+
+
+circuit_breakers = CircuitBreakerRegistry()
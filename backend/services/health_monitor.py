@@ -0,0 +1,154 @@
+import asyncio
+import os
+import random
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from backend.models import Agent, AgentStatus
+from backend.services.agent_service import agent_service
+from backend.rasa_integration import rasa_integration
+
+
+class AgentHealthMonitor:
+    """Фоновая проверка доступности агентов.
+
+    Каждый агент опрашивается по собственному расписанию: живые — раз в
+    `interval` секунд, недоступные — с экспоненциальным backoff до `max_backoff`.
+    Ко всем интервалам добавляется джиттер, чтобы проверки не шли пачкой.
+    """
+
+    def __init__(self):
+        self.interval = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+        self.jitter = float(os.getenv("HEALTH_CHECK_JITTER", "0.2"))
+        self.max_backoff = float(os.getenv("HEALTH_CHECK_MAX_BACKOFF", "300"))
+        self.concurrency = int(os.getenv("HEALTH_CHECK_CONCURRENCY", "50"))
+        self.liveness: Dict[int, Dict[str, Any]] = {}
+        self._next_probe: Dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _jittered(self, delay: float) -> float:
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _schedule(self, agent_id: int, alive: bool, failures: int) -> None:
+        if alive:
+            delay = self.interval
+        else:
+            delay = min(self.interval * (2 ** max(failures - 1, 0)), self.max_backoff)
+        self._next_probe[agent_id] = time.monotonic() + self._jittered(delay)
+
+    def is_alive(self, agent_id: int) -> Optional[bool]:
+        """Последнее известное состояние агента (None — еще не проверялся)"""
+        entry = self.liveness.get(agent_id)
+        return entry["alive"] if entry else None
+
+    def is_stale(self, agent_id: int) -> bool:
+        """Запись о недоступности старше обычного интервала проверки"""
+        entry = self.liveness.get(agent_id)
+        return entry is None or time.monotonic() - entry["_checked_monotonic"] > self.interval
+
+    async def probe_agent(self, agent: Agent) -> bool:
+        """Проверка одного агента с обновлением таблицы доступности"""
+        started = time.monotonic()
+        alive = await rasa_integration.check_agent_health(agent.port)
+        latency_ms = (time.monotonic() - started) * 1000
+
+        previous = self.liveness.get(agent.id)
+        failures = 0 if alive else (previous["consecutive_failures"] + 1 if previous else 1)
+        changed = previous is None or previous["alive"] != alive
+        now = datetime.now().isoformat()
+
+        self._schedule(agent.id, alive, failures)
+        self.liveness[agent.id] = {
+            "agent_id": agent.id,
+            "port": agent.port,
+            "alive": alive,
+            "consecutive_failures": failures,
+            "latency_ms": round(latency_ms, 2),
+            "last_checked": now,
+            "last_change": now if changed else previous["last_change"],
+            "_checked_monotonic": time.monotonic()
+        }
+
+        if self._sync_status(agent, alive):
+            agent_service.save_state()
+        return alive
+
+    def _sync_status(self, agent: Agent, alive: bool) -> bool:
+        """Приводим статус агента в соответствие с доступностью процесса"""
+        if not alive and agent.status == AgentStatus.READY:
+            agent.status = AgentStatus.STOPPED
+        elif alive and agent.status == AgentStatus.STOPPED:
+            agent.status = AgentStatus.READY
+        else:
+            return False
+        agent.updated_at = datetime.now().isoformat()
+        print(f"🩺 Агент {agent.name} (ID: {agent.id}) -> {agent.status.value}")
+        return True
+
+    async def run_once(self) -> None:
+        """Проверка всех агентов, у которых подошло время"""
+        agents = agent_service.get_all_agents()
+        known_ids = {agent.id for agent in agents}
+        for agent_id in list(self.liveness):
+            if agent_id not in known_ids:
+                self.forget(agent_id)
+
+        now = time.monotonic()
+        due: List[Agent] = []
+        for agent in agents:
+            if agent.status in (AgentStatus.TRAINING, AgentStatus.SLEEPING):
+                continue
+            if agent.id not in self._next_probe:
+                # Первую проверку размазываем по интервалу
+                self._next_probe[agent.id] = now + random.uniform(0, self.interval)
+            if self._next_probe[agent.id] <= now:
+                due.append(agent)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def guarded(agent: Agent):
+            async with semaphore:
+                try:
+                    await self.probe_agent(agent)
+                except Exception as e:
+                    print(f"❌ Ошибка проверки агента {agent.id}: {e}")
+
+        if due:
+            await asyncio.gather(*(guarded(agent) for agent in due))
+
+    async def _run(self) -> None:
+        tick = max(min(self.interval / 4, 1.0), 0.05)
+        while True:
+            await self.run_once()
+            await asyncio.sleep(tick)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def forget(self, agent_id: int) -> None:
+        self.liveness.pop(agent_id, None)
+        self._next_probe.pop(agent_id, None)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Таблица доступности для API (без служебных полей)"""
+        now = time.monotonic()
+        result = []
+        for agent_id, entry in sorted(self.liveness.items()):
+            item = {k: v for k, v in entry.items() if not k.startswith("_")}
+            item["next_check_in_s"] = round(max(self._next_probe.get(agent_id, now) - now, 0.0), 2)
+            result.append(item)
+        return result
+
+
+health_monitor = AgentHealthMonitor()
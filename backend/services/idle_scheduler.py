@@ -0,0 +1,200 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from backend.models import Agent, AgentStatus
+from backend.services.agent_service import agent_service
+from backend.services.agent_supervisor import agent_supervisor
+from backend.services.admission import admission_controller
+from backend.services.health_monitor import health_monitor
+from backend.rasa_integration import rasa_integration
+
+
+class AgentIdleScheduler:
+    """Усыпление простаивающих агентов и пробуждение по первому сообщению.
+
+    Процесс агента, запущенный супервизором, останавливается, если агент не
+    получал сообщений AGENT_IDLE_TIMEOUT_MINUTES минут (0 — не усыплять);
+    статус агента становится sleeping. Первое сообщение спящему агенту
+    запускает процесс и ждет, пока агент не начнет отвечать (не дольше
+    AGENT_WARMUP_TIMEOUT секунд). Сообщения, пришедшие во время прогрева,
+    ждут ту же задачу прогрева и затем отправляются в порядке поступления.
+    Закрепленные агенты (pinned) не усыпляются, а спящие — будятся.
+    """
+
+    def __init__(self):
+        self.idle_timeout_s = float(os.getenv("AGENT_IDLE_TIMEOUT_MINUTES", "30")) * 60
+        self.check_interval = float(os.getenv("AGENT_IDLE_CHECK_INTERVAL", "30"))
+        self.warmup_timeout = float(os.getenv("AGENT_WARMUP_TIMEOUT", "120"))
+        self.warmup_poll_interval = float(os.getenv("AGENT_WARMUP_POLL_INTERVAL", "0.25"))
+        self._last_used: Dict[int, float] = {}  # monotonic
+        self._waking: Dict[int, asyncio.Task] = {}
+        self._sleeping: Dict[int, asyncio.Task] = {}
+        self._waiting: Dict[int, int] = {}  # сообщений ждут прогрева
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+        self.sleeps = 0
+        self.wakes = 0
+        self.failed_wakes = 0
+        self.last_warmup_ms = 0.0
+        self.max_warmup_ms = 0.0
+
+    def touch(self, agent_id: int) -> None:
+        self._last_used[agent_id] = time.monotonic()
+
+    def is_sleeping(self, agent: Agent) -> bool:
+        return agent.status == AgentStatus.SLEEPING
+
+    def _set_status(self, agent: Agent, status: AgentStatus) -> None:
+        agent.status = status
+        agent.updated_at = datetime.now().isoformat()
+        agent_service.save_state()
+
+    async def _sleep(self, agent: Agent) -> None:
+        # Статус меняем до остановки: новые сообщения сразу пойдут через прогрев
+        self._set_status(agent, AgentStatus.SLEEPING)
+        await agent_supervisor.stop(agent.id)
+        health_monitor.forget(agent.id)
+        self.sleeps += 1
+        print(f"💤 Агент {agent.name} (ID: {agent.id}) усыплен после простоя")
+
+    def sleep(self, agent: Agent) -> asyncio.Task:
+        task = self._sleeping.get(agent.id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._sleep(agent))
+            self._sleeping[agent.id] = task
+        return task
+
+    async def _warm_up(self, agent: Agent) -> bool:
+        sleeping = self._sleeping.get(agent.id)
+        if sleeping is not None and not sleeping.done():
+            await sleeping
+        started = time.monotonic()
+        print(f"☀️ Будим агента {agent.name} (ID: {agent.id})")
+        agent_supervisor.start(agent)
+        alive = False
+        while time.monotonic() - started < self.warmup_timeout:
+            if await rasa_integration.check_agent_health(agent.port):
+                alive = True
+                break
+            await asyncio.sleep(self.warmup_poll_interval)
+
+        warmup_ms = (time.monotonic() - started) * 1000
+        self.last_warmup_ms = warmup_ms
+        self.max_warmup_ms = max(self.max_warmup_ms, warmup_ms)
+        if not alive:
+            # Процесс остается под супервизором: монитор вернет статус ready, когда агент поднимется
+            self.failed_wakes += 1
+            self._set_status(agent, AgentStatus.STOPPED)
+            print(f"❌ Агент {agent.name} не ответил за {self.warmup_timeout:.0f} с прогрева")
+            return False
+        self.wakes += 1
+        self.touch(agent.id)
+        self._set_status(agent, AgentStatus.READY)
+        await health_monitor.probe_agent(agent)
+        print(f"✅ Агент {agent.name} готов через {warmup_ms:.0f} мс")
+        return True
+
+    def wake(self, agent: Agent) -> asyncio.Task:
+        """Задача прогрева агента (одна на агента, сколько бы сообщений ни ждало)"""
+        task = self._waking.get(agent.id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._warm_up(agent))
+            self._waking[agent.id] = task
+        return task
+
+    async def ensure_awake(self, agent: Agent) -> bool:
+        """Перед отправкой сообщения: спящего агента будим и ждем прогрева"""
+        self.touch(agent.id)
+        task = self._waking.get(agent.id)
+        if not self.is_sleeping(agent) and (task is None or task.done()):
+            return True
+        task = self.wake(agent) if task is None or task.done() else task
+        self._waiting[agent.id] = self._waiting.get(agent.id, 0) + 1
+        try:
+            # Отмена одного запроса не должна прерывать прогрев для остальных
+            return await asyncio.shield(task)
+        finally:
+            self._waiting[agent.id] -= 1
+
+    def _busy(self, agent: Agent) -> bool:
+        task = self._waking.get(agent.id)
+        return (task is not None and not task.done()) or admission_controller.in_flight(agent.id) > 0
+
+    def run_once(self) -> None:
+        now = time.monotonic()
+        for agent in agent_service.get_all_agents():
+            if agent.pinned:
+                # Закрепленный агент всегда прогрет
+                if self.is_sleeping(agent):
+                    self.wake(agent)
+                continue
+            if not self.idle_timeout_s or self.is_sleeping(agent) or not agent_supervisor.is_running(agent.id):
+                continue
+            # Простой считаем с момента, когда агент попал под наблюдение
+            last_used = self._last_used.setdefault(agent.id, now)
+            if now - last_used >= self.idle_timeout_s and not self._busy(agent):
+                self.sleep(agent)
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"❌ Ошибка планировщика простоя агентов: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        pending = [task for task in list(self._waking.values()) + list(self._sleeping.values()) if not task.done()]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def forget(self, agent_id: int) -> None:
+        self._last_used.pop(agent_id, None)
+        self._waking.pop(agent_id, None)
+        self._sleeping.pop(agent_id, None)
+        self._waiting.pop(agent_id, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        agents: List[Dict[str, Any]] = []
+        for agent in agent_service.get_all_agents():
+            last_used = self._last_used.get(agent.id)
+            task = self._waking.get(agent.id)
+            agents.append({
+                "agent_id": agent.id,
+                "status": agent.status.value if isinstance(agent.status, AgentStatus) else agent.status,
+                "pinned": agent.pinned,
+                "warming_up": task is not None and not task.done(),
+                "waiting_messages": self._waiting.get(agent.id, 0),
+                "idle_s": round(now - last_used, 1) if last_used is not None else None
+            })
+        return {
+            "idle_timeout_s": self.idle_timeout_s,
+            "check_interval_s": self.check_interval,
+            "warmup_timeout_s": self.warmup_timeout,
+            "sleeps": self.sleeps,
+            "wakes": self.wakes,
+            "failed_wakes": self.failed_wakes,
+            "last_warmup_ms": round(self.last_warmup_ms, 1),
+            "max_warmup_ms": round(self.max_warmup_ms, 1),
+            "agents": agents
+        }
+
+
+idle_scheduler = AgentIdleScheduler()
@@ -0,0 +1,166 @@
+import math
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from backend.services.log_aggregates import is_error_log
+
+# Окна: (название, длина окна в секундах, шаг сдвига окна в секундах)
+WINDOWS: Tuple[Tuple[str, int, int], ...] = (
+    ("1m", 60, 5),
+    ("15m", 15 * 60, 60),
+    ("24h", 24 * 60 * 60, 15 * 60),
+)
+QUANTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+OUTCOMES = ("success", "failure")
+
+
+class LatencyHistogram:
+    """Гистограмма задержек в духе HDR: логарифмические корзины с заданной
+    относительной точностью, память не зависит от числа замеров.
+
+    Корзина i > 0 покрывает (min_ms * step^(i-1), min_ms * step^i]; все, что не
+    больше min_ms, попадает в корзину 0.
+    """
+
+    __slots__ = ("counts", "count", "max")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, bucket: int, value_ms: float) -> None:
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+
+class RollingLatency:
+    """Гистограмма за скользящее окно: по гистограмме на каждый шаг окна,
+    запрос сливает шаги, попадающие в окно"""
+
+    __slots__ = ("window_s", "slot_s", "slots")
+
+    def __init__(self, window_s: int, slot_s: int):
+        self.window_s = window_s
+        self.slot_s = slot_s
+        self.slots: Dict[int, LatencyHistogram] = {}
+
+    def _first_slot(self, now: float) -> int:
+        return int(now // self.slot_s) - self.window_s // self.slot_s + 1
+
+    def add(self, bucket: int, value_ms: float, now: float) -> None:
+        slot = int(now // self.slot_s)
+        histogram = self.slots.get(slot)
+        if histogram is None:
+            histogram = self.slots[slot] = LatencyHistogram()
+            # Новый шаг — заодно выбрасываем вышедшие из окна
+            first = self._first_slot(now)
+            for stale in [index for index in self.slots if index < first]:
+                del self.slots[stale]
+        histogram.add(bucket, value_ms)
+
+    def histogram(self, now: float) -> LatencyHistogram:
+        first = self._first_slot(now)
+        merged = LatencyHistogram()
+        for slot, histogram in self.slots.items():
+            if slot >= first:
+                merged.merge(histogram)
+        return merged
+
+
+class LatencyMetrics:
+    """Скользящие перцентили задержки обмена с агентами (1m, 15m, 24h),
+    отдельно для успешных и неудачных обменов.
+
+    Пополняется из журнала диалогов: processing_time_ms каждой записи,
+    неудачей считается запись с ответом об ошибке. Данные только в памяти и
+    накапливаются с момента запуска бэкенда.
+    """
+
+    def __init__(self):
+        # Относительная погрешность перцентилей (1% по умолчанию)
+        self.precision = float(os.getenv("LATENCY_HISTOGRAM_PRECISION", "0.01"))
+        self.min_ms = float(os.getenv("LATENCY_HISTOGRAM_MIN_MS", "0.1"))
+        self._log_step = math.log1p(self.precision)
+        self._agents: Dict[int, Dict[str, List[RollingLatency]]] = {}
+
+    def _bucket(self, value_ms: float) -> int:
+        if value_ms <= self.min_ms:
+            return 0
+        return 1 + int(math.log(value_ms / self.min_ms) / self._log_step)
+
+    def _bucket_value(self, bucket: int) -> float:
+        # Середина корзины (в геометрическом смысле) — погрешность не больше precision / 2
+        if bucket == 0:
+            return self.min_ms
+        return self.min_ms * math.exp((bucket - 0.5) * self._log_step)
+
+    def record(self, agent_id: int, value_ms: float, failed: bool, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        windows = self._agents.get(agent_id)
+        if windows is None:
+            windows = self._agents[agent_id] = {
+                outcome: [RollingLatency(window_s, slot_s) for _, window_s, slot_s in WINDOWS]
+                for outcome in OUTCOMES
+            }
+        bucket = self._bucket(value_ms)
+        for rolling in windows["failure" if failed else "success"]:
+            rolling.add(bucket, value_ms, now)
+
+    def add(self, logs: Iterable[Any]) -> None:
+        """Учет задержек записей журнала диалогов"""
+        now = time.time()
+        for log in logs:
+            if log.processing_time_ms is not None:
+                self.record(log.agent_id, log.processing_time_ms, is_error_log(log), now)
+
+    def _summary(self, histogram: LatencyHistogram) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {"count": histogram.count}
+        if not histogram.count:
+            summary.update({name: None for name, _ in QUANTILES}, max=None)
+            return summary
+
+        buckets = sorted(histogram.counts.items())
+        for name, q in QUANTILES:
+            rank = max(math.ceil(q * histogram.count), 1)
+            seen = 0
+            for bucket, count in buckets:
+                seen += count
+                if seen >= rank:
+                    summary[name] = round(min(self._bucket_value(bucket), histogram.max), 2)
+                    break
+        summary["max"] = round(histogram.max, 2)
+        return summary
+
+    def snapshot(self, agent_id: int, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        windows = self._agents.get(agent_id)
+        result: Dict[str, Any] = {}
+        for index, (name, _, _) in enumerate(WINDOWS):
+            histograms = {
+                outcome: windows[outcome][index].histogram(now) if windows else LatencyHistogram()
+                for outcome in OUTCOMES
+            }
+            combined = LatencyHistogram()
+            for histogram in histograms.values():
+                combined.merge(histogram)
+            result[name] = {
+                **{outcome: self._summary(histogram) for outcome, histogram in histograms.items()},
+                "all": self._summary(combined)
+            }
+        return result
+
+    def forget(self, agent_id: int) -> None:
+        self._agents.pop(agent_id, None)
+
+
+latency_metrics = LatencyMetrics()
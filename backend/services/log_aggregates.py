@@ -0,0 +1,176 @@
+import asyncio
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Так начинаются ответы, которые роутер агентов записывает при ошибке обмена
+ERROR_RESPONSE_PREFIXES = ("Error:", "Unexpected error:")
+
+
+def is_error_log(log: Any) -> bool:
+    return any(text.startswith(ERROR_RESPONSE_PREFIXES) for text in log.bot_response)
+
+
+class AgentAggregates:
+    """Статистика логов одного агента, обновляемая при каждой записи"""
+
+    __slots__ = ("total", "errors", "last_activity", "intent_counts", "unclassified",
+                 "entity_counts", "timed", "total_processing_ms", "max_processing_ms")
+
+    def __init__(self):
+        self.total = 0
+        self.errors = 0
+        self.last_activity: Optional[str] = None
+        self.intent_counts: Dict[str, int] = {}
+        self.unclassified = 0
+        self.entity_counts: Dict[str, int] = {}
+        self.timed = 0
+        self.total_processing_ms = 0.0
+        self.max_processing_ms: Optional[float] = None
+
+    def add(self, log: Any) -> None:
+        self.total += 1
+        if is_error_log(log):
+            self.errors += 1
+        if self.last_activity is None or log.timestamp > self.last_activity:
+            self.last_activity = log.timestamp
+        if log.intent:
+            self.intent_counts[log.intent] = self.intent_counts.get(log.intent, 0) + 1
+        else:
+            self.unclassified += 1
+        for entity in log.entities:
+            name = entity.get("entity")
+            if name:
+                self.entity_counts[name] = self.entity_counts.get(name, 0) + 1
+        if log.processing_time_ms is not None:
+            self.timed += 1
+            self.total_processing_ms += log.processing_time_ms
+            if self.max_processing_ms is None or log.processing_time_ms > self.max_processing_ms:
+                self.max_processing_ms = log.processing_time_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "total_dialogs": self.total,
+            "last_activity": self.last_activity,
+            "error_count": self.errors,
+            "error_rate": round(self.errors / self.total, 4) if self.total else 0.0,
+            "intent_counts": dict(sorted(self.intent_counts.items(), key=lambda item: -item[1])),
+            "unclassified_count": self.unclassified,
+            "entity_counts": dict(sorted(self.entity_counts.items(), key=lambda item: -item[1])),
+            "processing_time_ms": {
+                "mean": round(self.total_processing_ms / self.timed, 2) if self.timed else None,
+                "max": round(self.max_processing_ms, 2) if self.max_processing_ms is not None else None
+            }
+        }
+
+
+class LogAggregates:
+    """Агрегаты логов по агентам.
+
+    С `loader` агрегаты агента строятся лениво при первом обращении (чтение
+    или новая запись) из истории, которую возвращает loader(agent_id), и
+    дальше обновляются при записи. История читается в отдельном потоке, не
+    блокируя event loop; записи, пришедшие во время построения, копятся и
+    досчитываются после него. Запуск не зависит от объема истории.
+    """
+
+    def __init__(self, loader: Optional[Callable[[int], Iterable[List[Any]]]] = None):
+        self._agents: Dict[int, AgentAggregates] = {}
+        self._loader = loader
+        self._building: Dict[int, asyncio.Task] = {}
+        self._pending: Dict[int, List[Any]] = {}
+        # id первой записи, пришедшей во время построения: эта и следующие
+        # записи агента считаются из _pending, даже если loader их уже видит
+        self._pending_since: Dict[int, int] = {}
+
+    def _load(self, agent_id: int) -> AgentAggregates:
+        aggregates = AgentAggregates()
+        # Политика хранения переносит записи из хранилища в архив во время
+        # чтения, а при сбое запись может остаться в обоих: считаем по id
+        seen = set()
+        for logs in self._loader(agent_id):
+            since = self._pending_since.get(agent_id)
+            for log in logs:
+                if (since is None or log.id < since) and log.id not in seen:
+                    seen.add(log.id)
+                    aggregates.add(log)
+        return aggregates
+
+    def _build(self, agent_id: int) -> asyncio.Task:
+        task = self._building.get(agent_id)
+        if task is None:
+            self._pending[agent_id] = []
+            task = self._building[agent_id] = asyncio.create_task(self._finish_build(agent_id))
+        return task
+
+    async def _finish_build(self, agent_id: int) -> Optional[AgentAggregates]:
+        task = asyncio.current_task()
+        try:
+            aggregates = await asyncio.to_thread(self._load, agent_id)
+        except Exception as e:
+            print(f"❌ Ошибка построения статистики агента {agent_id}: {e}")
+            aggregates = None
+        if self._building.get(agent_id) is not task:
+            # Логи агента очистили во время построения
+            return self._agents.get(agent_id)
+        del self._building[agent_id]
+        pending = self._pending.pop(agent_id, [])
+        self._pending_since.pop(agent_id, None)
+        if aggregates is None:
+            return None
+        for log in pending:
+            aggregates.add(log)
+        self._agents[agent_id] = aggregates
+        return aggregates
+
+    def add(self, logs: Iterable[Any]) -> None:
+        for log in logs:
+            aggregates = self._agents.get(log.agent_id)
+            if aggregates is not None:
+                aggregates.add(log)
+                continue
+            if self._loader is None:
+                self._agents[log.agent_id] = aggregates = AgentAggregates()
+                aggregates.add(log)
+                continue
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # Без event loop (скрипты) строим сразу
+                self._agents[log.agent_id] = self._load(log.agent_id)
+                self._agents[log.agent_id].add(log)
+                continue
+            self._build(log.agent_id)
+            self._pending_since.setdefault(log.agent_id, log.id)
+            self._pending[log.agent_id].append(log)
+
+    def rebuild(self, batches: Iterable[List[Any]]) -> None:
+        self.clear()
+        for logs in batches:
+            for log in logs:
+                self._agents.setdefault(log.agent_id, AgentAggregates()).add(log)
+
+    def clear(self, agent_id: Optional[int] = None) -> None:
+        if agent_id:
+            self._agents.pop(agent_id, None)
+            self._building.pop(agent_id, None)
+            self._pending.pop(agent_id, None)
+            self._pending_since.pop(agent_id, None)
+        else:
+            self._agents = {}
+            self._building = {}
+            self._pending = {}
+            self._pending_since = {}
+
+    async def get(self, agent_id: int) -> AgentAggregates:
+        aggregates = self._agents.get(agent_id)
+        if aggregates is not None:
+            return aggregates
+        if self._loader is None:
+            return AgentAggregates()
+        aggregates = await asyncio.shield(self._build(agent_id))
+        return aggregates or AgentAggregates()
+
+    def loaded(self) -> int:
+        return len(self._agents)
+
+    async def intents(self, agent_id: int) -> List[str]:
+        return sorted((await self.get(agent_id)).intent_counts)
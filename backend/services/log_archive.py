@@ -0,0 +1,139 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from backend.models import DialogLog, LogQuery
+from backend.services.log_records import LogInterner, LogRecord, to_models
+from backend.services.log_store import log_matches
+
+SEGMENT_EXTENSIONS = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+
+class LogArchive:
+    """Архив логов, вытесненных политикой хранения.
+
+    Сегменты разбиты по агентам и дням: `<dir>/agent_<id>/<YYYY-MM-DD>.jsonl.gz`
+    (или `.jsonl.zst`). Каждый перенос дописывает в сегмент новый сжатый фрейм,
+    поэтому сегмент читается как один поток. Запросы читают только сегменты,
+    попадающие в диапазон дат.
+    """
+
+    def __init__(self):
+        self.directory = os.getenv("LOG_ARCHIVE_DIR", "logs_archive")
+        self.compression = os.getenv("LOG_ARCHIVE_COMPRESSION", "gzip")
+        if self.compression == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                print("⚠️ Пакет zstandard не установлен, архив логов сжимается gzip")
+                self.compression = "gzip"
+        elif self.compression != "gzip":
+            raise ValueError(f"Unknown LOG_ARCHIVE_COMPRESSION: {self.compression}")
+        self._lock = threading.Lock()
+
+    def _agent_dir(self, agent_id: int) -> str:
+        return os.path.join(self.directory, f"agent_{agent_id}")
+
+    def segments(self, agent_id: int) -> List[str]:
+        """Пути сегментов агента в порядке дат"""
+        agent_dir = self._agent_dir(agent_id)
+        if not os.path.isdir(agent_dir):
+            return []
+        names = [name for name in os.listdir(agent_dir) if name.endswith(tuple(SEGMENT_EXTENSIONS.values()))]
+        return [os.path.join(agent_dir, name) for name in sorted(names)]
+
+    @staticmethod
+    def _segment_day(path: str) -> str:
+        return os.path.basename(path)[:10]
+
+    def write(self, logs: List[DialogLog]) -> None:
+        """Дописывание записей в сегменты их агента и дня"""
+        groups: Dict[tuple, List[DialogLog]] = {}
+        for log in logs:
+            groups.setdefault((log.agent_id, log.timestamp[:10]), []).append(log)
+
+        with self._lock:
+            for (agent_id, day), group in groups.items():
+                os.makedirs(self._agent_dir(agent_id), exist_ok=True)
+                path = os.path.join(self._agent_dir(agent_id), day + SEGMENT_EXTENSIONS[self.compression])
+                data = "".join(json.dumps(log.dict(), ensure_ascii=False) + "\n" for log in group).encode("utf-8")
+                with open(path, "ab") as f:
+                    f.write(self._compress(data))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            import zstandard
+            return zstandard.ZstdCompressor().compress(data)
+        return gzip.compress(data)
+
+    @staticmethod
+    def _read_segment(path: str, interner: LogInterner) -> Iterator[LogRecord]:
+        if path.endswith(SEGMENT_EXTENSIONS["zstd"]):
+            import zstandard
+            raw = open(path, "rb")
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        else:
+            stream = gzip.open(path, "rb")
+        with stream, io.TextIOWrapper(stream, encoding="utf-8") as lines:
+            for line in lines:
+                if line.strip():
+                    yield interner.record(json.loads(line))
+
+    def scan(self, agent_id: Optional[int] = None) -> Iterator[List[LogRecord]]:
+        """Все архивные записи (агента или всех агентов) по сегментам"""
+        interner = LogInterner()
+        if agent_id is None:
+            if not os.path.isdir(self.directory):
+                return
+            agent_ids = sorted(int(name[len("agent_"):]) for name in os.listdir(self.directory)
+                               if name.startswith("agent_") and name[len("agent_"):].isdigit())
+        else:
+            agent_ids = [agent_id]
+        for current in agent_ids:
+            for path in self.segments(current):
+                yield list(self._read_segment(path, interner))
+
+    def page(self, query: LogQuery) -> List[DialogLog]:
+        """Страница архивных логов; сегменты вне диапазона дат не читаются"""
+        segments = self.segments(query.agent_id)
+        if query.descending:
+            segments.reverse()
+
+        interner = LogInterner()
+        result: List[LogRecord] = []
+        for path in segments:
+            day = self._segment_day(path)
+            if (query.since and day < query.since[:10]) or (query.until and day > query.until[:10]):
+                continue
+            if query.after is not None:
+                # Сегменты целиком до позиции курсора пропускаем
+                cursor_day = query.after[0][:10]
+                if (query.descending and day > cursor_day) or (not query.descending and day < cursor_day):
+                    continue
+            selected = [log for log in self._read_segment(path, interner) if log_matches(log, query)]
+            selected.sort(key=lambda log: (log.timestamp, log.id), reverse=query.descending)
+            result.extend(selected)
+            if len(result) >= query.limit:
+                break
+        return to_models(result[:query.limit])
+
+    def clear(self, agent_id: Optional[int] = None) -> None:
+        with self._lock:
+            path = self.directory if agent_id is None else self._agent_dir(agent_id)
+            shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self, agent_id: int) -> Dict[str, Any]:
+        segments = self.segments(agent_id)
+        return {
+            "compression": self.compression,
+            "segments": len(segments),
+            "bytes": sum(os.path.getsize(path) for path in segments),
+            "first_day": self._segment_day(segments[0]) if segments else None,
+            "last_day": self._segment_day(segments[-1]) if segments else None
+        }
@@ -0,0 +1,114 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from backend.models import DialogLog
+
+FIELDS = ("id", "agent_id", "sender", "user_message", "bot_response", "intent",
+          "intent_confidence", "entities", "timestamp", "processing_time_ms")
+
+_NO_ENTITIES: Tuple[Dict[str, Any], ...] = ()
+
+
+class LogRecord:
+    """Компактная запись лога в памяти.
+
+    Поля те же, что у DialogLog (фильтры и агрегаты работают с обоими), но
+    без накладных расходов pydantic: `bot_response` и `entities` — кортежи,
+    повторяющиеся строки общие (см. LogInterner). DialogLog создается только
+    при отдаче записи наружу (to_model).
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, id: int, agent_id: int, sender: str, user_message: str,
+                 bot_response: Tuple[str, ...], intent: Optional[str], intent_confidence: Optional[float],
+                 entities: Tuple[Dict[str, Any], ...], timestamp: str, processing_time_ms: Optional[float]):
+        self.id = id
+        self.agent_id = agent_id
+        self.sender = sender
+        self.user_message = user_message
+        self.bot_response = bot_response
+        self.intent = intent
+        self.intent_confidence = intent_confidence
+        self.entities = entities
+        self.timestamp = timestamp
+        self.processing_time_ms = processing_time_ms
+
+    def dict(self) -> Dict[str, Any]:
+        """То же, что DialogLog.dict()"""
+        return {
+            "id": self.id,
+            "agent_id": self.agent_id,
+            "sender": self.sender,
+            "user_message": self.user_message,
+            "bot_response": list(self.bot_response),
+            "intent": self.intent,
+            "intent_confidence": self.intent_confidence,
+            "entities": list(self.entities),
+            "timestamp": self.timestamp,
+            "processing_time_ms": self.processing_time_ms
+        }
+
+    def to_model(self) -> DialogLog:
+        return DialogLog(**self.dict())
+
+
+class LogInterner:
+    """Словари общих значений для компактных записей.
+
+    Отправители и интенты повторяются в каждой записи, ответы бота чаще всего
+    берутся из шаблонов домена: каждое такое значение хранится в памяти один
+    раз, записи ссылаются на него.
+    """
+
+    def __init__(self):
+        self._strings: Dict[str, str] = {}
+        self._responses: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+    def text(self, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        return self._strings.setdefault(value, value)
+
+    def responses(self, values: Iterable[str]) -> Tuple[str, ...]:
+        key = tuple(self.text(value) for value in values)
+        return self._responses.setdefault(key, key)
+
+    def record(self, data: Dict[str, Any]) -> LogRecord:
+        """Запись из словаря (строка журнала, снимок, архив) без pydantic"""
+        return LogRecord(
+            id=data["id"],
+            agent_id=data["agent_id"],
+            sender=self.text(data["sender"]),
+            user_message=data["user_message"],
+            bot_response=self.responses(data["bot_response"]),
+            intent=self.text(data.get("intent")),
+            intent_confidence=data.get("intent_confidence"),
+            entities=tuple(data["entities"]) if data.get("entities") else _NO_ENTITIES,
+            timestamp=data["timestamp"],
+            processing_time_ms=data.get("processing_time_ms")
+        )
+
+    def from_model(self, log: DialogLog) -> LogRecord:
+        return LogRecord(
+            id=log.id,
+            agent_id=log.agent_id,
+            sender=self.text(log.sender),
+            user_message=log.user_message,
+            bot_response=self.responses(log.bot_response),
+            intent=self.text(log.intent),
+            intent_confidence=log.intent_confidence,
+            entities=tuple(log.entities) if log.entities else _NO_ENTITIES,
+            timestamp=log.timestamp,
+            processing_time_ms=log.processing_time_ms
+        )
+
+    def clear(self) -> None:
+        self._strings = {}
+        self._responses = {}
+
+    def stats(self) -> Dict[str, int]:
+        return {"strings": len(self._strings), "responses": len(self._responses)}
+
+
+def to_models(records: Iterable[LogRecord]) -> List[DialogLog]:
+    return [record.to_model() for record in records]
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from backend.models import Agent, DialogLog
+from backend.dialog_logger import dialog_logger
+from backend.services.agent_service import agent_service
+
+
+class LogRetention:
+    """Фоновое применение политики хранения логов.
+
+    Записи старше `days` дней и сверх `max_records` последних записей агента
+    переносятся из хранилища в сжатый архив (LogArchive), где их по-прежнему
+    можно запросить. Настройки агента (log_retention_days,
+    log_retention_max_records) перекрывают глобальные; 0 — без ограничения.
+    `hot_max_records` ограничивает общее число записей в хранилище.
+    """
+
+    def __init__(self):
+        self.days = int(os.getenv("LOG_RETENTION_DAYS", "0"))
+        self.max_records = int(os.getenv("LOG_RETENTION_MAX_RECORDS", "0"))
+        self.hot_max_records = int(os.getenv("LOG_HOT_MAX_RECORDS", "0"))
+        self.interval = float(os.getenv("LOG_RETENTION_INTERVAL", "60"))
+        self.batch_size = int(os.getenv("LOG_RETENTION_BATCH", "5000"))
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+        self.runs = 0
+        self.archived = 0
+        self.last_run: Optional[str] = None
+        self.last_run_ms = 0.0
+        self.last_archived = 0
+        self.last_error: Optional[str] = None
+
+    def limits(self, agent: Optional[Agent]) -> Dict[str, int]:
+        """Действующие для агента ограничения (0 — без ограничения)"""
+        days = agent.log_retention_days if agent and agent.log_retention_days is not None else self.days
+        max_records = (agent.log_retention_max_records
+                       if agent and agent.log_retention_max_records is not None else self.max_records)
+        return {"days": days, "max_records": max_records}
+
+    def _archive(self, logs: List[DialogLog]) -> int:
+        # Сначала архив, потом удаление: при сбое запись задвоится, но не пропадет
+        dialog_logger.archive.write(logs)
+        dialog_logger.store.delete([log.id for log in logs])
+        dialog_logger.search_index.discard(logs)
+        return len(logs)
+
+    def _archive_oldest(self, agent_id: Optional[int], excess: int) -> int:
+        moved = 0
+        while moved < excess:
+            logs = dialog_logger.store.oldest(agent_id, min(excess - moved, self.batch_size))
+            if not logs:
+                break
+            moved += self._archive(logs)
+        return moved
+
+    def _archive_before(self, agent_id: int, cutoff: str) -> int:
+        moved = 0
+        while True:
+            logs = dialog_logger.store.oldest(agent_id, self.batch_size, before=cutoff)
+            if not logs:
+                return moved
+            moved += self._archive(logs)
+
+    def run_once(self) -> int:
+        """Один проход политики хранения; возвращает число перенесенных записей"""
+        started = time.perf_counter()
+        moved = 0
+        store = dialog_logger.store
+        for agent_id, count in store.agent_counts().items():
+            limits = self.limits(agent_service.get_agent(agent_id))
+            if limits["max_records"] and count > limits["max_records"]:
+                moved += self._archive_oldest(agent_id, count - limits["max_records"])
+            if limits["days"]:
+                cutoff = (datetime.now() - timedelta(days=limits["days"])).isoformat()
+                moved += self._archive_before(agent_id, cutoff)
+
+        if self.hot_max_records:
+            total = sum(store.agent_counts().values())
+            if total > self.hot_max_records:
+                moved += self._archive_oldest(None, total - self.hot_max_records)
+
+        self.runs += 1
+        self.archived += moved
+        self.last_archived = moved
+        self.last_run = datetime.now().isoformat()
+        self.last_run_ms = (time.perf_counter() - started) * 1000
+        if moved:
+            print(f"🗄️ В архив перенесено {moved} логов диалогов")
+        return moved
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                # Перенос идет в отдельном потоке и не блокирует обработку запросов
+                await asyncio.to_thread(self.run_once)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Ошибка применения политики хранения логов: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановка после завершения текущего прохода (хранилище еще открыто)"""
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "days": self.days,
+            "max_records": self.max_records,
+            "hot_max_records": self.hot_max_records,
+            "interval_s": self.interval,
+            "hot_records": sum(dialog_logger.store.agent_counts().values()),
+            "runs": self.runs,
+            "archived": self.archived,
+            "last_run": self.last_run,
+            "last_run_ms": round(self.last_run_ms, 2),
+            "last_archived": self.last_archived,
+            "last_error": self.last_error
+        }
+
+
+log_retention = LogRetention()
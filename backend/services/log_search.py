@@ -0,0 +1,320 @@
+import asyncio
+import math
+import os
+from array import array
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from backend.utils.text import normalize_text
+
+# Окончания русских слов, которые отбрасывает stem (по длине, сначала длинные)
+RU_ENDINGS: Dict[int, FrozenSet[str]] = {}
+for _ending in (
+    "иями", "ями", "ами", "иях", "ях", "ах", "ием", "ем", "ом", "ой", "ей", "ий", "ый", "ое", "ее",
+    "ые", "ие", "ая", "яя", "ую", "юю", "ого", "его", "ому", "ему", "ыми", "ими", "ым", "им",
+    "ов", "ев", "ам", "ям", "ия", "ья", "ью", "ию", "ии", "ость", "ости", "ение", "ения", "ений",
+    "ать", "ять", "ить", "еть", "ешь", "ет", "ете", "ит", "ите", "ут", "ют", "ат", "ят", "ует",
+    "уют", "ает", "ают", "ть", "ла", "ло", "ли", "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й"
+):
+    RU_ENDINGS[len(_ending)] = RU_ENDINGS.get(len(_ending), frozenset()) | {_ending}
+RU_ENDING_LENGTHS = sorted(RU_ENDINGS, reverse=True)
+RU_MIN_STEM = 3
+
+STOP_WORDS = frozenset(
+    "и в во на не что он она оно они я мы вы ты с со как а то все так его но да к у же бы по "
+    "за из от о об для ли или до при ну вот это мне вам нам вас нас".split()
+)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+@lru_cache(maxsize=200000)
+def stem(word: str) -> str:
+    """Упрощенный стемминг: возвратная частица и одно окончание.
+    Слова не на кириллице и числа не меняются."""
+    if not ("а" <= word[0] <= "я"):
+        return word
+    if word.endswith(("ся", "сь")) and len(word) - 2 >= RU_MIN_STEM:
+        word = word[:-2]
+    for length in RU_ENDING_LENGTHS:
+        if len(word) - length >= RU_MIN_STEM and word[-length:] in RU_ENDINGS[length]:
+            return word[:-length]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Нормализованные термы текста: нижний регистр, ё → е, стемминг, без стоп-слов"""
+    return [stem(word) for word in normalize_text(text).split() if word not in STOP_WORDS]
+
+
+def log_text(log: Any) -> str:
+    return " ".join([log.user_message, *log.bot_response])
+
+
+class AgentSearchIndex:
+    """Инвертированный индекс логов одного агента (BM25).
+
+    Документы нумеруются по порядку добавления; постинги — массивы номеров
+    документов (по возрастанию) и частот терма, поэтому пересечение и
+    подсчет очков идут векторно в NumPy. Удаленные документы только
+    помечаются; когда их доля превышает SEARCH_INDEX_COMPACT_RATIO, индекс
+    перенумеровывается без них.
+    """
+
+    def __init__(self):
+        self.compact_ratio = float(os.getenv("SEARCH_INDEX_COMPACT_RATIO", "0.25"))
+        self.compact_min_docs = int(os.getenv("SEARCH_INDEX_COMPACT_MIN", "1000"))
+        self.log_ids = array("q")
+        self.lengths = array("I")
+        self.alive = bytearray()
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.total_length = 0
+        self.live = 0
+
+    def add(self, log_id: int, text: str) -> None:
+        doc = len(self.log_ids)
+        terms: Dict[str, int] = {}
+        for term in tokenize(text):
+            terms[term] = terms.get(term, 0) + 1
+        for term, count in terms.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array("I"), array("H"))
+            posting[0].append(doc)
+            posting[1].append(min(count, 65535))
+        length = sum(terms.values())
+        self.log_ids.append(log_id)
+        self.lengths.append(length)
+        self.alive.append(1)
+        self.total_length += length
+        self.live += 1
+
+    def add_logs(self, logs: Iterable[Any]) -> None:
+        for log in logs:
+            self.add(log.id, log_text(log))
+
+    def discard(self, ids: Iterable[int]) -> None:
+        """Исключение удаленных записей из выдачи; постинги перестраиваются,
+        когда удаленных накопилось много (см. compact)"""
+        ids = np.fromiter(ids, dtype=np.int64)
+        if not len(ids) or not len(self.log_ids):
+            return
+        docs = np.flatnonzero(np.isin(np.frombuffer(self.log_ids, dtype=np.int64), ids))
+        for doc in docs.tolist():
+            if self.alive[doc]:
+                self.alive[doc] = 0
+                self.live -= 1
+                self.total_length -= self.lengths[doc]
+        dead = len(self.log_ids) - self.live
+        if dead >= self.compact_min_docs and dead > self.compact_ratio * len(self.log_ids):
+            self.compact()
+
+    def compact(self) -> None:
+        """Перенумерация документов без удаленных: постинги и df только по живым"""
+        alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        new_doc = (np.cumsum(alive) - 1).astype(np.uint32)
+        postings: Dict[str, Tuple[array, array]] = {}
+        for term, (docs, tf) in self.postings.items():
+            docs = np.frombuffer(docs, dtype=np.uint32)
+            keep = alive[docs]
+            if not keep.any():
+                continue
+            postings[term] = (array("I", new_doc[docs[keep]].tobytes()),
+                              array("H", np.frombuffer(tf, dtype=np.uint16)[keep].tobytes()))
+        self.postings = postings
+        self.log_ids = array("q", np.frombuffer(self.log_ids, dtype=np.int64)[alive].tobytes())
+        self.lengths = array("I", np.frombuffer(self.lengths, dtype=np.uint32)[alive].tobytes())
+        self.alive = bytearray(b"\x01" * self.live)
+
+    def contains(self, ids: List[int]) -> np.ndarray:
+        return np.isin(np.asarray(ids, dtype=np.int64), np.frombuffer(self.log_ids, dtype=np.int64))
+
+    def search(self, terms: List[str], offset: int, limit: int) -> Tuple[int, List[Tuple[int, float]]]:
+        """Документы со всеми термами запроса: (всего найдено, [(log_id, score)])"""
+        postings = [self.postings.get(term) for term in dict.fromkeys(terms)]
+        if not postings or any(posting is None for posting in postings) or not self.live:
+            return 0, []
+        postings.sort(key=lambda posting: len(posting[0]))
+
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+        avg_length = max(self.total_length / self.live, 1.0)
+
+        def term_scores(docs: np.ndarray, tf: np.ndarray, df: int) -> np.ndarray:
+            idf = math.log(1 + (self.live - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[docs] / avg_length)
+            return idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        # Начинаем с самого редкого терма: кандидатов меньше всего
+        docs = np.frombuffer(postings[0][0], dtype=np.uint32)
+        tf = np.frombuffer(postings[0][1], dtype=np.uint16).astype(np.float64)
+        scores = term_scores(docs, tf, len(docs))
+        for term_docs, term_tf in postings[1:]:
+            if not len(docs):
+                break
+            # Пересечение за линейное время: постинги отсортированы по номеру документа
+            all_docs = np.frombuffer(term_docs, dtype=np.uint32)
+            candidates = np.zeros(len(self.log_ids), dtype=bool)
+            candidates[docs] = True
+            right = np.flatnonzero(candidates[all_docs])
+            left = np.searchsorted(docs, all_docs[right])
+            docs = docs[left]
+            tf = np.frombuffer(term_tf, dtype=np.uint16)[right].astype(np.float64)
+            scores = scores[left] + term_scores(docs, tf, len(all_docs))
+
+        mask = np.frombuffer(self.alive, dtype=np.uint8)[docs].astype(bool)
+        docs, scores = docs[mask], scores[mask]
+        total = len(docs)
+        end = offset + limit
+        if offset >= total:
+            return total, []
+
+        # По убыванию релевантности, при равенстве — сначала новые: ключ
+        # (очки с точностью 1e-6, номер документа) в одном int64, и вместо
+        # полной сортировки выбираются только первые offset + limit
+        keys = (np.round(scores * 1e6).astype(np.int64) << 32) | docs.astype(np.int64)
+        if end < total:
+            top = np.argpartition(-keys, end - 1)[:end]
+        else:
+            top = np.arange(total)
+        top = top[np.argsort(-keys[top])][offset:end]
+        log_ids = np.frombuffer(self.log_ids, dtype=np.int64)
+        return total, [(int(log_ids[doc]), round(float(score), 4))
+                       for doc, score in zip(docs[top], scores[top])]
+
+
+class LogSearchIndex:
+    """Полнотекстовый поиск по логам диалогов (user_message и bot_response).
+
+    Индекс агента строится в отдельном потоке при первом поиске по истории из
+    `loader(agent_id)` и дальше пополняется при записи логов. Записи,
+    которые пришли во время построения или еще не дошли до хранилища (очередь
+    LogWriter), досылаются в индекс после построения.
+    """
+
+    def __init__(self, loader: Callable[[int], Iterable[List[Any]]]):
+        self._loader = loader
+        self._agents: Dict[int, AgentSearchIndex] = {}
+        self._building: Dict[int, asyncio.Task] = {}
+        self._pending: Dict[int, List[Any]] = {}
+        # Удаленные записи (политика хранения удаляет их из другого потока);
+        # применяются к индексам, _recent и _pending перед поиском
+        self._discarded: Deque[Tuple[int, List[int]]] = deque()
+        # Удаленные во время построения: построенный индекс мог их уже прочитать
+        self._discarded_while_building: Dict[int, List[int]] = {}
+        # Последние записи агентов без индекса: их может еще не быть в хранилище
+        self._recent: Deque[Any] = deque(maxlen=int(os.getenv("LOG_WRITER_QUEUE_SIZE", "10000")))
+
+    def add(self, logs: Iterable[Any]) -> None:
+        if self._discarded:
+            self._apply_discarded()
+        for log in logs:
+            index = self._agents.get(log.agent_id)
+            if index is not None:
+                index.add(log.id, log_text(log))
+            elif log.agent_id in self._building:
+                self._pending[log.agent_id].append(log)
+            else:
+                self._recent.append(log)
+
+    def _build(self, agent_id: int) -> AgentSearchIndex:
+        index = AgentSearchIndex()
+        for logs in self._loader(agent_id):
+            index.add_logs(logs)
+        return index
+
+    def _apply_discarded(self) -> None:
+        removed: Set[int] = set()
+        while self._discarded:
+            agent_id, ids = self._discarded.popleft()
+            index = self._agents.get(agent_id)
+            if index is not None:
+                index.discard(ids)
+                continue
+            if agent_id in self._building:
+                self._discarded_while_building.setdefault(agent_id, []).extend(ids)
+            removed.update(ids)
+        if not removed:
+            return
+        # Удаленные записи не должны вернуться в индекс при его построении
+        self._recent = deque((log for log in self._recent if log.id not in removed), maxlen=self._recent.maxlen)
+        for agent_id, pending in self._pending.items():
+            self._pending[agent_id] = [log for log in pending if log.id not in removed]
+
+    async def agent_index(self, agent_id: int) -> AgentSearchIndex:
+        self._apply_discarded()
+        index = self._agents.get(agent_id)
+        if index is not None:
+            return index
+        task = self._building.get(agent_id)
+        if task is None:
+            self._pending[agent_id] = [log for log in self._recent if log.agent_id == agent_id]
+            task = self._building[agent_id] = asyncio.create_task(asyncio.to_thread(self._build, agent_id))
+        try:
+            index = await asyncio.shield(task)
+        except Exception:
+            if self._building.get(agent_id) is task:
+                del self._building[agent_id]
+                self._pending.pop(agent_id, None)
+                self._discarded_while_building.pop(agent_id, None)
+            raise
+
+        if self._building.get(agent_id) is task:
+            self._apply_discarded()
+            del self._building[agent_id]
+            pending = self._pending.pop(agent_id, [])
+            if pending:
+                indexed = index.contains([log.id for log in pending])
+                index.add_logs(log for log, seen in zip(pending, indexed) if not seen)
+            index.discard(self._discarded_while_building.pop(agent_id, []))
+            self._agents[agent_id] = index
+            print(f"🔎 Поисковый индекс агента {agent_id}: {len(index.log_ids)} записей, "
+                  f"{len(index.postings)} термов")
+        # Логи агента очистили во время построения — индекс будет построен заново
+        return self._agents.get(agent_id) or AgentSearchIndex()
+
+    async def search(self, agent_id: int, query: str, offset: int = 0,
+                     limit: int = 20) -> Tuple[int, List[Tuple[int, float]]]:
+        terms = tokenize(query)
+        if not terms:
+            return 0, []
+        index = await self.agent_index(agent_id)
+        return index.search(terms, offset, limit)
+
+    def discard(self, logs: Iterable[Any]) -> None:
+        """Записи удалены из хранилища (можно вызывать из любого потока)"""
+        by_agent: Dict[int, List[int]] = {}
+        for log in logs:
+            by_agent.setdefault(log.agent_id, []).append(log.id)
+        # Очередь разбирает event loop (_apply_discarded): для агентов без
+        # индекса удаленные записи убираются из _recent и _pending
+        for agent_id, ids in by_agent.items():
+            self._discarded.append((agent_id, ids))
+
+    def clear(self, agent_id: Optional[int] = None) -> None:
+        if agent_id:
+            self._agents.pop(agent_id, None)
+            self._building.pop(agent_id, None)
+            self._pending.pop(agent_id, None)
+            self._discarded_while_building.pop(agent_id, None)
+            self._recent = deque((log for log in self._recent if log.agent_id != agent_id),
+                                 maxlen=self._recent.maxlen)
+        else:
+            self._agents = {}
+            self._building = {}
+            self._pending = {}
+            self._discarded_while_building = {}
+            self._recent.clear()
+
+    def stats(self, agent_id: int) -> Dict[str, Any]:
+        index = self._agents.get(agent_id)
+        return {
+            "built": index is not None,
+            "building": agent_id in self._building,
+            "documents": index.live if index else 0,
+            "deleted_documents": len(index.log_ids) - index.live if index else 0,
+            "terms": len(index.postings) if index else 0
+        }
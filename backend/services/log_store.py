@@ -0,0 +1,450 @@
+import bisect
+import heapq
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Any
+
+from backend.models import DialogLog, LogQuery
+from backend.services.log_aggregates import is_error_log
+from backend.services.log_records import LogInterner, LogRecord, to_models
+from backend.services.persistence import write_atomic
+
+
+class LogStore(ABC):
+    """Интерфейс хранилища логов диалогов (хранилище без какого-либо из
+    абстрактных методов не создается).
+
+    Идентификаторы назначает DialogLogger; хранилище отвечает за
+    персистентность и выполняет фильтрацию, лимиты и подсчеты у себя.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def next_id(self) -> int:
+        ...
+
+    @abstractmethod
+    def append(self, logs: List[DialogLog]) -> None:
+        ...
+
+    @abstractmethod
+    def query(self, agent_id: Optional[int] = None, intent: Optional[str] = None,
+              limit: Optional[int] = None) -> List[DialogLog]:
+        """Логи агента (или всех агентов) в порядке записи"""
+
+    @abstractmethod
+    def page(self, query: LogQuery) -> List[DialogLog]:
+        """Страница логов агента по ключу (timestamp, id) в заданном порядке"""
+
+    @abstractmethod
+    def get(self, agent_id: int, log_id: int) -> Optional[DialogLog]:
+        ...
+
+    @abstractmethod
+    def get_many(self, agent_id: int, ids: List[int]) -> Dict[int, DialogLog]:
+        """Записи агента по номерам (отсутствующие пропускаются)"""
+
+    @abstractmethod
+    def scan(self, batch_size: int = 10000, agent_id: Optional[int] = None) -> Iterator[List[LogRecord]]:
+        """Все логи (или логи агента) пачками компактных записей, без загрузки
+        истории в память целиком"""
+
+    @abstractmethod
+    def count(self, agent_id: int) -> int:
+        ...
+
+    @abstractmethod
+    def agent_counts(self) -> Dict[int, int]:
+        """Число записей по агентам"""
+
+    @abstractmethod
+    def oldest(self, agent_id: Optional[int], limit: int, before: Optional[str] = None) -> List[DialogLog]:
+        """Самые старые записи агента (или всех агентов), опционально старше `before`"""
+
+    @abstractmethod
+    def delete(self, ids: List[int]) -> None:
+        ...
+
+    @abstractmethod
+    def last_activity(self, agent_id: int) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def intents(self, agent_id: int) -> List[str]:
+        ...
+
+    @abstractmethod
+    def clear(self, agent_id: Optional[int] = None) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+def log_matches(log: Any, query: LogQuery) -> bool:
+    """Проверка записи на фильтры и позицию страницы запроса"""
+    key = (log.timestamp, log.id)
+    confidence = log.intent_confidence
+    return (
+        log.agent_id == query.agent_id
+        and (query.after is None or (key < query.after if query.descending else key > query.after))
+        and (not query.intent or log.intent == query.intent)
+        and (not query.sender or log.sender == query.sender)
+        and (not query.since or log.timestamp >= query.since)
+        and (not query.until or log.timestamp < query.until)
+        and (query.min_confidence is None or (confidence is not None and confidence >= query.min_confidence))
+        and (query.max_confidence is None or (confidence is not None and confidence <= query.max_confidence))
+        and (not query.errors_only or is_error_log(log))
+    )
+
+
+def page_logs(logs: Iterable[Any], query: LogQuery) -> List[Any]:
+    """Страница по запросу из произвольного набора записей (без индексов)"""
+    selected = (log for log in logs if log_matches(log, query))
+    pick = heapq.nlargest if query.descending else heapq.nsmallest
+    return pick(query.limit, selected, key=lambda log: (log.timestamp, log.id))
+
+
+def page_sorted(keys: List[Tuple[str, int]], logs: List[Any], query: LogQuery) -> List[Any]:
+    """Страница по запросу из записей, упорядоченных по (timestamp, id).
+
+    Курсор и границы since/until находятся бинарным поиском, остальные
+    фильтры проверяются только для записей, просматриваемых до заполнения
+    страницы.
+    """
+    lo, hi = 0, len(keys)
+    if query.since:
+        lo = bisect.bisect_left(keys, (query.since,))
+    if query.until:
+        hi = bisect.bisect_left(keys, (query.until,), lo)
+    if query.after is not None:
+        if query.descending:
+            hi = bisect.bisect_left(keys, tuple(query.after), lo, hi)
+        else:
+            lo = bisect.bisect_right(keys, tuple(query.after), lo, hi)
+
+    positions = range(hi - 1, lo - 1, -1) if query.descending else range(lo, hi)
+    selected = []
+    for i in positions:
+        if log_matches(logs[i], query):
+            selected.append(logs[i])
+            if len(selected) >= query.limit:
+                break
+    return selected
+
+
+def load_json_state(logs_file: str, journal_file: str,
+                    interner: Optional[LogInterner] = None) -> Dict[str, Any]:
+    """Чтение снимка dialogs_state.json и хвоста журнала того же поколения.
+
+    Записи читаются сразу в компактном виде (LogRecord), без pydantic.
+
+    Снимок и журнал связаны номером поколения: журнал другого поколения (сбой
+    между записью снимка и сбросом журнала) игнорируется. `clean` — журнал
+    прочитан целиком и его можно продолжать дописывать.
+    """
+    interner = interner or LogInterner()
+    state = {"logs": [], "next_id": 1, "generation": 0, "snapshot_records": 0,
+             "journal_records": 0, "clean": False}
+    try:
+        if os.path.exists(logs_file):
+            with open(logs_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            state["logs"] = [interner.record(log_data) for log_data in data.get('logs', [])]
+            state["next_id"] = data.get('next_id', 1)
+            state["generation"] = data.get('generation', 0)
+            state["snapshot_records"] = len(state["logs"])
+    except Exception as e:
+        print(f"❌ Ошибка загрузки логов: {e}")
+
+    if not os.path.exists(journal_file):
+        return state
+
+    with open(journal_file, 'r', encoding='utf-8') as f:
+        try:
+            generation = json.loads(f.readline()).get('generation')
+        except ValueError:
+            generation = None
+        if generation != state["generation"]:
+            print(f"⚠️ Журнал {journal_file} не соответствует снимку, пропускаем")
+            return state
+
+        journal: Dict[int, LogRecord] = {}
+        deleted: Set[int] = set()
+        for line_number, line in enumerate(f, start=2):
+            try:
+                data = json.loads(line)
+                if 'deleted' in data:
+                    # Отметка об удалении записей (ретенция)
+                    deleted.update(data['deleted'])
+                    state["journal_records"] += len(data['deleted'])
+                    continue
+                log = interner.record(data)
+            except Exception as e:
+                # Обычно это недописанная при сбое последняя строка
+                print(f"⚠️ Журнал поврежден в строке {line_number}: {e}")
+                break
+            # Пачки из файла переполнения LogWriter приходят в журнал не по
+            # порядку id, поэтому записи не отсекаются по next_id: снимок и
+            # журнал и так связаны поколением. Повтор записи с тем же id
+            # заменяет прежнюю
+            journal[log.id] = log
+            state["next_id"] = max(state["next_id"], log.id + 1)
+            state["journal_records"] += 1
+        else:
+            state["clean"] = True
+
+    if journal:
+        by_id = {log.id: log for log in state["logs"]}
+        by_id.update(journal)
+        state["logs"] = sorted(by_id.values(), key=lambda log: log.id)
+    if deleted:
+        state["logs"] = [log for log in state["logs"] if log.id not in deleted]
+    return state
+
+
+class JournalLogStore(LogStore):
+    """Логи в памяти с персистентностью через снимок и JSONL журнал.
+
+    В памяти записи хранятся компактно (LogRecord с общими строками), DialogLog
+    создается только для записей, отдаваемых наружу.
+
+    Каждая запись дописывается одной строкой в журнал, поэтому стоимость
+    логирования не зависит от объема истории. Удаление записей (ретенция)
+    тоже дописывается в журнал отметкой {"deleted": [id, ...]}. Когда журнал
+    становится сопоставим по размеру со снимком, выполняется компакция:
+    новый снимок пишется атомарно, журнал начинается заново.
+    """
+
+    name = "journal"
+
+    def __init__(self, logs_file: str, journal_file: str):
+        self.logs_file = logs_file
+        self.journal_file = journal_file
+        # always — fsync после каждой записи, interval — не чаще раза в
+        # DIALOG_JOURNAL_FSYNC_INTERVAL секунд, never — на усмотрение ОС
+        self.fsync_policy = os.getenv("DIALOG_JOURNAL_FSYNC", "interval")
+        self.fsync_interval = float(os.getenv("DIALOG_JOURNAL_FSYNC_INTERVAL", "1"))
+        # Компакция, когда записей в журнале больше, чем ratio * записей в снимке
+        self.compact_min_records = int(os.getenv("DIALOG_JOURNAL_COMPACT_MIN", "10000"))
+        self.compact_ratio = float(os.getenv("DIALOG_JOURNAL_COMPACT_RATIO", "1.0"))
+
+        self.interner = LogInterner()
+        self.logs: List[LogRecord] = []
+        self._by_agent: Dict[int, List[LogRecord]] = {}
+        # Записи агента в порядке (timestamp, id) для постраничного просмотра
+        self._order_keys: Dict[int, List[Tuple[str, int]]] = {}
+        self._order_logs: Dict[int, List[LogRecord]] = {}
+        self._journal = None
+        self._last_fsync = 0.0
+        # Запись идет из потока LogWriter, удаление — из фоновой компакции
+        self._lock = threading.RLock()
+
+        state = load_json_state(logs_file, journal_file, self.interner)
+        self._next_id = state["next_id"]
+        self.generation = state["generation"]
+        self.snapshot_records = state["snapshot_records"]
+        self.journal_records = state["journal_records"]
+        self._index(state["logs"])
+        print(f"📊 Загружено {len(self.logs)} логов диалогов (из журнала: {self.journal_records})")
+
+        if state["clean"]:
+            self._open_journal()
+        else:
+            # Хвост журнала поврежден или журнал от другого поколения — сразу
+            # переписываем состояние начисто
+            self.compact()
+
+    def _index(self, logs: List[LogRecord]) -> None:
+        self.logs.extend(logs)
+        for log in logs:
+            self._by_agent.setdefault(log.agent_id, []).append(log)
+            keys = self._order_keys.setdefault(log.agent_id, [])
+            ordered = self._order_logs.setdefault(log.agent_id, [])
+            key = (log.timestamp, log.id)
+            if not keys or keys[-1] <= key:
+                # Обычный случай: записи приходят в порядке времени
+                keys.append(key)
+                ordered.append(log)
+            else:
+                position = bisect.bisect_right(keys, key)
+                keys.insert(position, key)
+                ordered.insert(position, log)
+
+    def _reindex(self) -> None:
+        self._by_agent = {}
+        self._order_keys = {}
+        self._order_logs = {}
+        logs, self.logs = self.logs, []
+        self._index(logs)
+
+    def _open_journal(self):
+        self._journal = open(self.journal_file, 'a', encoding='utf-8')
+
+    def compact(self) -> None:
+        """Атомарная запись снимка и новый пустой журнал"""
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        try:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+            generation = self.generation + 1
+            state_data = {
+                'next_id': self._next_id,
+                'generation': generation,
+                'logs': [log.dict() for log in self.logs],
+                'saved_at': datetime.now().isoformat()
+            }
+            write_atomic(self.logs_file, lambda f: json.dump(state_data, f, ensure_ascii=False))
+            write_atomic(
+                self.journal_file,
+                lambda f: f.write(json.dumps({'generation': generation}) + "\n")
+            )
+
+            self.generation = generation
+            self.snapshot_records = len(self.logs)
+            self.journal_records = 0
+        except Exception as e:
+            print(f"❌ Ошибка сохранения логов: {e}")
+        finally:
+            if self._journal is None:
+                self._open_journal()
+
+    def next_id(self) -> int:
+        return self._next_id
+
+    def append(self, logs: List[DialogLog]) -> None:
+        """Дописывание записей в журнал с fsync по выбранной политике"""
+        with self._lock:
+            self._append(logs)
+
+    def _append(self, logs: List[DialogLog]) -> None:
+        self._index([self.interner.from_model(log) for log in logs])
+        self._next_id = max(self._next_id, logs[-1].id + 1)
+        lines = "".join(json.dumps(log.dict(), ensure_ascii=False) + "\n" for log in logs)
+        if self._write_journal(lines, len(logs)):
+            self._maybe_compact()
+
+    def _write_journal(self, lines: str, records: int) -> bool:
+        try:
+            self._journal.write(lines)
+            self._journal.flush()
+            now = time.monotonic()
+            if self.fsync_policy == "always" or (
+                    self.fsync_policy == "interval" and now - self._last_fsync >= self.fsync_interval):
+                os.fsync(self._journal.fileno())
+                self._last_fsync = now
+            self.journal_records += records
+            return True
+        except Exception as e:
+            print(f"❌ Ошибка записи журнала логов: {e}")
+            return False
+
+    def _maybe_compact(self) -> None:
+        if self.journal_records >= max(self.compact_min_records, self.snapshot_records * self.compact_ratio):
+            self._compact()
+
+    def query(self, agent_id: Optional[int] = None, intent: Optional[str] = None,
+              limit: Optional[int] = None) -> List[DialogLog]:
+        logs = self.logs if agent_id is None else self._by_agent.get(agent_id, [])
+        if intent:
+            logs = [log for log in logs if log.intent == intent]
+        return to_models(logs[:limit] if limit else logs)
+
+    def page(self, query: LogQuery) -> List[DialogLog]:
+        with self._lock:
+            keys = self._order_keys.get(query.agent_id, [])
+            logs = self._order_logs.get(query.agent_id, [])
+            return to_models(page_sorted(keys, logs, query))
+
+    def get(self, agent_id: int, log_id: int) -> Optional[DialogLog]:
+        log = next((log for log in self._by_agent.get(agent_id, []) if log.id == log_id), None)
+        return log.to_model() if log else None
+
+    def get_many(self, agent_id: int, ids: List[int]) -> Dict[int, DialogLog]:
+        wanted = set(ids)
+        return {log.id: log.to_model() for log in self._by_agent.get(agent_id, []) if log.id in wanted}
+
+    def scan(self, batch_size: int = 10000, agent_id: Optional[int] = None) -> Iterator[List[LogRecord]]:
+        logs = self.logs if agent_id is None else self._by_agent.get(agent_id, [])
+        for start in range(0, len(logs), batch_size):
+            yield logs[start:start + batch_size]
+
+    def count(self, agent_id: int) -> int:
+        return len(self._by_agent.get(agent_id, []))
+
+    def agent_counts(self) -> Dict[int, int]:
+        return {agent_id: len(logs) for agent_id, logs in self._by_agent.items() if logs}
+
+    def oldest(self, agent_id: Optional[int], limit: int, before: Optional[str] = None) -> List[DialogLog]:
+        logs = self.logs if agent_id is None else self._by_agent.get(agent_id, [])
+        if before:
+            logs = [log for log in logs if log.timestamp < before]
+        return to_models(sorted(logs, key=lambda log: (log.timestamp, log.id))[:limit])
+
+    def delete(self, ids: List[int]) -> None:
+        removed = set(ids)
+        with self._lock:
+            self.logs = [log for log in self.logs if log.id not in removed]
+            self._reindex()
+            # Отметка в журнал вместо переписывания снимка на каждую пачку
+            # ретенции; снимок перепишет обычная компакция по размеру журнала
+            tombstone = json.dumps({'deleted': sorted(removed)}) + "\n"
+            if self._write_journal(tombstone, len(removed)):
+                self._maybe_compact()
+            else:
+                self._compact()
+
+    def last_activity(self, agent_id: int) -> Optional[str]:
+        logs = self._by_agent.get(agent_id)
+        return max(log.timestamp for log in logs) if logs else None
+
+    def intents(self, agent_id: int) -> List[str]:
+        return sorted({log.intent for log in self._by_agent.get(agent_id, []) if log.intent})
+
+    def clear(self, agent_id: Optional[int] = None) -> None:
+        with self._lock:
+            if agent_id:
+                self.logs = [log for log in self.logs if log.agent_id != agent_id]
+                self._by_agent.pop(agent_id, None)
+                self._order_keys.pop(agent_id, None)
+                self._order_logs.pop(agent_id, None)
+            else:
+                # Номера логов не переиспользуем: в очереди LogWriter могут
+                # оставаться записи с большими id
+                self.logs = []
+                self._by_agent = {}
+                self._order_keys = {}
+                self._order_logs = {}
+                self.interner.clear()
+            self._compact()
+
+    def close(self) -> None:
+        """Сброс журнала на диск при остановке"""
+        if self._journal is not None:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal.close()
+            self._journal = None
+
+
+def create_log_store() -> LogStore:
+    """Хранилище логов по DIALOG_LOG_STORE: sqlite (по умолчанию) или journal"""
+    logs_file = "dialogs_state.json"
+    journal_file = os.getenv("DIALOG_JOURNAL_FILE", "dialogs_journal.jsonl")
+    backend = os.getenv("DIALOG_LOG_STORE", "sqlite")
+    if backend == "journal":
+        return JournalLogStore(logs_file, journal_file)
+    if backend == "sqlite":
+        from backend.services.sqlite_log_store import SQLiteLogStore
+        return SQLiteLogStore(os.getenv("DIALOG_DB_FILE", "dialogs.db"), migrate_from=(logs_file, journal_file))
+    raise ValueError(f"Unknown DIALOG_LOG_STORE: {backend}")
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from backend.models import DialogLog
+from backend.services.log_store import LogStore
+
+
+class LogWriter:
+    """Фоновая запись логов диалогов пачками (group commit).
+
+    Запросы только кладут записи в ограниченную очередь; фоновая задача
+    собирает пачку до `batch_size` записей или `flush_ms` миллисекунд и
+    записывает ее в хранилище одним вызовом в отдельном потоке, не блокируя
+    event loop. При переполнении очереди действует политика `overflow`:
+    block — ждать места, drop — отбросить запись, spill — дописать ее в
+    файл на диске, откуда она попадет в хранилище, когда очередь опустеет.
+    """
+
+    OVERFLOW_POLICIES = ("block", "drop", "spill")
+
+    def __init__(self, store: LogStore):
+        self.store = store
+        self.batch_size = int(os.getenv("LOG_WRITER_BATCH_SIZE", "256"))
+        self.flush_ms = float(os.getenv("LOG_WRITER_FLUSH_MS", "50"))
+        self.queue_size = int(os.getenv("LOG_WRITER_QUEUE_SIZE", "10000"))
+        self.overflow = os.getenv("LOG_WRITER_OVERFLOW", "block")
+        if self.overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown LOG_WRITER_OVERFLOW: {self.overflow}")
+        self.spill_file = os.getenv("LOG_WRITER_SPILL_FILE", "dialogs_spill.jsonl")
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._spill_pending = os.path.exists(self.spill_file)
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.errors = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.total_flush_ms = 0.0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._queue = asyncio.Queue(self.queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Запись всего, что осталось в очереди и в файле переполнения"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def flush(self) -> None:
+        """Ожидание записи всего, что отправлено до вызова (вместе с файлом
+        переполнения); записи, отправленные после, остаются в очереди"""
+        if not self.running:
+            return
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put(done)
+        await done
+
+    async def submit(self, logs: List[DialogLog]) -> None:
+        for log in logs:
+            if self._queue.full():
+                if self.overflow == "drop":
+                    self.dropped += 1
+                    continue
+                if self.overflow == "spill":
+                    self._spill(log)
+                    continue
+            await self._queue.put(log)
+            self.enqueued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    def _spill(self, log: DialogLog) -> None:
+        with open(self.spill_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(log.dict(), ensure_ascii=False) + "\n")
+        self.spilled += 1
+        self._spill_pending = True
+
+    async def _run(self) -> None:
+        # Записи, оставшиеся в файле переполнения после прошлого запуска
+        await self._drain_spill()
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+
+            # Собираем пачку: все, что уже в очереди, и то, что придет до дедлайна
+            batch: List[DialogLog] = []
+            flushed: List[asyncio.Future] = []
+            deadline = loop.time() + self.flush_ms / 1000
+            while True:
+                if item is None:
+                    stopping = True
+                    break
+                if isinstance(item, asyncio.Future):
+                    # flush(): пришедшее до отметки записываем, не дожидаясь дедлайна
+                    flushed.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                if self._queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+
+            if batch:
+                await self._flush(batch)
+            if self._spill_pending and (stopping or flushed or self._queue.empty()):
+                await self._drain_spill()
+            for waiter in flushed:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def _flush(self, batch: List[DialogLog]) -> None:
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.store.append, batch)
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Ошибка записи пачки логов ({len(batch)}): {e}")
+            # Не теряем пачку: повторим запись из файла переполнения
+            for log in batch:
+                self._spill(log)
+            return
+        flush_ms = (time.perf_counter() - started) * 1000
+
+        self.batches += 1
+        self.written += len(batch)
+        self.last_batch_size = len(batch)
+        self.max_batch_size = max(self.max_batch_size, len(batch))
+        self.total_flush_ms += flush_ms
+        self.last_flush_ms = flush_ms
+        self.max_flush_ms = max(self.max_flush_ms, flush_ms)
+
+    async def _drain_spill(self) -> None:
+        """Перенос записей из файла переполнения в хранилище"""
+        draining_file = f"{self.spill_file}.draining"
+        self._spill_pending = False
+        if os.path.exists(self.spill_file):
+            if os.path.exists(draining_file):
+                # Не дочитанный при сбое файл — сначала допишем его
+                with open(draining_file, 'a', encoding='utf-8') as dst, \
+                        open(self.spill_file, 'r', encoding='utf-8') as src:
+                    dst.write(src.read())
+                os.remove(self.spill_file)
+            else:
+                os.replace(self.spill_file, draining_file)
+        if not os.path.exists(draining_file):
+            return
+
+        logs = []
+        with open(draining_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    logs.append(DialogLog(**json.loads(line)))
+                except Exception as e:
+                    print(f"⚠️ Пропущена поврежденная запись в {draining_file}: {e}")
+        for start in range(0, len(logs), self.batch_size):
+            await self._flush(logs[start:start + self.batch_size])
+        os.remove(draining_file)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "overflow": self.overflow,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "max_queue_depth": self.max_queue_depth,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "errors": self.errors,
+            "batches": self.batches,
+            "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_size,
+            "avg_flush_ms": round(self.total_flush_ms / self.batches, 3) if self.batches else 0.0,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3)
+        }
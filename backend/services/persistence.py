@@ -0,0 +1,131 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+def write_atomic(path: str, write: Callable[[Any], None]) -> None:
+    """Запись файла через временный файл рядом с ним, fsync и rename:
+    при сбое на диске остается либо старая, либо новая версия целиком"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class DebouncedWriter:
+    """Отложенная запись состояния: серия изменений — одна запись на диск.
+
+    `request()` помечает состояние измененным; запись выполняется через
+    `delay_ms` после первого изменения серии. Снимок состояния
+    (`snapshot()`) берется в event loop, а сама запись (`write(snapshot)`)
+    идет в отдельном потоке. Пока цикл не запущен (до старта приложения,
+    скрипты), запись выполняется сразу.
+    """
+
+    def __init__(self, name: str, snapshot: Callable[[], Any], write: Callable[[Any], None], delay_ms: float):
+        self.name = name
+        self.delay_ms = delay_ms
+        self._snapshot = snapshot
+        self._write = write
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._waiting = False
+        self._dirty = False
+        # Синхронная запись (без цикла) и запись из потока не должны пересекаться
+        self._write_lock = threading.Lock()
+
+        self.requests = 0
+        self.writes = 0
+        self.errors = 0
+        self.last_write_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+
+    def request(self) -> None:
+        """Состояние изменилось (можно вызывать из любого потока)"""
+        self.requests += 1
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._write_now(self._snapshot())
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._schedule()
+        else:
+            loop.call_soon_threadsafe(self._schedule)
+
+    def _schedule(self) -> None:
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        self._waiting = True
+        try:
+            await asyncio.sleep(self.delay_ms / 1000)
+        finally:
+            self._waiting = False
+        # Изменения, пришедшие во время записи, попадут в следующую
+        while self._dirty:
+            self._dirty = False
+            await asyncio.to_thread(self._write_now, self._snapshot())
+
+    def _write_now(self, snapshot: Any) -> bool:
+        started = time.perf_counter()
+        try:
+            with self._write_lock:
+                self._write(snapshot)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            print(f"❌ Ошибка сохранения {self.name}: {e}")
+            return False
+        self.writes += 1
+        self.last_write_ms = (time.perf_counter() - started) * 1000
+        return True
+
+    async def flush(self) -> None:
+        """Немедленная запись накопленных изменений (при остановке)"""
+        task = self._task
+        if task is not None and not task.done():
+            if self._waiting:
+                # Еще ждет окончания серии — пишем сами, не дожидаясь
+                task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._dirty:
+            self._dirty = False
+            await asyncio.to_thread(self._write_now, self._snapshot())
+
+    async def stop(self) -> None:
+        await self.flush()
+        self._loop = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "pending": self._dirty,
+            "delay_ms": self.delay_ms,
+            "requests": self.requests,
+            "writes": self.writes,
+            "errors": self.errors,
+            "last_write_ms": round(self.last_write_ms, 3),
+            "last_error": self.last_error
+        }
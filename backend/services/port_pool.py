@@ -0,0 +1,207 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+
+class PortPoolExhausted(Exception):
+    """В диапазоне портов агентов не осталось свободных"""
+
+    def __init__(self, start: int, end: int):
+        super().__init__(f"No free agent ports in range {start}-{end - 1}")
+
+
+class PortPool:
+    """Пул портов агентов в диапазоне [AGENT_PORT_RANGE_START, AGENT_PORT_RANGE_END).
+
+    Порт выдается из очереди свободных за O(1) и без системных вызовов:
+    reserve() берет порт в аренду на PORT_LEASE_SECONDS, commit() закрепляет
+    его за агентом, release() возвращает в конец очереди (освобожденный порт
+    выдается последним). Порты, занятые другими процессами, находит фоновая
+    сверка с ОС (bind) раз в PORT_RECONCILE_INTERVAL секунд и не выдает,
+    пока они не освободятся.
+    """
+
+    def __init__(self):
+        self.start_port = int(os.getenv("AGENT_PORT_RANGE_START", "5005"))
+        self.end_port = int(os.getenv("AGENT_PORT_RANGE_END", "6000"))
+        self.lease_s = float(os.getenv("PORT_LEASE_SECONDS", "60"))
+        self.reconcile_interval = float(os.getenv("PORT_RECONCILE_INTERVAL", "30"))
+        self.bind_host = os.getenv("PORT_POOL_BIND_HOST", "0.0.0.0")
+
+        self._free: Deque[int] = deque(range(self.start_port, self.end_port))
+        # В очереди могут остаться устаревшие записи — источник истины _free_set
+        self._free_set: Set[int] = set(self._free)
+        self._allocated: Dict[int, int] = {}  # порт -> id агента
+        self._leases: Dict[int, float] = {}  # порт -> окончание аренды (monotonic)
+        self._busy: Set[int] = set()  # заняты другими процессами по последней сверке
+        # Сверка идет в отдельном потоке
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+        self.reconciles = 0
+        self.last_reconcile: Optional[float] = None
+        self.last_reconcile_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    def clear(self) -> None:
+        """Все порты диапазона снова свободны (перед загрузкой состояния агентов)"""
+        with self._lock:
+            self._free = deque(port for port in range(self.start_port, self.end_port) if port not in self._busy)
+            self._free_set = set(self._free)
+            self._allocated = {}
+            self._leases = {}
+
+    def _in_range(self, port: int) -> bool:
+        return self.start_port <= port < self.end_port
+
+    def _push_free(self, port: int) -> None:
+        if self._in_range(port) and port not in self._free_set:
+            self._free_set.add(port)
+            self._free.append(port)
+
+    def _expire_leases(self, now: float) -> None:
+        # Срок аренды у всех одинаковый, поэтому в словаре (порядок вставки)
+        # аренды упорядочены по окончанию — просроченные всегда в начале
+        while self._leases:
+            port, expires = next(iter(self._leases.items()))
+            if expires > now:
+                break
+            del self._leases[port]
+            self._push_free(port)
+
+    def reserve(self) -> int:
+        """Аренда свободного порта до commit() или истечения срока"""
+        with self._lock:
+            now = time.monotonic()
+            self._expire_leases(now)
+            while self._free:
+                port = self._free.popleft()
+                if port in self._free_set:
+                    self._free_set.discard(port)
+                    self._leases[port] = now + self.lease_s
+                    return port
+            raise PortPoolExhausted(self.start_port, self.end_port)
+
+    def peek(self) -> int:
+        """Порт, который выдаст следующий reserve(), без аренды"""
+        with self._lock:
+            port = next((port for port in self._free if port in self._free_set), None)
+        if port is None:
+            raise PortPoolExhausted(self.start_port, self.end_port)
+        return port
+
+    def commit(self, port: int, agent_id: int) -> None:
+        """Закрепление порта за агентом"""
+        with self._lock:
+            self._leases.pop(port, None)
+            self._free_set.discard(port)
+            self._allocated[port] = agent_id
+
+    def allocate(self, port: int, agent_id: int) -> bool:
+        """Закрепление известного порта (агенты из сохраненного состояния);
+        False — порт уже занят другим агентом"""
+        with self._lock:
+            owner = self._allocated.get(port)
+            if owner is not None and owner != agent_id:
+                return False
+            self._leases.pop(port, None)
+            self._free_set.discard(port)
+            self._allocated[port] = agent_id
+            return True
+
+    def release(self, port: int) -> None:
+        with self._lock:
+            self._allocated.pop(port, None)
+            self._leases.pop(port, None)
+            if port not in self._busy:
+                self._push_free(port)
+
+    def owner(self, port: int) -> Optional[int]:
+        return self._allocated.get(port)
+
+    def _is_port_in_use(self, port: int) -> bool:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            try:
+                s.bind((self.bind_host, port))
+            except OSError:
+                return True
+        return False
+
+    def reconcile(self) -> Dict[str, int]:
+        """Сверка свободных портов с ОС: занятые другими процессами
+        убираются из выдачи, освободившиеся возвращаются"""
+        started = time.perf_counter()
+        with self._lock:
+            self._expire_leases(time.monotonic())
+            candidates = self._free_set | self._busy
+
+        in_use = {port for port in candidates if self._is_port_in_use(port)}
+
+        with self._lock:
+            became_busy = became_free = 0
+            for port in candidates:
+                if port in self._allocated or port in self._leases:
+                    continue
+                if port in in_use:
+                    if port not in self._busy:
+                        self._busy.add(port)
+                        self._free_set.discard(port)
+                        became_busy += 1
+                elif port in self._busy:
+                    self._busy.discard(port)
+                    self._push_free(port)
+                    became_free += 1
+            # Очередь не должна расти из-за устаревших записей
+            if len(self._free) > 2 * len(self._free_set) + 64:
+                self._free = deque(port for port in self._free if port in self._free_set)
+
+        self.reconciles += 1
+        self.last_reconcile = time.time()
+        self.last_reconcile_ms = (time.perf_counter() - started) * 1000
+        return {"became_busy": became_busy, "became_free": became_free}
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.to_thread(self.reconcile)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Ошибка сверки портов агентов: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.reconcile_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "range": [self.start_port, self.end_port - 1],
+            "free": len(self._free_set),
+            "allocated": len(self._allocated),
+            "leased": len(self._leases),
+            "busy_elsewhere": sorted(self._busy),
+            "reconcile_interval_s": self.reconcile_interval,
+            "reconciles": self.reconciles,
+            "last_reconcile": self.last_reconcile,
+            "last_reconcile_ms": round(self.last_reconcile_ms, 2),
+            "last_error": self.last_error
+        }
+
+
+port_pool = PortPool()
@@ -0,0 +1,176 @@
+import copy
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, Set, Tuple
+
+from backend.models import Agent, AgentType
+
+
+CacheKey = Tuple[int, str, str]
+
+
+class ResponseCache:
+    """LRU-кэш ответов FAQ агентов.
+
+    Ключ — (id агента, отпечаток обученной модели, нормализованный текст).
+    Размер ограничен и числом записей, и примерным объемом в байтах.
+    После обучения агента его записи сбрасываются через `invalidate`; его
+    вызывают и из потока фоновой задачи обучения, поэтому состояние кэша
+    меняется только под блокировкой.
+    """
+
+    def __init__(self):
+        self.max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+        self.max_bytes = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+        self._entries: "OrderedDict[CacheKey, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._agent_keys: Dict[int, Set[CacheKey]] = {}
+        self._fingerprints: Dict[int, str] = {}
+        self._stats: Dict[int, Dict[str, int]] = {}
+        # Счетчик сбросов агента: ответ, полученный до сброса, в кэш не попадает
+        self._generations: Dict[int, int] = {}
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Нормализация вопроса: регистр, пробелы и финальная пунктуация"""
+        text = " ".join(text.lower().replace("ё", "е").split())
+        return re.sub(r"[\s.!?,;:…]+$", "", text)
+
+    @staticmethod
+    def is_enabled_for(agent: Agent) -> bool:
+        return agent.response_cache_enabled and agent.agent_type == AgentType.FAQ
+
+    def model_fingerprint(self, agent: Agent) -> str:
+        """Отпечаток текущей модели агента (последний архив в model_path)"""
+        fingerprint = self._fingerprints.get(agent.id)
+        if fingerprint is None:
+            fingerprint = "no-model"
+            if agent.model_path and os.path.isdir(agent.model_path):
+                archives = [
+                    entry for entry in os.scandir(agent.model_path)
+                    if entry.is_file() and entry.name.endswith(".tar.gz")
+                ]
+                if archives:
+                    latest = max(archives, key=lambda entry: entry.stat().st_mtime)
+                    stat = latest.stat()
+                    fingerprint = f"{latest.name}:{stat.st_size}:{int(stat.st_mtime)}"
+            self._fingerprints[agent.id] = fingerprint
+        return fingerprint
+
+    def _agent_stats(self, agent_id: int) -> Dict[str, int]:
+        stats = self._stats.get(agent_id)
+        if stats is None:
+            stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+            self._stats[agent_id] = stats
+        return stats
+
+    def _key(self, agent: Agent, message: str) -> CacheKey:
+        return agent.id, self.model_fingerprint(agent), self.normalize(message)
+
+    def get(self, agent: Agent, message: str) -> Optional[Dict[str, Any]]:
+        """Ответ из кэша (копия со свежей меткой времени) или None"""
+        with self._lock:
+            key = self._key(agent, message)
+            stats = self._agent_stats(agent.id)
+            entry = self._entries.get(key)
+            if entry is None:
+                stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            stats["hits"] += 1
+            value = entry[0]
+        # Значение в кэше не меняется после put, копируем без блокировки
+        result = copy.deepcopy(value)
+        if result.get("metadata"):
+            result["metadata"]["timestamp"] = datetime.now().isoformat()
+            result["metadata"]["text"] = message
+        result["cached"] = True
+        return result
+
+    def generation(self, agent_id: int) -> int:
+        """Номер поколения записей агента; меняется при каждом сбросе"""
+        with self._lock:
+            return self._generations.get(agent_id, 0)
+
+    def put(self, agent: Agent, message: str, result: Dict[str, Any],
+            generation: Optional[int] = None) -> None:
+        """Сохранение ответа; если передан `generation` и агент с тех пор
+        был сброшен (ответ могла дать старая модель), ответ не кэшируется"""
+        if not result.get("success"):
+            return
+
+        value = {
+            "success": True,
+            "responses": list(result.get("responses", [])),
+            "metadata": copy.deepcopy(result.get("metadata"))
+        }
+        with self._lock:
+            if generation is not None and generation != self._generations.get(agent.id, 0):
+                return
+            key = self._key(agent, message)
+            size = self._estimate_size(key, value)
+            if size > self.max_bytes:
+                return
+
+            self._remove(key)
+            self._entries[key] = (value, size)
+            self._agent_keys.setdefault(agent.id, set()).add(key)
+            self.total_bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._agent_stats(oldest[0])["evictions"] += 1
+
+    @staticmethod
+    def _estimate_size(key: CacheKey, value: Dict[str, Any]) -> int:
+        # Грубая оценка: тексты в UTF-8 плюс накладные расходы на объекты
+        size = 256 + len(key[1]) + len(key[2].encode("utf-8"))
+        size += sum(len(text.encode("utf-8")) + 64 for text in value["responses"])
+        metadata = value.get("metadata") or {}
+        size += 128 * (1 + len(metadata.get("entities", [])))
+        return size
+
+    def _remove(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.total_bytes -= entry[1]
+        keys = self._agent_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+
+    def invalidate(self, agent_id: int) -> None:
+        """Сброс записей агента и отпечатка модели (например, после обучения;
+        можно вызывать из любого потока)"""
+        with self._lock:
+            self._invalidate(agent_id)
+
+    def _invalidate(self, agent_id: int) -> None:
+        for key in list(self._agent_keys.pop(agent_id, set())):
+            self._remove(key)
+        self._fingerprints.pop(agent_id, None)
+        self._generations[agent_id] = self._generations.get(agent_id, 0) + 1
+        self._agent_stats(agent_id)["invalidations"] += 1
+
+    def forget(self, agent_id: int) -> None:
+        with self._lock:
+            self._invalidate(agent_id)
+            self._stats.pop(agent_id, None)
+
+    def agent_stats(self, agent_id: int) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._agent_stats(agent_id))
+            stats["entries"] = len(self._agent_keys.get(agent_id, ()))
+            stats["model_fingerprint"] = self._fingerprints.get(agent_id)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,270 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from backend.models import DialogLog, LogQuery
+from backend.services.log_aggregates import ERROR_RESPONSE_PREFIXES
+from backend.services.log_records import LogInterner, LogRecord
+from backend.services.log_store import LogStore, load_json_state
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dialog_logs (
+    id INTEGER PRIMARY KEY,
+    agent_id INTEGER NOT NULL,
+    sender TEXT NOT NULL,
+    user_message TEXT NOT NULL,
+    bot_response TEXT NOT NULL,
+    intent TEXT,
+    intent_confidence REAL,
+    entities TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    processing_time_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_dialog_logs_agent_timestamp ON dialog_logs (agent_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_dialog_logs_agent_intent ON dialog_logs (agent_id, intent);
+-- Для глобального лимита горячих записей (вытеснение самых старых среди всех агентов)
+CREATE INDEX IF NOT EXISTS idx_dialog_logs_timestamp ON dialog_logs (timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+COLUMNS = ("id, agent_id, sender, user_message, bot_response, intent, intent_confidence, "
+           "entities, timestamp, processing_time_ms")
+
+
+class SQLiteLogStore(LogStore):
+    """Логи диалогов во встроенной SQLite базе (WAL).
+
+    Индексы: (agent_id, timestamp), (agent_id, intent); id — первичный ключ
+    (rowid). В памяти логи не держатся, фильтры и подсчеты выполняет SQLite.
+    При первом запуске логи импортируются из dialogs_state.json и журнала.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_file: str, migrate_from: Optional[Tuple[str, str]] = None):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL в режиме WAL не теряет целостность при сбое, только последние транзакции
+        self._conn.execute(f"PRAGMA synchronous={os.getenv('DIALOG_SQLITE_SYNCHRONOUS', 'NORMAL')}")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+
+        if migrate_from and self._meta("migrated_at") is None:
+            self._migrate(*migrate_from)
+
+        row = self._conn.execute("SELECT MAX(id), COUNT(*) FROM dialog_logs").fetchone()
+        self._next_id = max((row[0] or 0) + 1, int(self._meta("next_id") or 1))
+        print(f"📊 Логи диалогов в {db_file}: {row[1]}")
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _migrate(self, logs_file: str, journal_file: str) -> None:
+        """Однократный импорт логов из dialogs_state.json и журнала"""
+        state = load_json_state(logs_file, journal_file)
+        with self._lock, self._conn:
+            self._insert(state["logs"])
+            self._set_meta("next_id", str(state["next_id"]))
+            self._set_meta("migrated_at", datetime.now().isoformat())
+        if state["logs"]:
+            print(f"📦 Импортировано {len(state['logs'])} логов из {logs_file} в {self.db_file}")
+
+    @staticmethod
+    def _row(log) -> tuple:
+        return (
+            log.id, log.agent_id, log.sender, log.user_message,
+            json.dumps(log.bot_response, ensure_ascii=False),
+            log.intent, log.intent_confidence,
+            json.dumps(log.entities, ensure_ascii=False),
+            log.timestamp, log.processing_time_ms
+        )
+
+    @staticmethod
+    def _log(row: tuple) -> DialogLog:
+        return DialogLog(
+            id=row[0], agent_id=row[1], sender=row[2], user_message=row[3],
+            bot_response=json.loads(row[4]), intent=row[5], intent_confidence=row[6],
+            entities=json.loads(row[7]), timestamp=row[8], processing_time_ms=row[9]
+        )
+
+    @staticmethod
+    def _record(row: tuple, interner: LogInterner) -> LogRecord:
+        return interner.record(dict(
+            id=row[0], agent_id=row[1], sender=row[2], user_message=row[3],
+            bot_response=json.loads(row[4]), intent=row[5], intent_confidence=row[6],
+            entities=json.loads(row[7]), timestamp=row[8], processing_time_ms=row[9]
+        ))
+
+    def _insert(self, logs: list) -> None:
+        self._conn.executemany(
+            f"INSERT OR REPLACE INTO dialog_logs ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [self._row(log) for log in logs]
+        )
+
+    def _fetch(self, sql: str, params: tuple) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def next_id(self) -> int:
+        return self._next_id
+
+    def append(self, logs: List[DialogLog]) -> None:
+        """Запись пачки одной транзакцией; sqlite3.Error пробрасывается
+        (LogWriter учтет ошибку и повторит пачку из файла переполнения)"""
+        next_id = max(self._next_id, max(log.id for log in logs) + 1)
+        with self._lock, self._conn:
+            self._insert(logs)
+            # Вместе с записями: после удаления всех строк MAX(id) не вернет счетчик
+            self._set_meta("next_id", str(next_id))
+        self._next_id = next_id
+
+    def query(self, agent_id: Optional[int] = None, intent: Optional[str] = None,
+              limit: Optional[int] = None) -> List[DialogLog]:
+        conditions, params = [], []
+        if agent_id is not None:
+            conditions.append("agent_id = ?")
+            params.append(agent_id)
+        if intent:
+            conditions.append("intent = ?")
+            params.append(intent)
+        sql = f"SELECT {COLUMNS} FROM dialog_logs"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [self._log(row) for row in self._fetch(sql, tuple(params))]
+
+    def page(self, query: LogQuery) -> List[DialogLog]:
+        # Индекс (agent_id, timestamp) хранит и rowid, поэтому сортировка
+        # по (timestamp, id) и keyset-условие идут по нему без доп. сортировки
+        conditions, params = ["agent_id = ?"], [query.agent_id]
+        if query.after is not None:
+            conditions.append(f"(timestamp, id) {'<' if query.descending else '>'} (?, ?)")
+            params.extend(query.after)
+        if query.intent:
+            conditions.append("intent = ?")
+            params.append(query.intent)
+        if query.sender:
+            conditions.append("sender = ?")
+            params.append(query.sender)
+        if query.since:
+            conditions.append("timestamp >= ?")
+            params.append(query.since)
+        if query.until:
+            conditions.append("timestamp < ?")
+            params.append(query.until)
+        if query.min_confidence is not None:
+            conditions.append("intent_confidence >= ?")
+            params.append(query.min_confidence)
+        if query.max_confidence is not None:
+            conditions.append("intent_confidence <= ?")
+            params.append(query.max_confidence)
+        if query.errors_only:
+            # bot_response хранится JSON-списком: '["Error: ...", ...]'
+            conditions.append("(" + " OR ".join("bot_response LIKE ?" for _ in ERROR_RESPONSE_PREFIXES) + ")")
+            params.extend(f'["{prefix}%' for prefix in ERROR_RESPONSE_PREFIXES)
+
+        direction = "DESC" if query.descending else "ASC"
+        sql = (f"SELECT {COLUMNS} FROM dialog_logs WHERE {' AND '.join(conditions)} "
+               f"ORDER BY timestamp {direction}, id {direction} LIMIT ?")
+        params.append(query.limit)
+        return [self._log(row) for row in self._fetch(sql, tuple(params))]
+
+    def get(self, agent_id: int, log_id: int) -> Optional[DialogLog]:
+        rows = self._fetch(f"SELECT {COLUMNS} FROM dialog_logs WHERE id = ? AND agent_id = ?", (log_id, agent_id))
+        return self._log(rows[0]) if rows else None
+
+    def get_many(self, agent_id: int, ids: List[int]) -> Dict[int, DialogLog]:
+        logs: Dict[int, DialogLog] = {}
+        # Не больше 500 параметров на запрос (лимит SQLite на старых сборках — 999)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self._fetch(
+                f"SELECT {COLUMNS} FROM dialog_logs WHERE agent_id = ? AND id IN ({', '.join('?' * len(chunk))})",
+                (agent_id, *chunk)
+            )
+            logs.update((row[0], self._log(row)) for row in rows)
+        return logs
+
+    def scan(self, batch_size: int = 10000, agent_id: Optional[int] = None) -> Iterator[List[LogRecord]]:
+        # Постранично (по первичному ключу или по индексу агента), чтобы не
+        # держать курсор между пачками
+        interner = LogInterner()
+        if agent_id is None:
+            sql = f"SELECT {COLUMNS} FROM dialog_logs WHERE id > ? ORDER BY id LIMIT ?"
+            position: tuple = (0,)
+        else:
+            sql = (f"SELECT {COLUMNS} FROM dialog_logs WHERE agent_id = ? AND (timestamp, id) > (?, ?) "
+                   f"ORDER BY timestamp, id LIMIT ?")
+            position = (agent_id, "", 0)
+        while True:
+            rows = self._fetch(sql, position + (batch_size,))
+            if not rows:
+                return
+            yield [self._record(row, interner) for row in rows]
+            last = rows[-1]
+            position = (last[0],) if agent_id is None else (agent_id, last[8], last[0])
+
+    def count(self, agent_id: int) -> int:
+        return self._fetch("SELECT COUNT(*) FROM dialog_logs WHERE agent_id = ?", (agent_id,))[0][0]
+
+    def agent_counts(self) -> Dict[int, int]:
+        return dict(self._fetch("SELECT agent_id, COUNT(*) FROM dialog_logs GROUP BY agent_id", ()))
+
+    def oldest(self, agent_id: Optional[int], limit: int, before: Optional[str] = None) -> List[DialogLog]:
+        conditions, params = [], []
+        if agent_id is not None:
+            conditions.append("agent_id = ?")
+            params.append(agent_id)
+        if before:
+            conditions.append("timestamp < ?")
+            params.append(before)
+        sql = f"SELECT {COLUMNS} FROM dialog_logs"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY timestamp, id LIMIT ?"
+        params.append(limit)
+        return [self._log(row) for row in self._fetch(sql, tuple(params))]
+
+    def delete(self, ids: List[int]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM dialog_logs WHERE id = ?", [(log_id,) for log_id in ids])
+            # Номера удаленных (архивированных) логов не переиспользуем
+            self._set_meta("next_id", str(self._next_id))
+
+    def last_activity(self, agent_id: int) -> Optional[str]:
+        return self._fetch("SELECT MAX(timestamp) FROM dialog_logs WHERE agent_id = ?", (agent_id,))[0][0]
+
+    def intents(self, agent_id: int) -> List[str]:
+        rows = self._fetch(
+            "SELECT DISTINCT intent FROM dialog_logs WHERE agent_id = ? AND intent IS NOT NULL ORDER BY intent",
+            (agent_id,)
+        )
+        return [row[0] for row in rows]
+
+    def clear(self, agent_id: Optional[int] = None) -> None:
+        with self._lock, self._conn:
+            if agent_id:
+                self._conn.execute("DELETE FROM dialog_logs WHERE agent_id = ?", (agent_id,))
+            else:
+                self._conn.execute("DELETE FROM dialog_logs")
+            # Номера удаленных логов не переиспользуем
+            self._set_meta("next_id", str(self._next_id))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
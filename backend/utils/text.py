@@ -0,0 +1,8 @@
+import re
+
+
+def normalize_text(text: str) -> str:
+    """Нижний регистр, ё → е, знаки препинания — пробелы, пробелы схлопнуты"""
+    text = text.lower().replace("ё", "е")
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
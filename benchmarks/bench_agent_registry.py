@@ -0,0 +1,81 @@
+"""Микро-бенчмарк реестра агентов (AgentService).
+
+Загружает во временном каталоге agents_state.json с N агентами (по умолчанию
+10k) и измеряет время get_agent, get_agent_by_port и find_free_port, а для
+сравнения — линейный поиск по списку агентов (как было до индексов).
+Результат печатается в JSON.
+
+    python -m benchmarks.bench_agent_registry --agents 10000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+SAMPLES = 20000
+
+
+def per_call_us(func, args_list) -> float:
+    started = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return round((time.perf_counter() - started) / len(args_list) * 1e6, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, default=10000)
+    args = parser.parse_args()
+
+    now = datetime.now().isoformat()
+    agents = [{
+        "id": agent_id,
+        "name": f"agent_{agent_id}",
+        "description": "",
+        "agent_type": "faq",
+        "status": "ready",
+        # Вне диапазона 5005-6000, чтобы find_free_port мерил работу с реестром
+        "port": 10000 + agent_id,
+        "config_path": f"lab_complex/agents/agent_{agent_id}/config.yml",
+        "created_at": now,
+        "updated_at": now
+    } for agent_id in range(1, args.agents + 1)]
+
+    with tempfile.TemporaryDirectory(prefix="bench_agent_registry_") as directory:
+        os.chdir(directory)
+        with open("agents_state.json", "w", encoding="utf-8") as f:
+            json.dump({"next_id": args.agents + 1, "agents": agents}, f)
+
+        started = time.perf_counter()
+        from backend.services.agent_service import agent_service
+        load_ms = (time.perf_counter() - started) * 1000
+
+        rng = random.Random(1)
+        ids = [(rng.randrange(1, args.agents + 1),) for _ in range(SAMPLES)]
+        ports = [(10000 + agent_id,) for (agent_id,) in ids]
+        registered = agent_service.get_all_agents()
+
+        def linear_get_agent(agent_id):
+            for agent in registered:
+                if agent.id == agent_id:
+                    return agent
+            return None
+
+        result = {
+            "agents": len(registered),
+            "load_ms": round(load_ms, 1),
+            "get_agent_us": per_call_us(agent_service.get_agent, ids),
+            "get_agent_by_port_us": per_call_us(agent_service.get_agent_by_port, ports),
+            "find_free_port_us": per_call_us(agent_service.find_free_port, [()] * 200),
+            "linear_get_agent_us": per_call_us(linear_get_agent, ids[:2000]),
+            # Прежний find_free_port собирал множество занятых портов на каждый вызов
+            "rebuild_used_ports_us": per_call_us(lambda: {agent.port for agent in registered}, [()] * 200),
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Бенчмарк резервного классификатора интентов.
+
+Строит классификатор на синтетических NLU данных (по умолчанию 10k примеров),
+измеряет время полной сборки, инкрементального обновления одного интента
+и задержку одного запроса. Результат печатается в JSON.
+
+    python -m benchmarks.bench_fallback_classifier --examples 10000 --intents 200
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from backend.fallback_classifier import IntentClassifier
+from backend.nlu_models import NLUData, Intent, IntentExample
+
+WORDS = (
+    "доставка оплата заказ курьер карта адрес телефон возврат товар скидка цена "
+    "склад магазин время неделя день номер счет бонус акция размер цвет отзыв "
+    "гарантия обмен сервис мастер запись прием врач билет рейс отель номер"
+).split()
+
+
+def synthetic_nlu(n_examples: int, n_intents: int, seed: int = 42) -> NLUData:
+    rng = random.Random(seed)
+    per_intent = max(n_examples // n_intents, 2)
+    intents = []
+    for i in range(n_intents):
+        topic = rng.sample(WORDS, 3)
+        examples = [
+            IntentExample(text=" ".join(rng.sample(topic, 2) + rng.sample(WORDS, 3)) + f" {i}")
+            for _ in range(per_intent)
+        ]
+        intents.append(Intent(name=f"intent_{i}", examples=examples))
+    return NLUData(intents=intents)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--examples", type=int, default=10000)
+    parser.add_argument("--intents", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    nlu_data = synthetic_nlu(args.examples, args.intents)
+    classifier = IntentClassifier()
+
+    started = time.perf_counter()
+    classifier.update(nlu_data)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    # Меняем один интент — перестраиваются только его n-граммы
+    changed = nlu_data.model_copy(deep=True)
+    changed.intents[0].examples.append(IntentExample(text="новый пример про доставку"))
+    started = time.perf_counter()
+    rebuilt = classifier.update(changed)
+    update_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(7)
+    queries = [rng.choice(rng.choice(changed.intents).examples).text for _ in range(args.queries)]
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        classifier.rank(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    print(json.dumps({
+        "examples": classifier.n_examples,
+        "intents": len(classifier.intents),
+        "vocabulary": len(classifier.vocabulary),
+        "build_ms": round(build_ms, 2),
+        "incremental_update_ms": round(update_ms, 2),
+        "intents_rebuilt": rebuilt,
+        "query_ms": {
+            "mean": round(statistics.mean(latencies), 4),
+            "p50": round(percentile(latencies, 0.5), 4),
+            "p99": round(percentile(latencies, 0.99), 4)
+        }
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Бенчмарк памяти и времени запуска для истории логов диалогов.
+
+Генерирует во временном каталоге синтетическую историю (по умолчанию 1M
+записей) в журнале и в SQLite базе и в отдельных процессах замеряет время
+загрузки и прирост RSS (Linux, /proc):
+
+    pydantic        — журнал читается в список DialogLog (прежний способ)
+    journal         — JournalLogStore с компактными записями (LogRecord)
+    sqlite_eager    — DialogLogger на SQLite + агрегаты всех агентов при запуске
+    sqlite_lazy     — DialogLogger на SQLite, агрегаты агента при первом обращении
+
+    python -m benchmarks.bench_log_memory --records 1000000 --agents 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("pydantic", "journal", "sqlite_eager", "sqlite_lazy")
+
+WORDS = (
+    "доставка оплата заказ курьер карта адрес телефон возврат товар скидка цена "
+    "склад магазин время неделя день номер счет бонус акция размер цвет отзыв"
+).split()
+
+
+def generate(directory: str, n_records: int, n_agents: int, seed: int = 42) -> None:
+    """Журнал dialogs_journal.jsonl и база dialogs.db с одинаковыми записями"""
+    from backend.services.log_records import LogInterner
+    from backend.services.sqlite_log_store import SQLiteLogStore
+
+    rng = random.Random(seed)
+    intents = [f"intent_{i}" for i in range(30)]
+    responses = [[f"Ответ {i}: " + " ".join(rng.sample(WORDS, 6))] for i in range(200)]
+    started = datetime.now() - timedelta(days=30)
+    interner = LogInterner()
+    store = SQLiteLogStore(os.path.join(directory, "dialogs.db"))
+
+    with open(os.path.join(directory, "dialogs_journal.jsonl"), "w", encoding="utf-8") as journal:
+        journal.write(json.dumps({"generation": 0}) + "\n")
+        batch = []
+        for log_id in range(1, n_records + 1):
+            data = {
+                "id": log_id,
+                "agent_id": rng.randrange(1, n_agents + 1),
+                "sender": f"user_{rng.randrange(1000)}",
+                "user_message": " ".join(rng.sample(WORDS, 4)) + f" {log_id}",
+                "bot_response": rng.choice(responses),
+                "intent": rng.choice(intents),
+                "intent_confidence": round(rng.random(), 3),
+                "entities": [],
+                "timestamp": (started + timedelta(seconds=log_id * 2)).isoformat(),
+                "processing_time_ms": round(rng.uniform(5, 300), 2)
+            }
+            journal.write(json.dumps(data, ensure_ascii=False) + "\n")
+            batch.append(interner.record(data))
+            if len(batch) == 50000:
+                store.append(batch)
+                batch = []
+        if batch:
+            store.append(batch)
+    store.close()
+
+
+def memory_mb(field: str) -> float:
+    """VmRSS (текущий) или VmHWM (пиковый) RSS процесса из /proc"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def measure(mode: str, directory: str) -> dict:
+    """Замер одного режима (выполняется в отдельном процессе)"""
+    os.chdir(directory)
+    # SQLite режимам журнал не нужен (иначе база импортирует его при запуске)
+    os.environ["DIALOG_JOURNAL_FILE"] = "dialogs_journal.jsonl" if mode == "journal" else "missing.jsonl"
+    os.environ["DIALOG_JOURNAL_COMPACT_MIN"] = str(10 ** 12)
+    os.environ["DIALOG_LOG_STORE"] = "journal" if mode == "journal" else "sqlite"
+    import itertools
+    from backend.models import DialogLog
+
+    baseline_mb = memory_mb("VmRSS")
+    started = time.perf_counter()
+    result = {"mode": mode}
+    if mode == "pydantic":
+        with open("dialogs_journal.jsonl", encoding="utf-8") as f:
+            f.readline()
+            logs = [DialogLog(**json.loads(line)) for line in f]
+        result["records"] = len(logs)
+    elif mode == "journal":
+        from backend.services.log_store import create_log_store
+        store = create_log_store()
+        result["records"] = len(store.logs)
+        result["interned"] = store.interner.stats()
+    else:
+        from backend.services.log_store import create_log_store
+        from backend.dialog_logger import DialogLogger
+        logger = DialogLogger(create_log_store())
+        if mode == "sqlite_eager":
+            logger.aggregates.rebuild(itertools.chain(logger.store.scan(), logger.archive.scan()))
+        result["startup_ms_before_first_access"] = round((time.perf_counter() - started) * 1000, 1)
+        first = time.perf_counter()
+        result["records"] = asyncio.run(logger.get_agent_statistics(1))["total_dialogs"]
+        result["first_agent_access_ms"] = round((time.perf_counter() - first) * 1000, 1)
+    result["load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    result["rss_mb"] = round(memory_mb("VmRSS") - baseline_mb, 1)
+    result["peak_rss_mb"] = round(memory_mb("VmHWM") - baseline_mb, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1000000)
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.dir)))
+        return
+
+    with tempfile.TemporaryDirectory(prefix="bench_log_memory_") as directory:
+        started = time.perf_counter()
+        generate(directory, args.records, args.agents)
+        print(f"history: {args.records} records in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        results = []
+        for mode in args.modes.split(","):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_log_memory", "--measure", mode, "--dir", directory],
+                cwd=REPO_ROOT, env={**os.environ, "PYTHONPATH": REPO_ROOT},
+                capture_output=True, text=True, check=True
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+            print(json.dumps(results[-1], ensure_ascii=False), file=sys.stderr)
+
+    print(json.dumps({"records": args.records, "agents": args.agents, "results": results},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
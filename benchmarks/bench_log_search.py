@@ -0,0 +1,87 @@
+"""Бенчмарк полнотекстового поиска по логам диалогов.
+
+Строит индекс одного агента на синтетических логах (по умолчанию 1M записей,
+слова с частотами по закону Ципфа) и измеряет время построения, прирост
+памяти и задержку запросов из одного, двух и трех слов. Результат
+печатается в JSON.
+
+    python -m benchmarks.bench_log_search --records 1000000
+"""
+import argparse
+import itertools
+import json
+import random
+import time
+
+from backend.services.log_search import AgentSearchIndex, tokenize
+
+STEMS = (
+    "доставк оплат заказ курьер карт адрес телефон возврат товар скидк цен склад магазин "
+    "врем недел номер счет бонус акци размер цвет отзыв гаранти обмен сервис мастер запис"
+).split()
+ENDINGS = ("а", "у", "ой", "ы", "ами", "ах", "")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def memory_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1000000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    words = [rng.choice(STEMS) + rng.choice(ENDINGS) + (str(i) if i >= len(STEMS) else "")
+             for i in range(args.vocabulary)]
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    responses = [" ".join(rng.choices(words, cum_weights=weights, k=8)) for _ in range(300)]
+    texts = [" ".join(rng.choices(words, cum_weights=weights, k=6)) + " " + rng.choice(responses)
+             for _ in range(args.records)]
+
+    baseline_mb = memory_mb()
+    index = AgentSearchIndex()
+    started = time.perf_counter()
+    for log_id, text in enumerate(texts, start=1):
+        index.add(log_id, text)
+    build_s = time.perf_counter() - started
+    index_mb = memory_mb() - baseline_mb
+
+    results = {}
+    for n_words in (1, 2, 3):
+        latencies, totals = [], []
+        for _ in range(args.queries):
+            terms = tokenize(" ".join(rng.choices(words, cum_weights=weights, k=n_words)))
+            started = time.perf_counter()
+            total, _ = index.search(terms, 0, 20)
+            latencies.append((time.perf_counter() - started) * 1000)
+            totals.append(total)
+        results[f"{n_words}_words"] = {
+            "p50_ms": round(percentile(latencies, 0.5), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "max_ms": round(max(latencies), 3),
+            "median_hits": percentile(totals, 0.5)
+        }
+
+    print(json.dumps({
+        "records": args.records,
+        "terms": len(index.postings),
+        "build_s": round(build_s, 1),
+        "index_mb": round(index_mb, 1),
+        "queries": results
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Микро-бенчмарк выдачи портов агентам.
+
+Занимает сокетами первые --busy портов диапазона (как чужие процессы), затем
+выдает порты --agents агентам подряд: через PortPool (reserve + commit) и
+прежним способом — перебором диапазона с bind на каждый порт. Результат
+печатается в JSON.
+
+    python -m benchmarks.bench_port_pool --busy 300 --agents 300
+"""
+import argparse
+import json
+import socket
+import time
+
+from backend.services.port_pool import PortPool
+
+
+def legacy_find_free_port(used, start: int, end: int) -> int:
+    for port in range(start, end):
+        if port in used:
+            continue
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            try:
+                s.bind(("0.0.0.0", port))
+            except OSError:
+                continue
+        return port
+    raise RuntimeError("no free ports")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--busy", type=int, default=300)
+    parser.add_argument("--agents", type=int, default=300)
+    args = parser.parse_args()
+
+    pool = PortPool()
+    held = []
+    for port in range(pool.start_port, pool.start_port + args.busy):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            s.bind(("0.0.0.0", port))
+            s.listen()
+            held.append(s)
+        except OSError:
+            s.close()
+
+    try:
+        started = time.perf_counter()
+        pool.reconcile()
+        reconcile_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for agent_id in range(1, args.agents + 1):
+            pool.commit(pool.reserve(), agent_id)
+        pool_us = (time.perf_counter() - started) / args.agents * 1e6
+
+        used = set()
+        started = time.perf_counter()
+        for _ in range(args.agents):
+            used.add(legacy_find_free_port(used, pool.start_port, pool.end_port))
+        legacy_us = (time.perf_counter() - started) / args.agents * 1e6
+    finally:
+        for s in held:
+            s.close()
+
+    print(json.dumps({
+        "busy_ports": len(held),
+        "agents": args.agents,
+        "reconcile_ms": round(reconcile_ms, 1),
+        "pool_per_agent_us": round(pool_us, 2),
+        "legacy_per_agent_us": round(legacy_us, 2)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""Нагрузочный тест пути сообщений `/api/agents/{id}/message`.
+
+Для каждого сценария поднимает во временном каталоге бэкенд (uvicorn) и
+мок-агентов из `deploy/mock_agent/simple_mock.py`, гоняет запросы с заданным
+параллелизмом (и, при необходимости, темпом) и печатает JSON с пропускной
+способностью, перцентилями задержки и долей ошибок. Сравнивая результаты до и
+после изменения, можно поймать регрессию горячего пути.
+
+    python -m benchmarks.load_test --scenario all --requests 2000 --concurrency 32
+    python -m benchmarks.load_test --scenario slow --rate 100 --output before.json
+
+Сценарии:
+    single      — один агент
+    many        — несколько агентов (--agents), запросы по кругу
+    slow        — агент отвечает с задержкой (--slow-delay-ms)
+    failing     — часть ответов агента — HTTP 500 (--failure-rate)
+    large_logs  — один агент и заранее заполненный журнал (--log-records)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_SCRIPT = os.path.join(REPO_ROOT, "deploy", "mock_agent", "simple_mock.py")
+
+SCENARIOS = ("single", "many", "slow", "failing", "large_logs")
+
+MESSAGES = [
+    "Привет!",
+    "Сколько стоит доставка?",
+    "Как оплатить заказ картой?",
+    "Дайте ваши контакты",
+    "Хочу оформить заказ",
+    "Какая сегодня погода?"
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def write_agents_state(workdir: str, ports: List[int]) -> None:
+    now = datetime.now().isoformat()
+    agents = []
+    for index, port in enumerate(ports, start=1):
+        agent_dir = os.path.join("agents", f"bench_agent_{index}")
+        agents.append({
+            "id": index,
+            "name": f"bench_agent_{index}",
+            "description": "Load test agent",
+            "agent_type": "faq",
+            "status": "ready",
+            "port": port,
+            "config_path": os.path.join(agent_dir, "config.yml"),
+            "domain_path": os.path.join(agent_dir, "domain.yml"),
+            "nlu_data_path": os.path.join(agent_dir, "data", "nlu.yml"),
+            "stories_path": os.path.join(agent_dir, "data", "stories.yml"),
+            "model_path": os.path.join(agent_dir, "models"),
+            "created_at": now,
+            "updated_at": now,
+            "requires_training": False
+        })
+    with open(os.path.join(workdir, "agents_state.json"), "w", encoding="utf-8") as f:
+        json.dump({"next_id": len(agents) + 1, "agents": agents}, f, ensure_ascii=False)
+
+
+def write_dialog_logs(workdir: str, n_records: int, n_agents: int) -> None:
+    rng = random.Random(42)
+    started = datetime.now() - timedelta(days=30)
+    logs = []
+    for i in range(n_records):
+        logs.append({
+            "id": i + 1,
+            "agent_id": rng.randint(1, n_agents),
+            "sender": f"user-{rng.randint(1, 500)}",
+            "user_message": rng.choice(MESSAGES),
+            "bot_response": ["Спасибо за ваше сообщение."],
+            "intent": rng.choice(["greet", "faq_delivery", "faq_payment", "unknown"]),
+            "intent_confidence": round(rng.random(), 3),
+            "entities": [],
+            "timestamp": (started + timedelta(seconds=i * 10)).isoformat(),
+            "processing_time_ms": round(rng.uniform(5, 50), 2)
+        })
+    with open(os.path.join(workdir, "dialogs_state.json"), "w", encoding="utf-8") as f:
+        json.dump({"logs": logs, "next_id": n_records + 1}, f, ensure_ascii=False)
+
+
+def wait_http(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up in {timeout:.0f}s")
+
+
+class Environment:
+    """Бэкенд и мок-агенты одного сценария во временном каталоге"""
+
+    def __init__(self, n_agents: int, delay_ms: float = 0.0, failure_rate: float = 0.0,
+                 log_records: int = 0):
+        self.n_agents = n_agents
+        self.delay_ms = delay_ms
+        self.failure_rate = failure_rate
+        self.log_records = log_records
+        self.workdir = ""
+        self.backend_url = ""
+        self.processes: List[subprocess.Popen] = []
+
+    def __enter__(self) -> "Environment":
+        self.workdir = tempfile.mkdtemp(prefix="lab_load_test_")
+        try:
+            self._start()
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def _start(self) -> None:
+        ports = [free_port() for _ in range(self.n_agents)]
+        write_agents_state(self.workdir, ports)
+        write_dialog_logs(self.workdir, self.log_records, self.n_agents)
+
+        mock_env = dict(
+            os.environ,
+            MOCK_DELAY_MS=str(self.delay_ms),
+            MOCK_FAILURE_RATE=str(self.failure_rate),
+            MOCK_QUIET="true",
+            MOCK_DEBUG="false"
+        )
+        for port in ports:
+            self._spawn([sys.executable, MOCK_SCRIPT, str(port)], mock_env)
+
+        backend_port = free_port()
+        backend_env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+        self._spawn([
+            sys.executable, "-m", "uvicorn", "backend.main:app",
+            "--host", "127.0.0.1", "--port", str(backend_port), "--log-level", "warning"
+        ], backend_env)
+        self.backend_url = f"http://127.0.0.1:{backend_port}"
+
+        for port in ports:
+            wait_http(f"http://127.0.0.1:{port}/", timeout=15)
+        wait_http(f"{self.backend_url}/", timeout=60)
+
+    def _spawn(self, command: List[str], env: Dict[str, str]) -> None:
+        self.processes.append(subprocess.Popen(
+            command, cwd=self.workdir, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+
+    def __exit__(self, *exc_info) -> None:
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+async def drive(base_url: str, agent_ids: List[int], n_requests: int,
+                concurrency: int, rate: float) -> Dict[str, Any]:
+    """Отправка n_requests сообщений; при rate > 0 — с постоянным темпом (open loop)"""
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    fallbacks = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def one(i: int, scheduled: float) -> None:
+            nonlocal fallbacks
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with semaphore:
+                # При заданном темпе задержку считаем от запланированного момента,
+                # чтобы очередь перед семафором тоже попадала в измерение
+                started = scheduled if rate > 0 else time.perf_counter()
+                agent_id = agent_ids[i % len(agent_ids)]
+                try:
+                    response = await client.post(
+                        f"/api/agents/{agent_id}/message",
+                        json={"message": MESSAGES[i % len(MESSAGES)], "sender": f"load-{i % 100}"}
+                    )
+                    kind = None
+                    if response.status_code != 200:
+                        kind = f"http_{response.status_code}"
+                    else:
+                        body = response.json()
+                        if not body.get("success"):
+                            kind = "unsuccessful"
+                        elif body.get("fallback"):
+                            fallbacks += 1
+                except httpx.HTTPError as e:
+                    kind = type(e).__name__
+                latencies.append((time.perf_counter() - started) * 1000)
+                if kind:
+                    errors[kind] = errors.get(kind, 0) + 1
+
+        started = time.perf_counter()
+        interval = 1.0 / rate if rate > 0 else 0.0
+        await asyncio.gather(*(one(i, started + i * interval) for i in range(n_requests)))
+        duration = time.perf_counter() - started
+
+    failed = sum(errors.values())
+    return {
+        "requests": n_requests,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(n_requests / duration, 2) if duration else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 2),
+            "p50": round(percentile(latencies, 0.5), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "max": round(max(latencies), 2)
+        },
+        "errors": errors,
+        "error_rate": round(failed / n_requests, 4),
+        "fallback_responses": fallbacks
+    }
+
+
+def run_scenario(name: str, args) -> Dict[str, Any]:
+    settings: Dict[str, Any] = {"n_agents": 1}
+    if name == "many":
+        settings["n_agents"] = args.agents
+    elif name == "slow":
+        settings["delay_ms"] = args.slow_delay_ms
+    elif name == "failing":
+        settings["failure_rate"] = args.failure_rate
+    elif name == "large_logs":
+        settings["log_records"] = args.log_records
+
+    with Environment(**settings) as env:
+        agent_ids = list(range(1, settings["n_agents"] + 1))
+        # Прогрев: пулы соединений, первая проверка доступности агентов
+        asyncio.run(drive(env.backend_url, agent_ids, max(len(agent_ids), args.warmup), args.concurrency, 0))
+        result = asyncio.run(drive(env.backend_url, agent_ids, args.requests, args.concurrency, args.rate))
+
+    settings.pop("n_agents")
+    return {
+        "agents": len(agent_ids),
+        "concurrency": args.concurrency,
+        "rate_rps": args.rate or None,
+        **settings,
+        **result
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=0.0, help="запросов в секунду (0 — без ограничения)")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--agents", type=int, default=10)
+    parser.add_argument("--slow-delay-ms", type=float, default=200.0)
+    parser.add_argument("--failure-rate", type=float, default=0.3)
+    parser.add_argument("--log-records", type=int, default=20000)
+    parser.add_argument("--output", help="файл для JSON отчета (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    report = {
+        "started_at": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "scenarios": {}
+    }
+    for name in scenarios:
+        print(f"🚀 Сценарий {name}...", file=sys.stderr)
+        report["scenarios"][name] = run_scenario(name, args)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,37 +6,8 @@ def after_request(response):
     response.headers['Content-Type'] = 'application/json; charset=utf-8'
     return response
 
-@app.route("/webhooks/rest/webhook", methods=["POST", "GET"])
-def webhook():
-    # Простой способ получения данных
-    print("=== REQUEST DEBUG ===")
-    print("Method:", request.method)
-    print("Content-Type:", request.content_type)
-    print("Raw data:", request.data.decode('utf-8'))
-    
-    # Попробуем разные способы получения JSON
-    j = {}
-    try:
-        if request.is_json:
-            j = request.get_json(force=True) or {}
-        else:
-            # Если не JSON, попробуем распарсить вручную
-            import json
-            raw_data = request.data.decode('utf-8')
-            if raw_data.strip():
-                j = json.loads(raw_data)
-    except Exception as e:
-        print("JSON parse error:", e)
-        j = {}
-    
-    print("Final parsed data:", j)
-    
-    # accept different field names
-    text = j.get("message") or j.get("text") or "hello"
-    print("Final extracted text:", text)
-    print("=== END DEBUG ===")
-    
-    # Умная логика для определения интента
+def classify(text):
+    """Определение интента, ответа и сущностей по ключевым словам"""
     text_lower = text.lower()
     
     # Определяем интент по ключевым словам
@@ -91,7 +62,42 @@ def webhook():
             "start": text.find(num),
             "end": text.find(num) + len(num)
         })
+
+    return intent, confidence, response, entities
+
+
+@app.route("/webhooks/rest/webhook", methods=["POST", "GET"])
+def webhook():
+    # Простой способ получения данных
+    print("=== REQUEST DEBUG ===")
+    print("Method:", request.method)
+    print("Content-Type:", request.content_type)
+    print("Raw data:", request.data.decode('utf-8'))
     
+    # Попробуем разные способы получения JSON
+    j = {}
+    try:
+        if request.is_json:
+            j = request.get_json(force=True) or {}
+        else:
+            # Если не JSON, попробуем распарсить вручную
+            import json
+            raw_data = request.data.decode('utf-8')
+            if raw_data.strip():
+                j = json.loads(raw_data)
+    except Exception as e:
+        print("JSON parse error:", e)
+        j = {}
+    
+    print("Final parsed data:", j)
+    
+    # accept different field names
+    text = j.get("message") or j.get("text") or "hello"
+    print("Final extracted text:", text)
+    print("=== END DEBUG ===")
+    
+    intent, confidence, response, entities = classify(text)
+
     return jsonify([{
         "text": response,
         "intent": {
@@ -101,6 +107,22 @@ def webhook():
         "entities": entities
     }])
 
+@app.route("/model/parse", methods=["POST"])
+def parse():
+    j = request.get_json(force=True, silent=True) or {}
+    text = j.get("text") or ""
+    intent, confidence, _, entities = classify(text)
+    # Rasa отдает уверенность сущности в поле confidence_entity
+    for entity in entities:
+        entity["confidence_entity"] = entity.pop("confidence")
+    return jsonify({
+        "text": text,
+        "intent": {"name": intent, "confidence": confidence},
+        "intent_ranking": [{"name": intent, "confidence": confidence}],
+        "entities": entities
+    })
+
+
 @app.route("/", methods=["GET"])
 def root():
     return "OK", 200
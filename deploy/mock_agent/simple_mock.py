@@ -1,13 +1,44 @@
 from flask import Flask, request, jsonify
+import os
+import random
 import sys
+import time
 
 app = Flask(__name__)
 
+# Имитация медленного или сбоящего агента (используется нагрузочными тестами)
+MOCK_DELAY_MS = float(os.getenv("MOCK_DELAY_MS", "0"))
+MOCK_FAILURE_RATE = float(os.getenv("MOCK_FAILURE_RATE", "0"))
+MOCK_QUIET = os.getenv("MOCK_QUIET", "false").lower() == "true"
+
 @app.after_request
 def after_request(response):
     response.headers['Content-Type'] = 'application/json; charset=utf-8'
     return response
 
+def classify(message):
+    """Определение интента и ответа по ключевым словам"""
+    if 'доставк' in message.lower():
+        intent = "faq_delivery"
+        response_text = "Доставка осуществляется в течение 1-3 дней."
+    elif 'оплат' in message.lower():
+        intent = "faq_payment"
+        response_text = "Мы принимаем банковские карты и электронные платежи."
+    elif 'контакт' in message.lower():
+        intent = "faq_contacts"
+        response_text = "Наши контакты: телефон +7(XXX)XXX-XX-XX"
+    elif 'заказ' in message.lower():
+        intent = "request_booking"
+        response_text = "Для оформления заказа укажите, что вас интересует."
+    elif 'привет' in message.lower():
+        intent = "greet"
+        response_text = "Здравствуйте! Чем могу помочь?"
+    else:
+        intent = "unknown"
+        response_text = "Спасибо за ваше сообщение."
+    return intent, response_text
+
+
 @app.route("/webhooks/rest/webhook", methods=["POST", "GET"])
 def webhook():
     # Простая обработка
@@ -20,28 +51,16 @@ def webhook():
             data = json.loads(request.data.decode('utf-8'))
         
         message = data.get('message', data.get('text', ''))
-        print(f"Received message: {message}", file=sys.stderr)
-        
-        # Простая логика
-        if 'доставк' in message.lower():
-            intent = "faq_delivery"
-            response_text = "Доставка осуществляется в течение 1-3 дней."
-        elif 'оплат' in message.lower():
-            intent = "faq_payment"
-            response_text = "Мы принимаем банковские карты и электронные платежи."
-        elif 'контакт' in message.lower():
-            intent = "faq_contacts"
-            response_text = "Наши контакты: телефон +7(XXX)XXX-XX-XX"
-        elif 'заказ' in message.lower():
-            intent = "request_booking"
-            response_text = "Для оформления заказа укажите, что вас интересует."
-        elif 'привет' in message.lower():
-            intent = "greet"
-            response_text = "Здравствуйте! Чем могу помочь?"
-        else:
-            intent = "unknown"
-            response_text = "Спасибо за ваше сообщение."
-            
+        if not MOCK_QUIET:
+            print(f"Received message: {message}", file=sys.stderr)
+
+        if MOCK_DELAY_MS:
+            time.sleep(MOCK_DELAY_MS / 1000)
+        if MOCK_FAILURE_RATE and random.random() < MOCK_FAILURE_RATE:
+            return jsonify({"error": "Injected failure"}), 500
+
+        intent, response_text = classify(message)
+
         result = [{
             "text": response_text,
             "intent": {
@@ -51,7 +70,8 @@ def webhook():
             "entities": []
         }]
         
-        print(f"Responding with intent: {intent}", file=sys.stderr)
+        if not MOCK_QUIET:
+            print(f"Responding with intent: {intent}", file=sys.stderr)
         return jsonify(result)
         
     except Exception as e:
@@ -62,9 +82,26 @@ def webhook():
             "entities": []
         }])
 
+@app.route("/model/parse", methods=["POST"])
+def parse():
+    data = request.get_json(force=True, silent=True) or {}
+    text = data.get('text', '')
+    intent, _ = classify(text)
+    confidence = 0.9 if intent != "unknown" else 0.3
+    return jsonify({
+        "text": text,
+        "intent": {"name": intent, "confidence": confidence},
+        "intent_ranking": [{"name": intent, "confidence": confidence}],
+        "entities": []
+    })
+
+
 @app.route("/", methods=["GET"])
 def root():
     return "OK", 200
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5008, debug=True)
\ No newline at end of file
+    # Порт можно передать первым аргументом: python simple_mock.py 5011
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 5008
+    debug = os.getenv("MOCK_DEBUG", "true").lower() == "true"
+    app.run(host="0.0.0.0", port=port, debug=debug, threaded=True)
\ No newline at end of file
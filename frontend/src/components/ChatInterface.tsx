@@ -1,5 +1,5 @@
 import React, { useState, useRef, useEffect } from 'react';
-import { MessageResponse, agentAPI } from '../services/api';
+import { MessageResponse, agentAPI, ChatSocket } from '../services/api';
 import './css/ChatInterface.css';
 
 /**
@@ -27,6 +27,17 @@ const ChatInterface: React.FC<{ agentId: number }> = ({ agentId }) => {
   const [diagnosticData, setDiagnosticData] = useState<DiagnosticData | null>(null);
   const [isLoading, setIsLoading] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const socketRef = useRef<ChatSocket | null>(null);
+
+  // Держим одну WebSocket-сессию на разговор с агентом
+  useEffect(() => {
+    const socket = new ChatSocket(agentId);
+    socketRef.current = socket;
+    return () => {
+      socket.close();
+      socketRef.current = null;
+    };
+  }, [agentId]);
 
   // Прокрутка к последнему сообщению
   useEffect(() => {
@@ -50,11 +61,12 @@ const ChatInterface: React.FC<{ agentId: number }> = ({ agentId }) => {
     setDiagnosticData(null);
 
     try {
-      // Отправляем сообщение через реальное API
-      const response = await agentAPI.sendMessage(agentId, {
-        message: inputText,
-        sender: 'user'
-      });
+      // Отправляем сообщение через WebSocket, если сессия открыта, иначе через HTTP
+      const request = { message: inputText, sender: 'user' };
+      const socket = socketRef.current;
+      const response = socket && socket.isOpen()
+        ? await socket.send(request)
+        : await agentAPI.sendMessage(agentId, request);
 
       // Добавляем ответ агента
       const agentMessage: ChatMessage = {
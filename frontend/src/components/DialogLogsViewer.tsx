@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { useQuery } from '@tanstack/react-query';
+import { useInfiniteQuery, useQuery } from '@tanstack/react-query';
 import { logsAPI, Agent } from '../services/api';
 import './css/DialogLogsViewer.css';
 
@@ -14,6 +14,8 @@ interface DialogLog {
   timestamp: string;
 }
 
+const LOGS_PAGE_SIZE = 50;
+
 interface DialogLogsViewerProps {
   agent: Agent;
   onClose: () => void;
@@ -24,21 +26,38 @@ const DialogLogsViewer: React.FC<DialogLogsViewerProps> = ({ agent, onClose }) =
   const [filterIntent, setFilterIntent] = useState<string>('all');
   const [filterDate, setFilterDate] = useState<string>('');
 
+  // Фильтры применяются на сервере, логи подгружаются страницами (сначала новые)
+  const logFilters: Record<string, any> = { limit: LOGS_PAGE_SIZE };
+  if (filterIntent !== 'all') {
+    logFilters.intent = filterIntent;
+  }
+  if (filterDate) {
+    logFilters.since = `${filterDate}T00:00:00`;
+    logFilters.until = `${filterDate}T23:59:59.999999`;
+  }
+
   // Загрузка логов
-  const { data: logs = [], isLoading, error } = useQuery({
-    queryKey: ['dialog-logs', agent.id],
-    queryFn: () => logsAPI.getLogs(agent.id),
+  const {
+    data,
+    isLoading,
+    error,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage
+  } = useInfiniteQuery({
+    queryKey: ['dialog-logs', agent.id, filterIntent, filterDate],
+    queryFn: ({ pageParam }) => logsAPI.getLogs(agent.id, pageParam ? { ...logFilters, cursor: pageParam } : logFilters),
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.next_cursor,
   });
+  const filteredLogs = data ? data.pages.flatMap(page => page.items) : [];
 
-  // Получение уникальных интентов для фильтра
-  const uniqueIntents = Array.from(new Set(logs.map((log: any) => log.intent)));
-
-  // Фильтрация логов
-  const filteredLogs = logs.filter((log: any) => {
-    const matchesIntent = filterIntent === 'all' || log.intent === filterIntent;
-    const matchesDate = !filterDate || log.timestamp.startsWith(filterDate);
-    return matchesIntent && matchesDate;
+  // Список интентов для фильтра берем из статистики агента
+  const { data: intentsData } = useQuery({
+    queryKey: ['dialog-log-intents', agent.id],
+    queryFn: () => logsAPI.getIntents(agent.id),
   });
+  const uniqueIntents: string[] = intentsData?.intents || [];
 
   const formatDate = (dateString: string) => {
     return new Date(dateString).toLocaleString('ru-RU');
@@ -127,7 +146,7 @@ const DialogLogsViewer: React.FC<DialogLogsViewerProps> = ({ agent, onClose }) =
           <div className="logs-layout">
             {/* Список логов */}
             <div className="logs-list">
-              <h3>Диалоги ({filteredLogs.length})</h3>
+              <h3>Диалоги ({filteredLogs.length}{hasNextPage ? '+' : ''})</h3>
               {filteredLogs.length === 0 ? (
                 <div className="empty-state">Нет записей диалогов</div>
               ) : (
@@ -152,6 +171,15 @@ const DialogLogsViewer: React.FC<DialogLogsViewerProps> = ({ agent, onClose }) =
                       </div>
                     </div>
                   ))}
+                  {hasNextPage && (
+                    <button
+                      className="btn btn-secondary"
+                      onClick={() => fetchNextPage()}
+                      disabled={isFetchingNextPage}
+                    >
+                      {isFetchingNextPage ? 'Загрузка...' : 'Загрузить еще'}
+                    </button>
+                  )}
                 </div>
               )}
             </div>
@@ -35,7 +35,9 @@ export enum AgentStatus {
   CREATED = "created",
   TRAINING = "training", 
   READY = "ready",
-  ERROR = "error"
+  ERROR = "error",
+  STOPPED = "stopped",
+  SLEEPING = "sleeping"
 }
 
 export interface Agent {
@@ -47,6 +49,7 @@ export interface Agent {
   config_path?: string;
   domain_path?: string;
   model_path?: string;
+  pinned?: boolean;
 }
 
 export interface AgentCreate {
@@ -145,6 +148,52 @@ export interface DialogStory {
 
 
 
+// WebSocket-сессия чата с агентом: одно соединение на разговор
+export class ChatSocket {
+  private socket: WebSocket;
+  private pending: Array<{ resolve: (r: MessageResponse) => void; reject: (e: any) => void }> = [];
+
+  constructor(agentId: number, private onBotMessage?: (text: string) => void) {
+    const wsBase = API_BASE_URL.replace(/^http/, 'ws');
+    this.socket = new WebSocket(`${wsBase}/agents/${agentId}/ws`);
+    this.socket.onmessage = (event) => this.handleFrame(JSON.parse(event.data));
+    this.socket.onclose = () => {
+      this.pending.forEach(p => p.reject({ message: 'WebSocket closed' }));
+      this.pending = [];
+    };
+  }
+
+  isOpen(): boolean {
+    return this.socket.readyState === WebSocket.OPEN;
+  }
+
+  send(message: MessageRequest): Promise<MessageResponse> {
+    return new Promise((resolve, reject) => {
+      this.pending.push({ resolve, reject });
+      this.socket.send(JSON.stringify(message));
+    });
+  }
+
+  close(): void {
+    this.socket.close();
+  }
+
+  private handleFrame(frame: any) {
+    if (frame.type === 'bot_message') {
+      this.onBotMessage?.(frame.text);
+      return;
+    }
+    const waiter = this.pending.shift();
+    if (!waiter) return;
+    if (frame.type === 'done') {
+      const { type, ...response } = frame;
+      waiter.resolve(response as MessageResponse);
+    } else {
+      waiter.reject(frame);
+    }
+  }
+}
+
 // Функции для работы с API
 export const agentAPI = {
   getAgents: (): Promise<Agent[]> => {
@@ -216,10 +265,28 @@ export const nluAPI = {
   }
 };
 
+// Страница логов: next_cursor передается в следующий запрос как cursor
+export interface DialogLogPage {
+  items: any[];
+  next_cursor: string | null;
+  limit: number;
+}
+
+export interface DialogLogSearchPage {
+  items: { log: any; score: number }[];
+  total: number;
+  offset: number;
+  limit: number;
+  next_offset: number | null;
+}
+
 // Методы для логов и трассировки
 export const logsAPI = {
-  getLogs: (agentId: number, params?: Record<string, any>): Promise<any[]> => {
-    return handle<any[]>(api.get(`/agents/${agentId}/logs`, { params }));
+  getLogs: (agentId: number, params?: Record<string, any>): Promise<DialogLogPage> => {
+    return handle<DialogLogPage>(api.get(`/agents/${agentId}/logs`, { params }));
+  },
+  searchLogs: (agentId: number, q: string, params?: Record<string, any>): Promise<DialogLogSearchPage> => {
+    return handle<DialogLogSearchPage>(api.get(`/agents/${agentId}/logs/search`, { params: { q, ...params } }));
   },
   getStatistics: (agentId: number): Promise<any> => {
     return handle<any>(api.get(`/agents/${agentId}/logs/statistics`));
@@ -230,6 +297,15 @@ export const logsAPI = {
   getLogById: (agentId: number, logId: number): Promise<any> => {
     return handle<any>(api.get(`/agents/${agentId}/logs/${logId}`));
   },
+  // Ссылка на потоковую выгрузку: браузер скачивает файл сам, не держа его в памяти
+  getExportUrl: (agentId: number, params?: Record<string, any>): string => {
+    const query = new URLSearchParams();
+    Object.entries(params || {}).forEach(([key, value]) => {
+      if (value !== undefined && value !== null && value !== '') query.append(key, String(value));
+    });
+    const suffix = query.toString();
+    return `${API_BASE_URL}/agents/${agentId}/logs/export${suffix ? `?${suffix}` : ''}`;
+  },
   clearLogs: (agentId: number): Promise<void> => {
     return handle<void>(api.delete(`/agents/${agentId}/logs/`));
   }
@@ -237,7 +313,10 @@ export const logsAPI = {
 
 // Agent lifecycle
 export const lifecycleAPI = {
+  startAgent: (agentId: number): Promise<any> => handle<any>(api.post(`/agents/${agentId}/start`)),
   stopAgent: (agentId: number): Promise<any> => handle<any>(api.post(`/agents/${agentId}/stop`)),
+  getProcess: (agentId: number, tail?: number): Promise<any> =>
+    handle<any>(api.get(`/agents/${agentId}/process`, { params: { tail } })),
 };
 
 // Функции для работы с диалогами
@@ -245,7 +324,18 @@ export const dialogAPI = {
   // Получение всех историй для агента
   getStories: (agentId: number): Promise<DialogStory[]> => {
     // Используем логи диалогов в качестве историй (упрощенно)
-    return logsAPI.getLogs(agentId).then(logs => {
+    // Логи отдаются постранично: идем по next_cursor до последней страницы
+    const loadAll = async (): Promise<any[]> => {
+      const logs: any[] = [];
+      let cursor: string | null = null;
+      do {
+        const page: DialogLogPage = await logsAPI.getLogs(agentId, { limit: 1000, ...(cursor ? { cursor } : {}) });
+        logs.push(...page.items);
+        cursor = page.next_cursor;
+      } while (cursor);
+      return logs;
+    };
+    return loadAll().then(logs => {
       // Преобразуем каждый лог в простую историю
       const stories: DialogStory[] = logs.map((log, idx) => ({
         id: idx + 1,
@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# Модули backend создают синглтоны при импорте: их файлы — во временной папке,
+# а не в рабочей копии
+_STATE_DIR = tempfile.mkdtemp(prefix="lab-backend-tests-")
+os.environ.setdefault("DIALOG_DB_FILE", os.path.join(_STATE_DIR, "dialogs.db"))
+os.environ.setdefault("DIALOG_JOURNAL_FILE", os.path.join(_STATE_DIR, "dialogs_journal.jsonl"))
+os.environ.setdefault("LOG_ARCHIVE_DIR", os.path.join(_STATE_DIR, "logs_archive"))
+os.environ.setdefault("LOG_WRITER_SPILL_FILE", os.path.join(_STATE_DIR, "dialogs_spill.jsonl"))
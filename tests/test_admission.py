@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from backend.models import Agent, AgentType
+from backend.rasa_integration import RasaIntegration
+from backend.services.admission import AdmissionController, AdmissionRejected, AgentGate
+
+
+def make_agent(**overrides) -> Agent:
+    now = datetime.now().isoformat()
+    params = dict(id=1, name="test", description="", agent_type=AgentType.FAQ, port=5999,
+                  created_at=now, updated_at=now)
+    params.update(overrides)
+    return Agent(**params)
+
+
+def test_gate_admits_waiters_in_fifo_order():
+    async def scenario():
+        gate = AgentGate(limit=1, queue_limit=10)
+        order = []
+
+        async def request(name):
+            await gate.acquire(1)
+            order.append(name)
+            await asyncio.sleep(0)
+            gate.release()
+
+        await gate.acquire(1)
+        tasks = [asyncio.create_task(request(name)) for name in "abcd"]
+        await asyncio.sleep(0)
+        assert gate.queue_depth == 4
+        gate.release()
+        await asyncio.gather(*tasks)
+        return gate, order
+
+    gate, order = asyncio.run(scenario())
+    assert order == list("abcd")
+    assert gate.in_flight == 0
+    assert gate.queued == 4
+
+
+def test_gate_rejects_when_queue_is_full():
+    async def scenario():
+        gate = AgentGate(limit=1, queue_limit=1)
+        await gate.acquire(7)
+        waiter = asyncio.create_task(gate.acquire(7))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await gate.acquire(7)
+        # Запросы без ограничения очереди (батч) ждут, а не отклоняются
+        unlimited = asyncio.create_task(gate.acquire(7, queue_limited=False))
+        await asyncio.sleep(0)
+        assert gate.queue_depth == 2
+        gate.release()
+        gate.release()
+        await asyncio.gather(waiter, unlimited)
+        return gate, rejected.value
+
+    gate, rejected = asyncio.run(scenario())
+    assert rejected.agent_id == 7
+    assert rejected.retry_after >= 1.0
+    assert gate.rejected == 1
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        gate = AgentGate(limit=1, queue_limit=5)
+        await gate.acquire(1)
+        waiter = asyncio.create_task(gate.acquire(1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        depth = gate.queue_depth
+        gate.release()
+        return gate, depth
+
+    gate, depth = asyncio.run(scenario())
+    assert depth == 0
+    assert gate.in_flight == 0
+
+
+def test_coalesced_requests_take_one_admission_slot(monkeypatch):
+    async def scenario():
+        integration = RasaIntegration()
+        controller = AdmissionController()
+        agent = make_agent(max_concurrency=1, max_queue=0)
+        calls = []
+
+        async def fake_post(agent_port, message, sender):
+            calls.append(message)
+            await asyncio.sleep(0.01)
+            return {"success": True, "responses": ["ok"], "metadata": None}
+
+        monkeypatch.setattr(integration, "_post_message", fake_post)
+        results = await asyncio.gather(*(
+            integration.send_message(agent.port, "привет", slot=lambda: controller.slot(agent))
+            for _ in range(3)
+        ))
+        return integration, controller.gate(agent), calls, results
+
+    integration, gate, calls, results = asyncio.run(scenario())
+    assert calls == ["привет"]
+    assert all(result["success"] for result in results)
+    # Очередь нулевая: без объединения два дубля получили бы 429
+    assert gate.admitted == 1
+    assert gate.rejected == 0
+    assert integration.coalesced_requests[5999] == 2
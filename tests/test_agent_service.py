@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from backend.models import AgentUpdate
+from backend.services.agent_service import AgentService
+from backend.services.port_pool import port_pool
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    now = "2024-01-01T00:00:00"
+    (tmp_path / "agents_state.json").write_text(json.dumps({
+        "next_id": 2,
+        "agents": [{"id": 1, "name": "faq", "description": "старое", "agent_type": "faq", "port": 6150,
+                    "created_at": now, "updated_at": now, "max_concurrency": 4, "max_queue": 10,
+                    "log_retention_days": 30, "pinned": True}]
+    }), encoding="utf-8")
+    yield AgentService()
+    port_pool.clear()
+
+
+def test_explicit_null_resets_limits_to_defaults(service):
+    agent = service.update_agent(1, AgentUpdate.parse_obj({"max_concurrency": None, "log_retention_days": None}))
+    assert agent.max_concurrency is None
+    assert agent.log_retention_days is None
+    # Не переданные поля не меняются
+    assert agent.max_queue == 10
+    assert agent.description == "старое"
+
+
+def test_null_in_non_nullable_field_is_ignored(service):
+    agent = service.update_agent(1, AgentUpdate.parse_obj({"pinned": None, "description": None, "max_queue": 0}))
+    assert agent.pinned is True
+    assert agent.description == "старое"
+    assert agent.max_queue == 0
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from backend.rasa_integration import RasaIntegration
+from backend.services import circuit_breaker as cb_module
+from backend.services.circuit_breaker import CircuitBreaker, CircuitOpenError, circuit_breakers
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cb_module.time, "monotonic", clock)
+    return clock
+
+
+def make_breaker(**overrides) -> CircuitBreaker:
+    params = dict(failure_threshold=3, recovery_timeout=10, half_open_max_calls=1, success_threshold=2)
+    params.update(overrides)
+    return CircuitBreaker(**params)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = make_breaker()
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure("boom")
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    assert breaker.allow_request()
+    breaker.record_failure("boom")
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.is_open()
+    assert not breaker.allow_request()
+    assert breaker.rejected_calls == 1
+    assert breaker.times_opened == 1
+
+
+def test_success_resets_failure_streak(clock):
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_after_recovery_timeout_limits_probes(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 10
+
+    assert not breaker.is_open()
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Пробный слот один — второй запрос отклоняется
+    assert not breaker.allow_request()
+
+
+def test_half_open_closes_after_successes(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 10
+
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+def test_half_open_failure_reopens(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 10
+
+    assert breaker.allow_request()
+    breaker.record_failure("still down")
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    assert breaker.retry_after() == 10
+
+
+@pytest.fixture
+def integration(monkeypatch):
+    integration = RasaIntegration()
+    integration.calls = []
+
+    async def fake_post(agent_port, message, sender):
+        integration.calls.append((agent_port, sender, message))
+        await asyncio.sleep(0.01)
+        return {"success": True, "responses": [message], "metadata": None}
+
+    monkeypatch.setattr(integration, "_post_message", fake_post)
+    yield integration
+    for port in (6201, 6202, 6203):
+        circuit_breakers.forget(port)
+
+
+def test_identical_inflight_requests_are_coalesced(integration):
+    async def scenario():
+        return await asyncio.gather(*(integration.send_message(6201, "привет") for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert integration.calls == [(6201, "user", "привет")]
+    assert [result["responses"] for result in results] == [["привет"]] * 3
+    assert integration.coalesced_requests[6201] == 2
+
+
+def test_different_requests_are_not_coalesced(integration):
+    async def scenario():
+        await asyncio.gather(
+            integration.send_message(6202, "привет"),
+            integration.send_message(6202, "пока"),
+            integration.send_message(6202, "привет", sender="other")
+        )
+        # Завершенный запрос из полета убран: повтор уходит заново
+        await integration.send_message(6202, "привет")
+
+    asyncio.run(scenario())
+    assert len(integration.calls) == 4
+    assert 6202 not in integration.coalesced_requests
+
+
+def test_open_breaker_rejects_without_calling_agent(integration):
+    breaker = circuit_breakers.get(6203)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure("down")
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(integration.send_message(6203, "привет"))
+    assert integration.calls == []
+    assert breaker.rejected_calls == 1
@@ -0,0 +1,106 @@
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+from backend.fallback_classifier import FallbackResponder
+from backend.models import Agent, AgentType
+
+NLU = """version: "3.1"
+nlu:
+- intent: faq_delivery
+  examples: |
+    - как осуществляется доставка?
+    - сколько стоит доставка?
+- intent: faq_payment
+  examples: |
+    - какие способы оплаты?
+    - можно оплатить картой?
+"""
+
+DOMAIN = """version: "3.1"
+intents:
+  - faq_delivery
+  - faq_payment
+responses:
+  utter_faq_delivery:
+    - text: Доставка занимает 2 дня
+"""
+
+# Интент с одним примером не проходит проверку NLUData
+BROKEN_NLU = """version: "3.1"
+nlu:
+- intent: faq_delivery
+  examples: |
+    - доставка
+"""
+
+
+@pytest.fixture
+def agent(tmp_path):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "nlu.yml").write_text(NLU, encoding="utf-8")
+    (tmp_path / "domain.yml").write_text(DOMAIN, encoding="utf-8")
+    now = datetime.now().isoformat()
+    return Agent(id=1, name="faq", description="", agent_type=AgentType.FAQ, port=5999,
+                 nlu_data_path=str(tmp_path / "data" / "nlu.yml"), domain_path=str(tmp_path / "domain.yml"),
+                 created_at=now, updated_at=now)
+
+
+def rewrite(path: str, content: str) -> None:
+    stat = os.stat(path)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    # Новая версия файла даже при совпадении размера и mtime
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+def test_respond_uses_domain_response_for_recognized_intent(agent):
+    responder = FallbackResponder()
+    result = asyncio.run(responder.respond(agent, "сколько стоит доставка"))
+    assert result["metadata"]["intent"]["name"] == "faq_delivery"
+    assert result["responses"] == ["Доставка занимает 2 дня"]
+    assert result["fallback"]
+
+
+def test_broken_nlu_file_gives_no_metadata_and_is_not_reloaded(agent, monkeypatch):
+    rewrite(agent.nlu_data_path, BROKEN_NLU)
+    responder = FallbackResponder()
+    loads = []
+    load_nlu_data = responder.nlu_service.load_nlu_data
+
+    def counting_load(path):
+        loads.append(path)
+        return load_nlu_data(path)
+
+    monkeypatch.setattr(responder.nlu_service, "load_nlu_data", counting_load)
+
+    async def scenario():
+        first = await responder.metadata(agent, "доставка")
+        second = await responder.metadata(agent, "доставка")
+        return first, second
+
+    assert asyncio.run(scenario()) == (None, None)
+    assert len(loads) == 1
+
+    # Исправленный файл снова подхватывается
+    rewrite(agent.nlu_data_path, NLU)
+    metadata = asyncio.run(responder.metadata(agent, "можно оплатить картой"))
+    assert metadata["intent"]["name"] == "faq_payment"
+    assert len(loads) == 2
+
+
+def test_concurrent_messages_build_classifier_once(agent, monkeypatch):
+    responder = FallbackResponder()
+    loads = []
+    load_nlu_data = responder.nlu_service.load_nlu_data
+    monkeypatch.setattr(responder.nlu_service, "load_nlu_data",
+                        lambda path: loads.append(path) or load_nlu_data(path))
+
+    async def scenario():
+        return await asyncio.gather(*(responder.metadata(agent, "доставка") for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert all(result["intent"]["name"] == "faq_delivery" for result in results)
+    assert len(loads) == 1
@@ -0,0 +1,196 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.models import DialogLog, LogQuery
+from backend.services.log_store import JournalLogStore
+
+START = datetime(2024, 1, 1)
+
+
+def make_logs(ids, agent_id: int = 1):
+    return [DialogLog(id=i, agent_id=agent_id, sender="user", user_message=f"m{i}", bot_response=["ok"],
+                      timestamp=(START + timedelta(seconds=i)).isoformat())
+            for i in ids]
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setenv("DIALOG_JOURNAL_FSYNC", "never")
+    return str(tmp_path / "dialogs_state.json"), str(tmp_path / "dialogs_journal.jsonl")
+
+
+def reopen(store: JournalLogStore, files) -> JournalLogStore:
+    store.close()
+    return JournalLogStore(*files)
+
+
+def ids(store: JournalLogStore):
+    return sorted(log.id for log in store.logs)
+
+
+def test_journal_is_replayed_after_restart_without_compaction(files):
+    store = JournalLogStore(*files)
+    store.append(make_logs([1, 2]))
+    store.append(make_logs([3], agent_id=2))
+    assert store.snapshot_records == 0
+
+    store = reopen(store, files)
+    assert ids(store) == [1, 2, 3]
+    assert store.agent_counts() == {1: 2, 2: 1}
+    assert store.journal_records == 3
+    assert store.next_id() == 4
+    store.close()
+
+
+def test_compaction_starts_new_generation(files, monkeypatch):
+    monkeypatch.setenv("DIALOG_JOURNAL_COMPACT_MIN", "3")
+    store = JournalLogStore(*files)
+    generation = store.generation
+    store.append(make_logs([1, 2]))
+    store.append(make_logs([3, 4]))
+    assert store.generation == generation + 1
+    assert store.snapshot_records == 4
+    assert store.journal_records == 0
+
+    store.append(make_logs([5]))
+    store = reopen(store, files)
+    assert ids(store) == [1, 2, 3, 4, 5]
+    store.close()
+
+
+def test_torn_last_line_is_dropped_and_state_rewritten(files):
+    store = JournalLogStore(*files)
+    store.append(make_logs([1, 2]))
+    store.close()
+    with open(files[1], "a", encoding="utf-8") as f:
+        f.write('{"id": 3, "agent_id": 1, "user_mess')
+
+    store = JournalLogStore(*files)
+    assert ids(store) == [1, 2]
+    # Состояние переписано начисто: новый журнал продолжается без мусора
+    store.append(make_logs([3]))
+    store = reopen(store, files)
+    assert ids(store) == [1, 2, 3]
+    store.close()
+
+
+def test_journal_from_other_generation_is_ignored(files):
+    store = JournalLogStore(*files)
+    store.append(make_logs([1]))
+    store.compact()
+    store.close()
+    with open(files[1], "w", encoding="utf-8") as f:
+        f.write(json.dumps({"generation": 99}) + "\n")
+        f.write(json.dumps(make_logs([2])[0].dict()) + "\n")
+
+    store = JournalLogStore(*files)
+    assert ids(store) == [1]
+    store.close()
+
+
+def test_out_of_order_batches_survive_restart(files):
+    # Пачка [2] пришла позже — ее повторил LogWriter из файла переполнения
+    store = JournalLogStore(*files)
+    store.append(make_logs([1, 3]))
+    store.append(make_logs([2]))
+
+    store = reopen(store, files)
+    assert ids(store) == [1, 2, 3]
+    assert store.next_id() == 4
+    store.close()
+
+
+def test_repeated_record_is_replayed_once(files):
+    store = JournalLogStore(*files)
+    store.append(make_logs([1, 2]))
+    store.append(make_logs([2]))
+
+    store = reopen(store, files)
+    assert ids(store) == [1, 2]
+    assert store.count(1) == 2
+    store.close()
+
+
+def page_ids(store: JournalLogStore, **params):
+    return [log.id for log in store.page(LogQuery(agent_id=1, **params))]
+
+
+def test_page_walks_sorted_index_with_cursor_and_bounds(files):
+    store = JournalLogStore(*files)
+    store.append(make_logs(range(1, 8)))
+    # Запись из прошлого (повтор пачки) встает на свое место в индексе
+    late = make_logs([8])[0]
+    late.timestamp = (START + timedelta(seconds=3, milliseconds=500)).isoformat()
+    store.append([late])
+
+    assert page_ids(store, limit=3) == [7, 6, 5]
+    assert page_ids(store, limit=3, after=((START + timedelta(seconds=5)).isoformat(), 5)) == [4, 8, 3]
+    assert page_ids(store, limit=10, descending=False,
+                    since=(START + timedelta(seconds=3)).isoformat(),
+                    until=(START + timedelta(seconds=5)).isoformat()) == [3, 8, 4]
+
+    store.delete([8, 4])
+    assert page_ids(store, limit=3, after=((START + timedelta(seconds=5)).isoformat(), 5)) == [3, 2, 1]
+    store.close()
+
+
+def test_page_applies_remaining_filters_until_limit(files):
+    store = JournalLogStore(*files)
+    logs = make_logs(range(1, 11))
+    for log in logs:
+        log.sender = "bot" if log.id % 2 else "user"
+    store.append(logs)
+
+    assert page_ids(store, limit=2, sender="user") == [10, 8]
+    assert page_ids(store, limit=2, sender="user", after=((START + timedelta(seconds=8)).isoformat(), 8)) == [6, 4]
+    store.close()
+
+
+def test_deleted_records_stay_deleted_after_restart(files):
+    store = JournalLogStore(*files)
+    store.append(make_logs(range(1, 6)))
+    snapshot_size = store.snapshot_records
+    store.delete([1, 2])
+    # Удаление дописано отметкой, снимок не переписывался
+    assert store.snapshot_records == snapshot_size
+
+    store = reopen(store, files)
+    assert ids(store) == [3, 4, 5]
+    store.close()
+
+
+def test_tombstone_for_snapshot_records_is_replayed_and_compacted(files):
+    store = JournalLogStore(*files)
+    store.append(make_logs(range(1, 6)))
+    store.compact()
+    store.delete([1, 5])
+    store = reopen(store, files)
+    assert ids(store) == [2, 3, 4]
+
+    store.compact()
+    store = reopen(store, files)
+    assert ids(store) == [2, 3, 4]
+    assert store.journal_records == 0
+    store.close()
+
+
+def test_deleting_every_record_keeps_next_id(files):
+    store = JournalLogStore(*files)
+    store.append(make_logs(range(1, 4)))
+    store.delete([1, 2, 3])
+
+    store = reopen(store, files)
+    assert ids(store) == []
+    assert store.next_id() == 4
+    store.close()
+
+
+def test_oldest_returns_records_before_cutoff_in_time_order(files):
+    store = JournalLogStore(*files)
+    store.append(make_logs([3, 1, 2, 4]))
+    cutoff = (START + timedelta(seconds=4)).isoformat()
+    assert [log.id for log in store.oldest(1, 10, before=cutoff)] == [1, 2, 3]
+    assert [log.id for log in store.oldest(1, 2)] == [1, 2]
+    store.close()
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from backend.models import DialogLog
+from backend.services.log_aggregates import LogAggregates
+
+START = datetime(2024, 1, 1)
+
+
+def make_log(log_id: int, agent_id: int = 1, intent=None, response="ok", processing_time_ms=None, entities=()):
+    return DialogLog(id=log_id, agent_id=agent_id, sender="user", user_message=f"m{log_id}",
+                     bot_response=[response], intent=intent, entities=[{"entity": name} for name in entities],
+                     timestamp=(START + timedelta(seconds=log_id)).isoformat(),
+                     processing_time_ms=processing_time_ms)
+
+
+def test_add_updates_snapshot_incrementally():
+    aggregates = LogAggregates()
+    aggregates.add([make_log(1, intent="greet", processing_time_ms=10, entities=["city"]),
+                    make_log(2, intent="greet", processing_time_ms=30)])
+    aggregates.add([make_log(3, response="Error: timeout"), make_log(4, agent_id=2, intent="bye")])
+
+    stats = asyncio.run(aggregates.get(1)).snapshot()
+    assert stats["total_dialogs"] == 3
+    assert stats["error_count"] == 1
+    assert stats["error_rate"] == round(1 / 3, 4)
+    assert stats["intent_counts"] == {"greet": 2}
+    assert stats["unclassified_count"] == 1
+    assert stats["entity_counts"] == {"city": 1}
+    assert stats["processing_time_ms"] == {"mean": 20.0, "max": 30.0}
+    assert stats["last_activity"] == make_log(3).timestamp
+    assert asyncio.run(aggregates.intents(2)) == ["bye"]
+
+
+def test_rebuild_and_clear():
+    aggregates = LogAggregates()
+    aggregates.add([make_log(1, intent="greet")])
+    aggregates.rebuild([[make_log(2, intent="bye"), make_log(3, agent_id=2)]])
+    assert asyncio.run(aggregates.intents(1)) == ["bye"]
+
+    aggregates.clear(1)
+    assert asyncio.run(aggregates.get(1)).total == 0
+    assert asyncio.run(aggregates.get(2)).total == 1
+    assert aggregates.loaded() == 1
+
+
+def test_lazy_build_counts_pending_records_once():
+    history = [make_log(1, intent="greet"), make_log(2, intent="greet")]
+    aggregates = LogAggregates(loader=lambda agent_id: [list(history)])
+
+    async def scenario():
+        # Запись пришла во время построения и уже видна loader'у
+        new = make_log(3, intent="bye")
+        aggregates.add([new])
+        history.append(new)
+        return await aggregates.get(1)
+
+    stats = asyncio.run(scenario()).snapshot()
+    assert stats["total_dialogs"] == 3
+    assert stats["intent_counts"] == {"greet": 2, "bye": 1}
+
+
+def test_record_moved_to_archive_during_build_is_counted_once():
+    store = [make_log(1), make_log(2)]
+    archive = [make_log(2), make_log(3)]
+    aggregates = LogAggregates(loader=lambda agent_id: [store, archive])
+    assert asyncio.run(aggregates.get(1)).total == 3
+
+
+def test_clear_during_build_drops_result():
+    aggregates = LogAggregates(loader=lambda agent_id: [[make_log(1)]])
+
+    async def scenario():
+        build = asyncio.ensure_future(aggregates.get(1))
+        await asyncio.sleep(0)
+        aggregates.clear(1)
+        await build
+        return aggregates.loaded()
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_failed_build_returns_empty_aggregates():
+    def broken(agent_id):
+        raise OSError("disk")
+
+    aggregates = LogAggregates(loader=broken)
+    assert asyncio.run(aggregates.get(1)).total == 0
+    assert aggregates.loaded() == 0
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.models import DialogLog, LogQuery
+from backend.services.log_archive import LogArchive
+
+START = datetime(2024, 1, 1, 23, 0)
+
+
+def make_logs(ids, agent_id: int = 1):
+    # Записи каждые полчаса: пачка переходит через полночь в новый сегмент
+    return [DialogLog(id=i, agent_id=agent_id, sender="user", user_message=f"m{i}", bot_response=["ok"],
+                      timestamp=(START + timedelta(minutes=30 * i)).isoformat())
+            for i in ids]
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOG_ARCHIVE_DIR", str(tmp_path / "archive"))
+    return LogArchive()
+
+
+def page_ids(archive: LogArchive, **params):
+    return [log.id for log in archive.page(LogQuery(agent_id=1, **params))]
+
+
+def test_write_splits_segments_by_day_and_appends_frames(archive):
+    archive.write(make_logs([0, 1, 2]))
+    archive.write(make_logs([3]))
+    archive.write(make_logs([4], agent_id=2))
+
+    assert archive.stats(1)["segments"] == 2
+    assert archive.stats(1)["first_day"] == "2024-01-01"
+    assert sorted(log.id for batch in archive.scan(1) for log in batch) == [0, 1, 2, 3]
+    assert sorted(log.id for batch in archive.scan() for log in batch) == [0, 1, 2, 3, 4]
+
+
+def test_page_crosses_segments_with_cursor(archive):
+    archive.write(make_logs(range(0, 6)))
+
+    first = archive.page(LogQuery(agent_id=1, limit=4))
+    assert [log.id for log in first] == [5, 4, 3, 2]
+    after = (first[-1].timestamp, first[-1].id)
+    assert page_ids(archive, limit=4, after=after) == [1, 0]
+    assert page_ids(archive, limit=10, descending=False, since="2024-01-02T00:00:00") == [2, 3, 4, 5]
+
+
+def test_clear_removes_agent_segments(archive):
+    archive.write(make_logs([0]) + make_logs([1], agent_id=2))
+    archive.clear(1)
+    assert archive.segments(1) == []
+    assert archive.stats(2)["segments"] == 1
@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime
+
+from backend.models import DialogLog
+from backend.services.log_search import AgentSearchIndex, LogSearchIndex
+
+
+def make_logs(agent_id: int, first_id: int, count: int, text: str):
+    now = datetime.now().isoformat()
+    return [DialogLog(id=i, agent_id=agent_id, sender="user", user_message=f"{text} {i}",
+                      bot_response=["ответ"], timestamp=now)
+            for i in range(first_id, first_id + count)]
+
+
+class Store:
+    def __init__(self, logs):
+        self.logs = list(logs)
+
+    def scan(self, agent_id):
+        yield [log for log in self.logs if log.agent_id == agent_id]
+
+    def delete(self, logs):
+        removed = {log.id for log in logs}
+        self.logs = [log for log in self.logs if log.id not in removed]
+
+
+def archive(store: Store, index: LogSearchIndex, logs):
+    # Как LogRetentionPolicy._archive: сначала хранилище, затем индекс
+    store.delete(logs)
+    index.discard(logs)
+
+
+def test_retention_discards_from_built_index():
+    logs = make_logs(1, 1, 10, "доставка")
+    store = Store(logs)
+    index = LogSearchIndex(loader=lambda agent_id: store.scan(agent_id))
+
+    async def scenario():
+        before = await index.search(1, "доставка")
+        archive(store, index, logs[:6])
+        after = await index.search(1, "доставка")
+        return before, after
+
+    before, after = asyncio.run(scenario())
+    assert before[0] == 10
+    assert after[0] == 4
+    assert sorted(log_id for log_id, _ in after[1]) == [7, 8, 9, 10]
+
+
+def test_retention_discards_recent_logs_before_index_is_built():
+    logs = make_logs(1, 1, 12, "возврат")
+    store = Store(logs)
+    index = LogSearchIndex(loader=lambda agent_id: store.scan(agent_id))
+    # Записи прошли через DialogLogger, индекса агента еще нет
+    index.add(logs)
+    archive(store, index, logs[:7])
+
+    total, hits = asyncio.run(index.search(1, "возврат"))
+    assert total == 5
+    assert sorted(log_id for log_id, _ in hits) == [8, 9, 10, 11, 12]
+
+
+def test_retention_during_build_does_not_resurrect_logs():
+    logs = make_logs(1, 1, 8, "оплата")
+    store = Store(logs)
+    index = LogSearchIndex(loader=lambda agent_id: store.scan(agent_id))
+
+    async def scenario():
+        index.add(logs)
+        building = asyncio.create_task(index.search(1, "оплата"))
+        await asyncio.sleep(0)
+        # Хранилище уже прочитано построением, но записи удалены
+        archive(store, index, logs[:3])
+        await building
+        return await index.search(1, "оплата")
+
+    total, hits = asyncio.run(scenario())
+    assert total == 5
+    assert {log_id for log_id, _ in hits} == {4, 5, 6, 7, 8}
+    assert index.stats(1)["documents"] == 5
+
+
+def test_discard_of_other_agent_keeps_index_intact():
+    logs = make_logs(1, 1, 3, "скидка") + make_logs(2, 4, 3, "скидка")
+    store = Store(logs)
+    index = LogSearchIndex(loader=lambda agent_id: store.scan(agent_id))
+    archive(store, index, logs[3:])
+
+    total, _ = asyncio.run(index.search(1, "скидка"))
+    assert total == 3
+
+
+def test_index_compacts_after_many_discards(monkeypatch):
+    monkeypatch.setenv("SEARCH_INDEX_COMPACT_MIN", "4")
+    index = AgentSearchIndex()
+    index.add_logs(make_logs(1, 1, 10, "доставка"))
+    index.add_logs(make_logs(1, 11, 2, "оплата"))
+
+    index.discard([1, 2, 3])
+    assert len(index.log_ids) == 12
+    index.discard([11, 12])
+    # 5 удаленных из 12 — больше четверти: индекс перестроен без них
+    assert list(index.log_ids) == [4, 5, 6, 7, 8, 9, 10]
+    assert "оплат" not in index.postings
+    assert index.live == 7
+    total, hits = index.search(["доставк"], 0, 3)
+    assert total == 7
+    assert [log_id for log_id, _ in hits] == [10, 9, 8]
+
+    index.add(20, "доставка 20")
+    assert index.search(["доставк"], 0, 20)[0] == 8
@@ -0,0 +1,137 @@
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+from backend.dialog_logger import DialogLogger
+from backend.models import DialogLog, DialogLogCreate
+from backend.services.log_writer import LogWriter
+from backend.services.sqlite_log_store import SQLiteLogStore
+
+
+class MemoryStore:
+    """Хранилище в памяти; первые `failures` вызовов append падают"""
+
+    name = "memory"
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.logs = []
+
+    def append(self, logs):
+        if self.failures:
+            self.failures -= 1
+            raise IOError("disk is full")
+        self.logs.extend(logs)
+
+
+def make_logs(count: int):
+    now = datetime.now().isoformat()
+    return [DialogLog(id=i, agent_id=1, sender="user", user_message=f"m{i}", bot_response=[], timestamp=now)
+            for i in range(1, count + 1)]
+
+
+@pytest.fixture
+def writer_env(monkeypatch, tmp_path):
+    spill_file = tmp_path / "spill.jsonl"
+    monkeypatch.setenv("LOG_WRITER_SPILL_FILE", str(spill_file))
+    monkeypatch.setenv("LOG_WRITER_QUEUE_SIZE", "2")
+    monkeypatch.setenv("LOG_WRITER_FLUSH_MS", "1")
+    return spill_file
+
+
+def run_writer(writer: LogWriter, logs):
+    async def scenario():
+        writer.start()
+        await writer.submit(logs)
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_drop_policy_discards_overflow(writer_env, monkeypatch):
+    monkeypatch.setenv("LOG_WRITER_OVERFLOW", "drop")
+    store = MemoryStore()
+    writer = LogWriter(store)
+    run_writer(writer, make_logs(5))
+
+    assert writer.dropped == 3
+    assert [log.id for log in store.logs] == [1, 2]
+
+
+def test_spill_policy_keeps_overflow_on_disk(writer_env, monkeypatch):
+    monkeypatch.setenv("LOG_WRITER_OVERFLOW", "spill")
+    store = MemoryStore()
+    writer = LogWriter(store)
+    run_writer(writer, make_logs(5))
+
+    assert writer.spilled == 3
+    assert sorted(log.id for log in store.logs) == [1, 2, 3, 4, 5]
+    assert not os.path.exists(writer_env)
+    assert not os.path.exists(f"{writer_env}.draining")
+
+
+def test_failed_flush_is_retried_from_spill_file(writer_env, monkeypatch):
+    monkeypatch.setenv("LOG_WRITER_OVERFLOW", "block")
+    store = MemoryStore(failures=1)
+    writer = LogWriter(store)
+    run_writer(writer, make_logs(2))
+
+    assert writer.errors == 1
+    assert writer.spilled == 2
+    assert [log.id for log in store.logs] == [1, 2]
+    assert not os.path.exists(writer_env)
+
+
+def test_spill_left_by_previous_run_is_written_on_start(writer_env, monkeypatch):
+    monkeypatch.setenv("LOG_WRITER_OVERFLOW", "spill")
+    previous = LogWriter(MemoryStore())
+    for log in make_logs(3):
+        previous._spill(log)
+
+    store = MemoryStore()
+    run_writer(LogWriter(store), [])
+    assert [log.id for log in store.logs] == [1, 2, 3]
+
+
+def test_flush_waits_for_queued_and_spilled_records(writer_env, monkeypatch):
+    monkeypatch.setenv("LOG_WRITER_OVERFLOW", "spill")
+    monkeypatch.setenv("LOG_WRITER_FLUSH_MS", "60000")
+    store = MemoryStore()
+    writer = LogWriter(store)
+
+    async def scenario():
+        writer.start()
+        await writer.submit(make_logs(5))
+        await writer.flush()
+        written = sorted(log.id for log in store.logs)
+        await writer.stop()
+        return written
+
+    assert asyncio.run(scenario()) == [1, 2, 3, 4, 5]
+
+
+def test_clear_logs_drops_records_queued_before_clear(writer_env, monkeypatch, tmp_path):
+    monkeypatch.setenv("LOG_WRITER_FLUSH_MS", "60000")
+    monkeypatch.setenv("LOG_ARCHIVE_DIR", str(tmp_path / "archive"))
+    logger = DialogLogger(store=SQLiteLogStore(str(tmp_path / "dialogs.db")))
+
+    def dialog(agent_id):
+        return DialogLogCreate(agent_id=agent_id, sender="user", user_message="привет", bot_response=["ok"])
+
+    async def scenario():
+        logger.start()
+        await logger.log_dialogs([dialog(1), dialog(1), dialog(2)])
+        await logger.clear_logs(1)
+        await logger.clear_logs()
+        new_log = await logger.log_dialog(dialog(1))
+        await logger.writer.flush()
+        counts = logger.store.agent_counts()
+        await logger.stop()
+        return new_log, counts
+
+    new_log, counts = asyncio.run(scenario())
+    assert counts == {1: 1}
+    # Номера очищенных логов не переиспользуются
+    assert new_log.id == 4
@@ -0,0 +1,21 @@
+import pytest
+from fastapi import HTTPException
+
+from backend.routers.logs import _normalize_timestamp
+
+
+def test_naive_timestamp_is_kept():
+    assert _normalize_timestamp("2024-01-01T10:00:00", "since") == "2024-01-01T10:00:00"
+
+
+def test_offsets_are_converted_to_the_same_naive_moment():
+    utc = _normalize_timestamp("2024-01-01T00:00:00Z", "since")
+    moscow = _normalize_timestamp("2024-01-01T03:00:00+03:00", "since")
+    assert utc == moscow
+    assert "+" not in utc and not utc.endswith("Z")
+
+
+def test_invalid_timestamp_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        _normalize_timestamp("вчера", "until")
+    assert error.value.status_code == 400
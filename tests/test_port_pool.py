@@ -0,0 +1,104 @@
+import json
+import socket
+
+import pytest
+
+from backend.services import port_pool as port_pool_module
+from backend.services.port_pool import PortPool, PortPoolExhausted
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setenv("AGENT_PORT_RANGE_START", "6100")
+    monkeypatch.setenv("AGENT_PORT_RANGE_END", "6104")
+    monkeypatch.setenv("PORT_LEASE_SECONDS", "60")
+    return PortPool()
+
+
+def test_reserve_hands_out_ports_in_order_until_exhausted(pool):
+    assert [pool.reserve() for _ in range(4)] == [6100, 6101, 6102, 6103]
+    with pytest.raises(PortPoolExhausted):
+        pool.reserve()
+
+
+def test_commit_assigns_owner_and_ends_lease(pool):
+    port = pool.reserve()
+    pool.commit(port, agent_id=7)
+    assert pool.owner(port) == 7
+    assert pool.snapshot()["leased"] == 0
+    assert pool.snapshot()["allocated"] == 1
+
+
+def test_release_returns_port_to_the_end_of_the_queue(pool):
+    port = pool.reserve()
+    pool.commit(port, agent_id=1)
+    pool.release(port)
+    assert pool.owner(port) is None
+    assert [pool.reserve() for _ in range(4)] == [6101, 6102, 6103, port]
+
+
+def test_expired_lease_is_reused(pool, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(port_pool_module.time, "monotonic", lambda: now[0])
+    leased = [pool.reserve() for _ in range(4)]
+    now[0] += pool.lease_s
+    assert pool.reserve() == leased[0]
+
+
+def test_allocate_rejects_port_of_another_agent(pool):
+    assert pool.allocate(6102, agent_id=1)
+    assert pool.allocate(6102, agent_id=1)
+    assert not pool.allocate(6102, agent_id=2)
+    assert 6102 not in [pool.reserve() for _ in range(3)]
+
+
+def test_reconcile_skips_ports_taken_by_other_processes(pool):
+    pool.bind_host = "127.0.0.1"
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as held:
+        try:
+            held.bind(("127.0.0.1", 6101))
+        except OSError:
+            pytest.skip("port 6101 is busy on this host")
+        held.listen()
+        assert pool.reconcile()["became_busy"] >= 1
+        assert 6101 not in [pool.reserve() for _ in range(3)]
+    # Порт освободился — следующая сверка вернет его в выдачу
+    assert pool.reconcile()["became_free"] >= 1
+    assert pool.reserve() == 6101
+
+
+def test_peek_does_not_lease(pool):
+    assert pool.peek() == 6100
+    assert pool.peek() == 6100
+    assert pool.snapshot()["leased"] == 0
+    assert pool.reserve() == 6100
+    assert pool.peek() == 6101
+
+
+def test_load_state_reassigns_duplicate_port_after_loading_all_agents(monkeypatch, tmp_path):
+    from backend.services.agent_service import AgentService
+
+    monkeypatch.setattr(port_pool_module.port_pool, "start_port", 6100)
+    monkeypatch.setattr(port_pool_module.port_pool, "end_port", 6104)
+    monkeypatch.chdir(tmp_path)
+    now = "2024-01-01T00:00:00"
+
+    def agent(agent_id, port):
+        return {"id": agent_id, "name": f"a{agent_id}", "description": "", "agent_type": "faq",
+                "port": port, "created_at": now, "updated_at": now}
+
+    # Третьему агенту принадлежит 6100 — первый свободный порт пула
+    (tmp_path / "agents_state.json").write_text(json.dumps({
+        "next_id": 4, "agents": [agent(1, 6101), agent(2, 6101), agent(3, 6100)]
+    }), encoding="utf-8")
+
+    service = AgentService()
+    ports = {agent.id: agent.port for agent in service.get_all_agents()}
+    assert ports[1] == 6101 and ports[3] == 6100
+    assert ports[2] not in (6100, 6101)
+    assert port_pool_module.port_pool.owner(ports[2]) == 2
+    assert port_pool_module.port_pool.snapshot()["leased"] == 0
+    assert service.find_free_port() == service.find_free_port()
+
+    monkeypatch.undo()
+    port_pool_module.port_pool.clear()
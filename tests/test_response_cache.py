@@ -0,0 +1,99 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from backend.models import Agent, AgentType
+from backend.services.response_cache import ResponseCache
+
+
+def make_agent(model_path: str, agent_id: int = 1) -> Agent:
+    now = datetime.now().isoformat()
+    return Agent(id=agent_id, name="faq", description="", agent_type=AgentType.FAQ, port=5999,
+                 model_path=model_path, created_at=now, updated_at=now, response_cache_enabled=True)
+
+
+def ok(text: str):
+    return {"success": True, "responses": [text], "metadata": {"intent": {"name": "faq"}}}
+
+
+@pytest.fixture
+def agent(tmp_path):
+    (tmp_path / "models").mkdir()
+    (tmp_path / "models" / "old.tar.gz").write_bytes(b"old")
+    return make_agent(str(tmp_path / "models"))
+
+
+def test_normalized_question_hits_cache(agent):
+    cache = ResponseCache()
+    cache.put(agent, "Как доставка?", ok("2 дня"))
+    result = cache.get(agent, "  как   доставка")
+    assert result["responses"] == ["2 дня"]
+    assert result["cached"]
+    assert cache.agent_stats(agent.id)["hits"] == 1
+
+
+def test_invalidate_after_training_drops_entries_and_fingerprint(agent, tmp_path):
+    cache = ResponseCache()
+    cache.put(agent, "доставка", ok("2 дня"))
+    old_fingerprint = cache.agent_stats(agent.id)["model_fingerprint"]
+
+    (tmp_path / "models" / "new.tar.gz").write_bytes(b"new model")
+    cache.invalidate(agent.id)
+
+    assert cache.get(agent, "доставка") is None
+    stats = cache.agent_stats(agent.id)
+    assert stats["entries"] == 0
+    assert stats["invalidations"] == 1
+    assert stats["model_fingerprint"] != old_fingerprint
+    assert cache.total_bytes == 0
+
+
+def test_response_from_before_invalidation_is_not_cached(agent):
+    cache = ResponseCache()
+    generation = cache.generation(agent.id)
+    assert cache.get(agent, "доставка") is None
+
+    # Обучение завершилось, пока запрос ждал ответа старой модели
+    cache.invalidate(agent.id)
+    cache.put(agent, "доставка", ok("старый ответ"), generation=generation)
+    assert cache.get(agent, "доставка") is None
+
+    cache.put(agent, "доставка", ok("новый ответ"), generation=cache.generation(agent.id))
+    assert cache.get(agent, "доставка")["responses"] == ["новый ответ"]
+
+
+def test_invalidate_from_worker_thread_keeps_accounting_consistent(agent):
+    cache = ResponseCache()
+    stop = threading.Event()
+
+    def invalidate_loop():
+        while not stop.is_set():
+            cache.invalidate(agent.id)
+
+    worker = threading.Thread(target=invalidate_loop)
+    worker.start()
+    try:
+        for i in range(2000):
+            cache.put(agent, f"вопрос {i}", ok("ответ"))
+            cache.get(agent, f"вопрос {i}")
+    finally:
+        stop.set()
+        worker.join()
+
+    cache.invalidate(agent.id)
+    assert cache.total_bytes == 0
+    assert len(cache._entries) == 0
+
+
+def test_lru_eviction_respects_max_entries(agent):
+    cache = ResponseCache()
+    cache.max_entries = 2
+    cache.put(agent, "a", ok("1"))
+    cache.put(agent, "b", ok("2"))
+    cache.get(agent, "a")
+    cache.put(agent, "c", ok("3"))
+
+    assert cache.get(agent, "b") is None
+    assert cache.get(agent, "a") is not None
+    assert cache.agent_stats(agent.id)["evictions"] == 1
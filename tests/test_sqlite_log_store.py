@@ -0,0 +1,107 @@
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.models import DialogLog, LogQuery
+from backend.services.sqlite_log_store import SQLiteLogStore
+
+START = datetime(2024, 1, 1)
+
+
+def make_logs(ids, agent_id: int = 1):
+    return [DialogLog(id=i, agent_id=agent_id, sender="user", user_message=f"m{i}", bot_response=["ok"],
+                      timestamp=(START + timedelta(seconds=i)).isoformat())
+            for i in ids]
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / "dialogs.db")
+
+
+def reopen(store: SQLiteLogStore, db_file: str) -> SQLiteLogStore:
+    store.close()
+    return SQLiteLogStore(db_file)
+
+
+def test_restart_keeps_next_id_after_all_rows_are_deleted(db_file):
+    store = SQLiteLogStore(db_file)
+    store.append(make_logs(range(1, 6)))
+    store.delete(list(range(1, 6)))
+
+    store = reopen(store, db_file)
+    assert store.next_id() == 6
+    store.close()
+
+
+def test_restart_after_clear_of_one_agent_keeps_next_id(db_file):
+    store = SQLiteLogStore(db_file)
+    store.append(make_logs([1, 2]) + make_logs([3], agent_id=2))
+    store.clear(2)
+
+    store = reopen(store, db_file)
+    assert store.next_id() == 4
+    assert store.agent_counts() == {1: 2}
+    store.close()
+
+
+def test_out_of_order_batches_advance_next_id(db_file):
+    store = SQLiteLogStore(db_file)
+    store.append(make_logs([1, 3]))
+    store.append(make_logs([2]))
+    assert store.next_id() == 4
+
+    store = reopen(store, db_file)
+    assert [log.id for log in store.query(agent_id=1)] == [1, 2, 3]
+    assert store.next_id() == 4
+    store.close()
+
+
+def test_failed_append_raises_and_keeps_next_id(db_file, monkeypatch):
+    store = SQLiteLogStore(db_file)
+    store.append(make_logs([1]))
+
+    def broken_insert(logs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "_insert", broken_insert)
+    with pytest.raises(sqlite3.Error):
+        store.append(make_logs([2]))
+    assert store.next_id() == 2
+
+    monkeypatch.undo()
+    # Повтор той же пачки из файла переполнения не задваивает записи
+    store.append(make_logs([2]))
+    store.append(make_logs([2]))
+    assert store.count(1) == 2
+    store.close()
+
+
+def test_page_uses_keyset_cursor(db_file):
+    store = SQLiteLogStore(db_file)
+    store.append(make_logs(range(1, 8)))
+    first = store.page(LogQuery(agent_id=1, limit=3))
+    assert [log.id for log in first] == [7, 6, 5]
+    after = (first[-1].timestamp, first[-1].id)
+    assert [log.id for log in store.page(LogQuery(agent_id=1, limit=3, after=after))] == [4, 3, 2]
+    store.close()
+
+
+def test_first_start_migrates_json_state(db_file, tmp_path):
+    logs_file = tmp_path / "dialogs_state.json"
+    journal_file = tmp_path / "dialogs_journal.jsonl"
+    logs_file.write_text(json.dumps({
+        "next_id": 10, "generation": 0, "logs": [log.dict() for log in make_logs([1, 2])]
+    }), encoding="utf-8")
+
+    store = SQLiteLogStore(db_file, migrate_from=(str(logs_file), str(journal_file)))
+    assert store.count(1) == 2
+    assert store.next_id() == 10
+
+    # Повторный запуск не импортирует логи второй раз
+    store.close()
+    store = SQLiteLogStore(db_file, migrate_from=(str(logs_file), str(journal_file)))
+    assert store.count(1) == 2
+    store.close()